@@ -30,6 +30,7 @@ from panda3d.core import Loader as PandaLoader
 from direct.directnotify import DirectNotifyGlobal
 from direct.showbase.DirectObject import DirectObject
 from direct.showbase.Loader import Loader
+from .AnimChannelCache import animChannelCache
 
 '''
 from panda3d.direct import CActor
@@ -156,6 +157,64 @@ class Actor(DirectObject, NodePath):
                                        LoaderOptions.LFReportErrors |
                                        LoaderOptions.LFConvertAnim)
 
+    # If true, an animation that is still being loaded in the background is
+    # skipped when it is played, leaving the character in its current pose
+    # until the animation is ready.  If false, playing it waits for it to
+    # finish loading.
+    asyncAnimFallback = ConfigVariableBool('actor-async-anim-fallback', True)
+
+    class AnimPrefetch:
+        """Returned by prefetchAnims().  This class is modelled after
+        Future, and can be awaited."""
+
+        # This indicates that this class behaves like a Future.
+        _asyncio_future_blocking = False
+
+        def __init__(self, numAnims, callback, extraArgs):
+            self.numPending = numAnims
+            self.numBound = 0
+            self.callback = callback
+            self.extraArgs = extraArgs
+            self.cancelledFlag = False
+
+        def gotAnim(self, bound):
+            self.numPending -= 1
+            if bound:
+                self.numBound += 1
+            if self.numPending == 0 and self.callback and not self.cancelledFlag:
+                self.callback(*self.extraArgs)
+
+        def cancel(self):
+            "Cancels the prefetch.  Callback won't be called."
+            self.cancelledFlag = True
+
+        def cancelled(self):
+            "Returns true if the prefetch was cancelled."
+            return self.cancelledFlag
+
+        def done(self):
+            "Returns true if all the animations were loaded or the prefetch was cancelled."
+            return self.cancelledFlag or self.numPending == 0
+
+        def result(self):
+            "Returns the number of animations that were loaded and bound."
+            return self.numBound
+
+        def exception(self):
+            assert self.done() and not self.cancelled()
+            return None
+
+        def __await__(self):
+            """ Returns a generator that raises StopIteration when the loading
+            is complete.  This allows this class to be used with 'await'."""
+
+            if self.numPending:
+                self._asyncio_future_blocking = True
+                while self.numPending and not self.cancelledFlag:
+                    yield self
+
+            return self.numBound
+
     class AnimDef:
         """Information about a single animation of a part."""
 
@@ -170,6 +229,12 @@ class Actor(DirectObject, NodePath):
             # Have to store play rate here because the character does not
             # remember play rates of channels as they are set on layers.
             self.playRate = 1.0
+            # True if this AnimDef holds a reference to its channel in the
+            # animChannelCache.
+            self.cached = False
+            # The AnimPrefetch that is loading the channel, if it is being
+            # loaded in the background.
+            self.pending = None
 
         def setName(self, name):
             self.name = str(name)
@@ -222,6 +287,8 @@ class Actor(DirectObject, NodePath):
             animDef.char = partDef.char
             animDef.index = self.index
             animDef.playRate = self.playRate
+            if self.cached:
+                animDef.cached = animChannelCache.addRef(animDef.filename)
             partDef.animsByName[animDef.name] = animDef
             if animDef.isBound():
                 partDef.animsByIndex[animDef.index] = animDef
@@ -241,6 +308,41 @@ class Actor(DirectObject, NodePath):
             # Joint Merges
             self.mergeParent = None
             self.mergedChildren = set()
+            # Identifies the skeleton of the character, for the
+            # animChannelCache.  Computed when first needed.
+            self.skeletonKey = None
+
+        def getSkeletonKey(self):
+            if self.skeletonKey is None:
+                self.skeletonKey = animChannelCache.getSkeletonKey(self.char)
+            return self.skeletonKey
+
+        def setAnimDef(self, animDef):
+            """
+            Stores the AnimDef under its name, replacing any AnimDef already
+            loaded with that name.  The replaced AnimDef gives back its
+            reference to its channel, and is no longer bound if it is still
+            loading in the background.
+            """
+            oldDef = self.animsByName.get(animDef.name)
+            if oldDef is not None and oldDef is not animDef:
+                oldDef.pending = None
+                if oldDef.cached:
+                    animChannelCache.release(oldDef.filename)
+                    oldDef.cached = False
+            self.animsByName[animDef.name] = animDef
+
+        def releaseAnims(self):
+            """
+            Gives back the references held by this part's AnimDefs to their
+            channels in the animChannelCache.
+            """
+            for animDef in self.animsByName.values():
+                # If it's still loading, it will be released when it loads.
+                animDef.pending = None
+                if animDef.cached:
+                    animChannelCache.release(animDef.filename)
+                    animDef.cached = False
 
         def getChannelIndex(self, animName):
             animDef = self.animsByName.get(animName)
@@ -497,7 +599,8 @@ class Actor(DirectObject, NodePath):
                 continue
             animDef.channel.setWeightList(weightList)
 
-    def loadAnims(self, anims, partName="modelRoot", lodName="lodRoot", loadNow = False):
+    def loadAnims(self, anims, partName="modelRoot", lodName="lodRoot", loadNow = False,
+                  prefetch = False):
         """loadAnims(self, string:string{}, string='modelRoot',
         string='lodRoot')
         Actor anim loader. Takes an optional partName (defaults to
@@ -507,7 +610,9 @@ class Actor(DirectObject, NodePath):
 
         If loadNow is True, the Actor will immediately load up all animations
         from disk into memory.  Otherwise, animations will only be loaded the
-        first time they are accessed through the Actor.
+        first time they are accessed through the Actor, unless prefetch is
+        True, in which case they are loaded in the background right away;
+        see prefetchAnims().
         """
         reload = True
         if lodName == 'all':
@@ -532,30 +637,137 @@ class Actor(DirectObject, NodePath):
                     char = partDef.char
                     animDef = Actor.AnimDef(filename, char=char)
                     animDef.name = animName
-                    partDef.animsByName[animName] = animDef
+                    partDef.setAnimDef(animDef)
             else:
                 # Load the channel into memory immediately and bind it.
                 channel = self.loadAnim(filename)
                 if not channel:
                     continue
-                for lName in lodNames:
+                for i, lName in enumerate(lodNames):
                     partDef = self.__partBundleDict[lName][partName]
                     animDef = Actor.AnimDef(filename, channel, partDef.char)
                     animDef.name = animName
-                    partDef.animsByName[animName] = animDef
+                    # loadAnim() took one reference, for the first LOD.
+                    if i == 0:
+                        animDef.cached = animChannelCache.hasChannel(filename)
+                    else:
+                        animDef.cached = animChannelCache.addRef(filename)
+                    partDef.setAnimDef(animDef)
                     if not self.bindAnim(partDef, animDef, channel):
                         Actor.notify.warning("Failed to bind anim (" + animName + ", " + filename + ") to part " + partName + ", lod " + lName)
 
+        if prefetch and not loadNow:
+            for lName in lodNames:
+                self.prefetchAnims(list(anims.keys()), partName, lName)
+
     def loadAnim(self, filename):
         """
         Loads a single animation from the indicated filename and returns the
         AnimChannel contained within it.  Returns None if an error occurred.
         If the file contains multiple channels, it only returns the first one.
+
+        The channel comes from the animChannelCache, and is shared with
+        every other Actor that loads the same file.  Each successful call
+        adds a reference to it, which should be given back with
+        animChannelCache.release(filename) when it is no longer needed.
+        """
+        return animChannelCache.acquire(filename, self.__loadAnimFile)
+
+    def prefetchAnims(self, animNames=None, partName=None, lodName=None,
+                      callback=None, extraArgs=[], priority=None):
         """
+        Starts loading the indicated animations (or all of them, if
+        animNames is None) in the background, on the Loader's threads, and
+        binds each one as soon as it is loaded.  Only animations that aren't
+        loaded or already loading are loaded.
 
-        animModel = self.loader.loadSync(filename, LoaderOptions())
+        Until an animation is ready, playing it leaves the character in its
+        current pose, unless actor-async-anim-fallback is false, in which
+        case playing it waits for it to finish loading.
+
+        Returns an AnimPrefetch, which may be awaited, or polled with
+        done().  If callback is given, it is called with extraArgs once all
+        of the animations are loaded.
+        """
+        toLoad = []
+        for partDef in self.getPartDefs(partName, lodName):
+            if animNames is None:
+                animDefs = list(partDef.animsByName.values())
+            else:
+                animDefs = [partDef.animsByName.get(name) for name in animNames]
+            for animDef in animDefs:
+                if animDef is None or animDef.isBound() or \
+                   animDef.pending is not None or animDef.filename is None:
+                    continue
+                toLoad.append((partDef, animDef))
+
+        prefetch = Actor.AnimPrefetch(len(toLoad), callback, extraArgs)
+        if not toLoad:
+            if callback:
+                callback(*extraArgs)
+            return prefetch
+
+        loaderOptions = self.__getAnimLoaderOptions()
+        for partDef, animDef in toLoad:
+            animDef.pending = prefetch
+        for partDef, animDef in toLoad:
+            # This may call back right away, if the channel is cached.
+            animChannelCache.acquireAsync(
+                animDef.filename, loaderOptions, self.__extractAnimChannel,
+                lambda channel, partDef=partDef, animDef=animDef:
+                    self.__gotPrefetchedAnim(channel, partDef, animDef, prefetch),
+                priority)
+        return prefetch
+
+    def __gotPrefetchedAnim(self, channel, partDef, animDef, prefetch):
+        if animDef.pending is not prefetch:
+            # The part was removed or the Actor was cleaned up in the
+            # meantime.
+            if channel is not None:
+                animChannelCache.release(animDef.filename)
+            prefetch.gotAnim(False)
+            return
+
+        animDef.pending = None
+        if channel is None:
+            # It will be tried again when it's played.
+            prefetch.gotAnim(False)
+            return
+
+        animDef.cached = animChannelCache.hasChannel(animDef.filename)
+        bound = self.bindAnim(partDef, animDef, channel)
+        if not bound:
+            Actor.notify.warning("Failed to bind anim (%s, %s)" % (animDef.name, animDef.filename))
+        prefetch.gotAnim(bound)
+
+    def isAnimLoading(self, animName, partName=None, lodName=None):
+        """
+        Returns true if the indicated animation is still being loaded in the
+        background on any of the indicated parts.
+        """
+        for partDef in self.getPartDefs(partName, lodName):
+            animDef = partDef.getAnimDef(animName)
+            if animDef is not None and animDef.pending is not None:
+                return True
+        return False
+
+    def __getAnimLoaderOptions(self):
+        if animChannelCache.isEnabled():
+            # The animChannelCache keeps the channel; keeping the whole
+            # model in the ModelPool too would stop it from being freed
+            # when the cache evicts it.
+            return LoaderOptions(LoaderOptions.LFSearch |
+                                 LoaderOptions.LFReportErrors |
+                                 LoaderOptions.LFNoRamCache)
+        return LoaderOptions()
+
+    def __loadAnimFile(self, filename):
+        animModel = self.loader.loadSync(filename, self.__getAnimLoaderOptions())
+        return self.__extractAnimChannel(animModel, filename)
+
+    def __extractAnimChannel(self, animModel, filename):
         if not animModel:
-            Actor.notify.warning("Failed to load animation file " + filename)
+            Actor.notify.warning("Failed to load animation file %s" % (filename))
             return None
 
         animModelNP = NodePath(animModel)
@@ -583,13 +795,24 @@ class Actor(DirectObject, NodePath):
         added to the part character, or False if there was an error.
         """
 
+        filename = animDef.filename
+        if filename is not None:
+            skeletonKey = partDef.getSkeletonKey()
+            if animChannelCache.isKnownBindFailure(filename, skeletonKey):
+                # Another Character with the same skeleton already failed
+                # to bind this channel; don't bother trying again.
+                self.__dropAnimDef(partDef, animDef)
+                return False
+
         if not partDef.char.bindAnim(channel):
-            del partDef.animsByName[animDef.name]
+            if filename is not None:
+                animChannelCache.recordBindFailure(filename, skeletonKey)
+            self.__dropAnimDef(partDef, animDef)
             return False
 
         channelIndex = partDef.char.addChannel(channel)
         if channelIndex < 0:
-            del partDef.animsByName[animDef.name]
+            self.__dropAnimDef(partDef, animDef)
             return False
 
         animDef.index = channelIndex
@@ -606,12 +829,28 @@ class Actor(DirectObject, NodePath):
         False if the animation could not be loaded or bound.
         """
 
+        if animDef.pending is not None:
+            if Actor.asyncAnimFallback.getValue():
+                # Not ready yet.
+                return False
+            # Wait for it; this binds it.
+            animChannelCache.finishLoad(animDef.filename)
+            return animDef.isBound()
+
         channel = self.loadAnim(animDef.filename)
         if not channel:
             return False
+        animDef.cached = animChannelCache.hasChannel(animDef.filename)
 
         return self.bindAnim(partDef, animDef, channel)
 
+    def __dropAnimDef(self, partDef, animDef):
+        # Removes an AnimDef that could not be bound from the part.
+        del partDef.animsByName[animDef.name]
+        if animDef.cached:
+            animChannelCache.release(animDef.filename)
+            animDef.cached = False
+
     def loadModel(self, modelPath, partName="modelRoot", lodName="lodRoot",
                   copy = True, okMissing = None, autoBindAnims = True,
                   keepModel = False):
@@ -721,6 +960,9 @@ class Actor(DirectObject, NodePath):
         #assert(node.getNumBundles() == 1)
         bundleHandle = node.getCharacter()
 
+        oldPartDef = bundleDict.get(partName)
+        if oldPartDef is not None:
+            oldPartDef.releaseAnims()
         bundleDict[partName] = Actor.PartDef(bundleNP, bundleHandle, partModel)
 
     def setPlayRate(self, rate, anim=None, partName=None, layer=0):
@@ -1322,6 +1564,7 @@ class Actor(DirectObject, NodePath):
                 partDef.charNP.removeNode()
             if not partDef.partModel.isEmpty():
                 partDef.partModel.removeNode()
+            partDef.releaseAnims()
             del partBundleDict[partName]
 
     def hidePart(self, partName, lodName="lodRoot"):
@@ -1406,6 +1649,9 @@ class Actor(DirectObject, NodePath):
         NodePath.removeNode(self)
 
     def clearPythonData(self):
+        for partBundleDict in self.__partBundleDict.values():
+            for partDef in partBundleDict.values():
+                partDef.releaseAnims()
         self.__partBundleDict = {}
         self.__sortedLODNames = []
         #self.__animControlDict = {}
@@ -0,0 +1,341 @@
+"""AnimChannelCache module: contains the AnimChannelCache class and its
+global instance, animChannelCache.
+
+Every Actor loads its animations through animChannelCache, so that an
+animation file is loaded from disk once and its channel is shared by every
+Actor that plays it, rather than being loaded again for each Actor.  The
+cache can also load animations in the background, on the Loader's threads.
+"""
+
+__all__ = ['AnimChannelCache', 'animChannelCache']
+
+from panda3d.core import (
+    ConfigVariableBool,
+    ConfigVariableDouble,
+    ConfigVariableInt,
+    Filename,
+    VirtualFileSystem,
+    getModelPath,
+)
+from panda3d.core import Loader as PandaLoader
+from direct.directnotify.DirectNotifyGlobal import directNotify
+from direct.showbase.DirectObject import DirectObject
+from collections import OrderedDict
+
+
+class _AnimCacheEntry:
+    __slots__ = ('filename', 'channel', 'refCount', 'size')
+
+    def __init__(self, filename, channel, size):
+        self.filename = filename
+        self.channel = channel
+        self.refCount = 0
+        self.size = size
+
+
+class AnimChannelCache(DirectObject):
+    """
+    A process-wide cache of loaded animation channels, keyed by filename.
+
+    Each channel handed out by acquire() is counted as a reference until it
+    is given back with release().  A channel with no references left is
+    kept around in case another Actor wants it soon, but it may be evicted,
+    least recently used first, when there are more than
+    anim-channel-cache-max-unused such channels, or when the cache as a
+    whole holds more than anim-channel-cache-megabytes of animation data.
+    Channels still referenced are never evicted.
+
+    The size of each channel is estimated from the size of its file on
+    disk, which is close enough to tell which animations are expensive.
+
+    The cache also remembers which animations failed to bind to which
+    skeletons, so that Characters that share a skeleton don't each retry a
+    bind that is known to fail.
+
+    With acquireAsync(), a channel may be loaded in the background.  Any
+    number of callers may wait on the same file; it is only loaded once.
+    """
+
+    notify = directNotify.newCategory('AnimChannelCache')
+
+    Enabled = ConfigVariableBool('anim-channel-cache', True)
+    MaxUnused = ConfigVariableInt('anim-channel-cache-max-unused', 256)
+    MaxMegabytes = ConfigVariableDouble('anim-channel-cache-megabytes', 64.0)
+
+    def __init__(self):
+        self.enabled = self.Enabled.getValue()
+        self.maxUnused = self.MaxUnused.getValue()
+        self.maxBytes = int(self.MaxMegabytes.getValue() * 1024 * 1024)
+        # filename -> _AnimCacheEntry
+        self.entries = {}
+        # filename -> _AnimCacheEntry, for the entries with no references,
+        # least recently released first.
+        self.unused = OrderedDict()
+        # Total estimated size of all the entries, in bytes.
+        self.totalBytes = 0
+        # (filename, skeleton key) pairs that could not be bound.
+        self.bindFailures = set()
+        # filename -> [request, extractFunc, callbacks], for the channels
+        # being loaded in the background.
+        self.pending = {}
+        # request -> filename
+        self.pendingRequests = {}
+        self.hook = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def setEnabled(self, enabled):
+        """
+        Turns the cache on or off.  While it is off, every call to acquire()
+        loads the file again, as if the cache didn't exist.  Turning it off
+        flushes the channels that aren't in use.
+        """
+        self.enabled = enabled
+        if not enabled:
+            self.flush()
+
+    def isEnabled(self):
+        return self.enabled
+
+    def setLimits(self, maxUnused=None, maxBytes=None):
+        """
+        Changes the eviction limits: the number of unreferenced channels
+        kept, and the total size of the cache in bytes.  Either may be None
+        to leave it unchanged.
+        """
+        if maxUnused is not None:
+            self.maxUnused = maxUnused
+        if maxBytes is not None:
+            self.maxBytes = maxBytes
+        self.__evict()
+
+    def acquire(self, filename, loadFunc):
+        """
+        Returns the channel loaded from the indicated file, adding a
+        reference to it.  If the channel isn't in the cache, loadFunc is
+        called with the filename to load it.  Returns None, without adding
+        a reference, if the channel could not be loaded.
+        """
+        key = str(filename)
+        if key in self.pending:
+            # It's already being loaded in the background; wait for that
+            # rather than loading it twice.
+            self.finishLoad(key)
+
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            if entry.refCount == 0:
+                del self.unused[key]
+            entry.refCount += 1
+            return entry.channel
+
+        self.misses += 1
+        channel = loadFunc(filename)
+        if channel is None or not self.enabled:
+            return channel
+
+        self.__addEntry(key, filename, channel, 1)
+        return channel
+
+    def acquireAsync(self, filename, loaderOptions, extractFunc, callback,
+                     priority=None):
+        """
+        Like acquire(), but if the channel isn't in the cache, it is loaded
+        in the background by the Loader, with the indicated LoaderOptions.
+        extractFunc is then called with the loaded model and the filename,
+        and should return the channel from the model, or None.
+
+        callback is called with the channel, which holds a reference for the
+        callback, or with None if it could not be loaded.  If the channel is
+        already in the cache, the callback is called right away.
+        """
+        key = str(filename)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            if entry.refCount == 0:
+                del self.unused[key]
+            entry.refCount += 1
+            callback(entry.channel)
+            return
+
+        pending = self.pending.get(key)
+        if pending is not None:
+            self.hits += 1
+            pending[2].append(callback)
+            return
+
+        self.misses += 1
+        if self.hook is None:
+            self.hook = 'animChannelCache-loaded'
+            self.accept(self.hook, self.__gotAsyncModel)
+
+        loader = PandaLoader.getGlobalPtr()
+        request = loader.makeAsyncRequest(Filename(filename), loaderOptions)
+        if priority is not None:
+            request.setPriority(priority)
+        request.setDoneEvent(self.hook)
+        self.pending[key] = [request, extractFunc, [callback]]
+        self.pendingRequests[request] = key
+        loader.loadAsync(request)
+
+    def isLoading(self, filename):
+        """
+        Returns true if the channel is being loaded in the background.
+        """
+        return str(filename) in self.pending
+
+    def finishLoad(self, filename):
+        """
+        Waits for the background load of the indicated file to finish, if it
+        is still loading, and hands the channel to the callbacks waiting on
+        it.
+        """
+        pending = self.pending.get(str(filename))
+        if pending is not None:
+            request = pending[0]
+            request.wait()
+            self.__gotAsyncModel(request)
+
+    def __gotAsyncModel(self, request):
+        key = self.pendingRequests.pop(request, None)
+        if key is None:
+            # Already handled by finishLoad().
+            return
+        request, extractFunc, callbacks = self.pending.pop(key)
+
+        channel = None
+        if not request.cancelled():
+            model = request.result()
+            if model is not None:
+                channel = extractFunc(model, key)
+
+        if channel is not None:
+            if self.enabled:
+                self.__addEntry(key, key, channel, len(callbacks))
+            else:
+                self.notify.debug('loaded %s with the cache disabled' % (key))
+        for callback in callbacks:
+            callback(channel)
+
+    def __addEntry(self, key, filename, channel, refCount):
+        entry = _AnimCacheEntry(key, channel, self.__getFileSize(filename))
+        entry.refCount = refCount
+        self.entries[key] = entry
+        self.totalBytes += entry.size
+        self.__evict()
+
+    def addRef(self, filename):
+        """
+        Adds another reference to a channel that is already referenced,
+        such as when an Actor is copied.  Returns true if the channel is in
+        the cache.
+        """
+        entry = self.entries.get(str(filename))
+        if entry is None:
+            return False
+        if entry.refCount == 0:
+            del self.unused[entry.filename]
+        entry.refCount += 1
+        return True
+
+    def release(self, filename):
+        """
+        Gives back a reference to the channel loaded from the indicated
+        file.  Once it has no references, it may be evicted.
+        """
+        key = str(filename)
+        entry = self.entries.get(key)
+        if entry is None or entry.refCount == 0:
+            return
+        entry.refCount -= 1
+        if entry.refCount == 0:
+            self.unused[key] = entry
+            self.__evict()
+
+    def getRefCount(self, filename):
+        entry = self.entries.get(str(filename))
+        if entry is None:
+            return 0
+        return entry.refCount
+
+    def hasChannel(self, filename):
+        return str(filename) in self.entries
+
+    def flush(self):
+        """
+        Evicts every channel that isn't in use.
+        """
+        while self.unused:
+            self.__evictOne()
+
+    def __evict(self):
+        unused = self.unused
+        while unused and (len(unused) > self.maxUnused or
+                          self.totalBytes > self.maxBytes):
+            self.__evictOne()
+
+    def __evictOne(self):
+        key, entry = self.unused.popitem(last=False)
+        del self.entries[key]
+        self.totalBytes -= entry.size
+        self.evictions += 1
+        for failure in [f for f in self.bindFailures if f[0] == key]:
+            self.bindFailures.discard(failure)
+
+    def __getFileSize(self, filename):
+        vfs = VirtualFileSystem.getGlobalPtr()
+        filename = Filename(filename)
+        vfs.resolveFilename(filename, getModelPath().getValue())
+        if not vfs.exists(filename):
+            return 0
+        return vfs.getFileSize(filename)
+
+    def getSkeletonKey(self, character):
+        """
+        Returns a key identifying the skeleton of the Character, which is
+        the same for all Characters with the same joints.
+        """
+        return tuple(character.getJointName(i)
+                     for i in range(character.getNumJoints()))
+
+    def isKnownBindFailure(self, filename, skeletonKey):
+        return (str(filename), skeletonKey) in self.bindFailures
+
+    def recordBindFailure(self, filename, skeletonKey):
+        key = str(filename)
+        if key in self.entries:
+            self.bindFailures.add((key, skeletonKey))
+
+    def getMemoryUsage(self):
+        """
+        Returns the estimated size of all the channels in the cache, in
+        bytes, and the size of the ones in use.
+        """
+        usedBytes = self.totalBytes - sum(e.size for e in self.unused.values())
+        return self.totalBytes, usedBytes
+
+    def getReport(self, limit=None):
+        """
+        Returns a table of the channels in the cache as a string, largest
+        first.
+        """
+        totalBytes, usedBytes = self.getMemoryUsage()
+        s = ('%d channels (%d unused, %d loading), %.1f KB (%.1f KB in use), '
+             '%d hits, %d misses, %d evictions\n' % (
+                 len(self.entries), len(self.unused), len(self.pending),
+                 totalBytes / 1024.0, usedBytes / 1024.0, self.hits,
+                 self.misses, self.evictions))
+        entries = sorted(self.entries.values(),
+                         key=lambda entry: entry.size, reverse=True)
+        if limit is not None:
+            entries = entries[:limit]
+        for entry in entries:
+            s += '%10.1f KB %6d refs  %s\n' % (
+                entry.size / 1024.0, entry.refCount, entry.filename)
+        return s
+
+
+animChannelCache = AnimChannelCache()
@@ -1,22 +1,116 @@
 """CRCache module: contains the CRCache class"""
 
+from panda3d.core import ConfigVariableInt
 from direct.directnotify import DirectNotifyGlobal
 from direct.showbase.MessengerGlobal import messenger
 from direct.showbase.PythonUtil import safeRepr, itype
 from . import DistributedObject
+from collections import OrderedDict
 
 
 class CRCache:
+    """
+    Holds on to recently disabled distributed objects, so that if the
+    server generates them again soon after they can be reused instead of
+    being constructed from scratch.
+
+    Objects are evicted least recently cached first once the cache holds more
+    than maxCacheItems objects, or, if maxCacheWeight is nonzero, once the
+    total weight of the cached objects exceeds it.  The weight of an object
+    is given by weightFunc, for instance CRCache.getNodeCountWeight to bound
+    the number of scene graph nodes kept alive by the cache, and is 1 by
+    default.  The number of objects of a particular class that may be cached
+    can be limited further with setClassLimit().
+    """
+
     notify = DirectNotifyGlobal.directNotify.newCategory("CRCache")
 
-    def __init__(self, maxCacheItems=10):
+    DefaultMaxCacheItems = ConfigVariableInt('cr-cache-size', 10)
+    DefaultMaxCacheWeight = ConfigVariableInt('cr-cache-max-weight', 0)
+
+    def __init__(self, maxCacheItems=None, maxCacheWeight=None, weightFunc=None):
+        if maxCacheItems is None:
+            maxCacheItems = self.DefaultMaxCacheItems.getValue()
+        if maxCacheWeight is None:
+            maxCacheWeight = self.DefaultMaxCacheWeight.getValue()
         self.maxCacheItems = maxCacheItems
         self.storedMaxCache = maxCacheItems
-        self.dict = {}
-        self.fifo = []
+        self.maxCacheWeight = maxCacheWeight
+        self.weightFunc = weightFunc
+        # doId -> distObj, least recently cached first.
+        self.dict = OrderedDict()
+        # doId -> weight of each cached object.
+        self.weights = {}
+        self.totalWeight = 0
+        # class -> maximum number of objects of exactly that class to cache.
+        self.classLimits = {}
+        # class -> OrderedDict of doId -> distObj, for the limited classes.
+        self.classDicts = {}
+        self.resetStats()
+
+    @staticmethod
+    def getNodeCountWeight(distObj):
+        """
+        A weightFunc that weighs each object by the number of scene graph
+        nodes under it.
+        """
+        from panda3d.core import NodePath
+        if isinstance(distObj, NodePath) and not distObj.isEmpty():
+            return distObj.countNumDescendants() + 1
+        return 1
+
+    def setClassLimit(self, cls, maxItems):
+        """
+        Limits the number of objects of exactly the given class that may be in
+        the cache at once.  A limit of 0 prevents the class from being cached
+        at all.  None removes the limit.
+        """
+        if maxItems is None:
+            self.classLimits.pop(cls, None)
+            self.classDicts.pop(cls, None)
+            return
+
+        self.classLimits[cls] = maxItems
+        classDict = OrderedDict()
+        for doId, distObj in self.dict.items():
+            if distObj.__class__ is cls:
+                classDict[doId] = distObj
+        self.classDicts[cls] = classDict
+        while len(classDict) > maxItems:
+            self._evict(next(iter(classDict.values())))
+
+    def resetStats(self):
+        self.numHits = 0
+        self.numMisses = 0
+        self.numEvictions = 0
+        self.evictedWeight = 0
+
+    def recordMiss(self):
+        """
+        Called when an object that is generated had to be constructed because
+        it wasn't in the cache.
+        """
+        self.numMisses += 1
+
+    def getStats(self):
+        """
+        Returns a dictionary of the cache's current state and counters.
+        """
+        lookups = self.numHits + self.numMisses
+        return {
+            'items': len(self.dict),
+            'maxItems': self.maxCacheItems,
+            'weight': self.totalWeight,
+            'maxWeight': self.maxCacheWeight,
+            'hits': self.numHits,
+            'misses': self.numMisses,
+            'hitRate': float(self.numHits) / lookups if lookups else 0.0,
+            'evictions': self.numEvictions,
+            'evictedWeight': self.evictedWeight,
+        }
 
     def isEmpty(self):
-        return len(self.fifo) == 0
+        return len(self.dict) == 0
 
     def flush(self):
         """
@@ -51,8 +145,11 @@ class CRCache:
                       (safeRepr(obj), itype(obj), obj.getDelayDeleteNames()))
             self.notify.error(s)
         # Null out all references to the objects so they will get gcd
-        self.dict = {}
-        self.fifo = []
+        self.dict = OrderedDict()
+        self.weights = {}
+        self.totalWeight = 0
+        for cls in self.classDicts:
+            self.classDicts[cls] = OrderedDict()
 
     def cache(self, distObj):
         # Only distributed objects are allowed in the cache
@@ -65,42 +162,66 @@ class CRCache:
         if doId in self.dict:
             CRCache.notify.warning("Double cache attempted for distObj "
                                    + str(doId))
+        elif self.classLimits.get(distObj.__class__) == 0:
+            # This class is never cached.
+            pass
         else:
             # Call disable on the distObj
             distObj.disableAndAnnounce()
 
-            # Put the distObj in the fifo and the dict
-            self.fifo.append(distObj)
-            self.dict[doId] = distObj
+            # Put the distObj in the cache, as the most recent item
+            self._add(doId, distObj)
 
             success = True
 
-            if len(self.fifo) > self.maxCacheItems:
-                # if the cache is full, pop the oldest item
-                oldestDistObj = self.fifo.pop(0)
-                # and remove it from the dictionary
-                del self.dict[oldestDistObj.getDoId()]
-                # and delete it
-                oldestDistObj.deleteOrDelay()
-                if oldestDistObj.getDelayDeleteCount() <= 0:
-                    # make sure we're not leaking
-                    oldestDistObj.detectLeaks()
-
-        # Make sure that the fifo and the dictionary are sane
-        assert len(self.dict) == len(self.fifo)
+            # If the cache is full, evict the oldest items until it isn't.
+            classDict = self.classDicts.get(distObj.__class__)
+            if classDict is not None:
+                while len(classDict) > self.classLimits[distObj.__class__]:
+                    self._evict(next(iter(classDict.values())))
+            while self.dict and (len(self.dict) > self.maxCacheItems or
+                                 (self.maxCacheWeight > 0 and
+                                  self.totalWeight > self.maxCacheWeight)):
+                self._evict(next(iter(self.dict.values())))
+
+        # Make sure that the tables are sane
+        assert len(self.dict) == len(self.weights)
         return success
 
+    def _add(self, doId, distObj):
+        weight = self.weightFunc(distObj) if self.weightFunc else 1
+        self.dict[doId] = distObj
+        self.weights[doId] = weight
+        self.totalWeight += weight
+        classDict = self.classDicts.get(distObj.__class__)
+        if classDict is not None:
+            classDict[doId] = distObj
+
+    def _remove(self, doId):
+        distObj = self.dict.pop(doId)
+        weight = self.weights.pop(doId)
+        self.totalWeight -= weight
+        classDict = self.classDicts.get(distObj.__class__)
+        if classDict is not None:
+            del classDict[doId]
+        return distObj, weight
+
+    def _evict(self, distObj):
+        weight = self._remove(distObj.getDoId())[1]
+        self.numEvictions += 1
+        self.evictedWeight += weight
+        # and delete it
+        distObj.deleteOrDelay()
+        if distObj.getDelayDeleteCount() <= 0:
+            # make sure we're not leaking
+            distObj.detectLeaks()
+
     def retrieve(self, doId):
         assert self.checkCache()
         if doId in self.dict:
-            # Find the object
-            distObj = self.dict[doId]
-            # Remove it from the dictionary
-            del self.dict[doId]
-            # Remove it from the fifo
-            self.fifo.remove(distObj)
-            # return the distObj
-            return distObj
+            self.numHits += 1
+            # Remove it from the cache and return it
+            return self._remove(doId)[0]
         else:
             # If you can't find it, return None
             return None
@@ -111,11 +232,8 @@ class CRCache:
     def delete(self, doId):
         assert self.checkCache()
         assert doId in self.dict
-        # Look it up
-        distObj = self.dict[doId]
-        # Remove it from the dict and fifo
-        del self.dict[doId]
-        self.fifo.remove(distObj)
+        # Remove it from the cache
+        distObj = self._remove(doId)[0]
         # and delete it
         distObj.deleteOrDelay()
         if distObj.getDelayDeleteCount() <= 0:
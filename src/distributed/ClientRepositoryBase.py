@@ -16,6 +16,8 @@ from .MsgTypes import MsgId2Names
 from . import CRCache
 from . import ParentMgr
 from . import RelatedObjectMgr
+from collections import OrderedDict
+import heapq
 import time
 
 
@@ -43,12 +45,36 @@ class ClientRepositoryBase(ConnectionRepository):
         self.context=100000
         self.setClientDatagram(1)
 
-        self.deferredGenerates = []
+        # (msgType, extra) -> sequence number of each deferred generate,
+        # in the order they were queued.  Add to this with
+        # queueDeferredGenerate().
+        self.deferredGenerates = OrderedDict()
         self.deferredDoIds = {}
         self.lastGenerate = 0
         self.setDeferInterval(ConfigVariableDouble('deferred-generate-interval', 0.2).value)
         self.noDefer = False  # Set this True to temporarily disable deferring.
 
+        # If nonzero, deferred generates are replayed every frame for up to
+        # this many seconds, instead of one per deferInterval.
+        self.deferBudget = ConfigVariableDouble('deferred-generate-budget', 0.0).value
+        # Measured cost in seconds of generating each class, by class
+        # number, used to predict whether a generate fits in the budget.
+        self.deferredGenerateCosts = {}
+        # Class name -> priority of generating deferred objects of that
+        # class.  Lower values are generated first; the default is 0.
+        self.deferredGeneratePriorities = {}
+        # doId -> time each deferred generate was queued.
+        self.deferredGenerateTimes = {}
+        # The deferred generates again, as a heap of
+        # (priority, sequence, msgType, extra), for replaying them in
+        # priority order.  Entries that have since left deferredGenerates
+        # are skipped when they come up.
+        self.deferredGenerateHeap = []
+        self.deferredGenerateSeq = 0
+        self.numDeferredGenerated = 0
+        self.totalDeferredLatency = 0.0
+        self.maxDeferredLatency = 0.0
+
         self.recorder = base.recorder
 
         self.readDCFile(dcFileNames)
@@ -97,6 +123,92 @@ class ClientRepositoryBase(ConnectionRepository):
             taskMgr.remove('deferredGenerate')
             taskMgr.doMethodLater(self.deferInterval, self.doDeferredGenerate, 'deferredGenerate')
 
+    def setDeferBudget(self, deferBudget):
+        """Specifies the amount of time, in seconds, that may be spent each
+        frame generating deferred DistributedObjects.  Objects are
+        generated in priority order, see getDeferredGeneratePriority(),
+        until the next one is expected to take longer than the time left.
+        At least one object is generated each frame.  Set this to 0 to
+        space out the generates by the defer interval instead."""
+
+        self.deferBudget = deferBudget
+
+    def queueDeferredGenerate(self, msgType, extra):
+        """Adds a generate to the end of the deferred generate queue,
+        stamped with the time it was queued and given its place in the
+        priority order.  It is up to the caller to start the
+        deferredGenerate task."""
+
+        key = (msgType, extra)
+        self.deferredGenerates.pop(key, None)
+        seq = self.deferredGenerateSeq
+        self.deferredGenerateSeq += 1
+        self.deferredGenerates[key] = seq
+        self.deferredGenerateTimes.setdefault(
+            extra, ClockObject.getGlobalClock().getFrameTime())
+        priority = self.getDeferredGeneratePriority(msgType, extra)
+        heapq.heappush(self.deferredGenerateHeap, (priority, seq, msgType, extra))
+
+    def __popDeferredGenerate(self):
+        # Removes and returns the oldest deferred generate.
+        (msgType, extra), seq = self.deferredGenerates.popitem(last=False)
+        if not self.deferredGenerates:
+            del self.deferredGenerateHeap[:]
+        return msgType, extra
+
+    def __removeDeferredGenerate(self, msgType, extra):
+        del self.deferredGenerates[(msgType, extra)]
+        if not self.deferredGenerates:
+            del self.deferredGenerateHeap[:]
+
+    def getDeferredGeneratePriority(self, msgType, extra):
+        """Returns the priority of replaying the indicated deferred
+        generate.  Lower values are replayed first, and generates of
+        equal priority are replayed in the order they were received.
+        It is looked up once, when the generate is queued.
+        By default, this is looked up by class name in
+        deferredGeneratePriorities.  Override this to prioritize by
+        distance or some other measure of importance."""
+
+        entry = self.deferredDoIds.get(extra)
+        if entry is None:
+            return 0
+        dclass = self.dclassesByNumber.get(entry[0][2])
+        if dclass is None:
+            return 0
+        return self.deferredGeneratePriorities.get(dclass.getName(), 0)
+
+    def getDeferredGenerateCost(self, msgType, extra):
+        """Returns the predicted time, in seconds, it will take to replay
+        the indicated deferred generate, based on previous generates of
+        the same class."""
+
+        entry = self.deferredDoIds.get(extra)
+        if entry is None:
+            return 0.0
+        return self.deferredGenerateCosts.get(entry[0][2], 0.0)
+
+    def getDeferredGenerateStats(self):
+        """Returns a dictionary describing the deferred generate queue:
+        its current depth, how many objects have been generated from it,
+        how long they waited, and the measured cost of each class."""
+
+        costs = {}
+        for classId, cost in self.deferredGenerateCosts.items():
+            dclass = self.dclassesByNumber.get(classId)
+            costs[dclass.getName() if dclass else classId] = cost
+        if self.numDeferredGenerated:
+            averageLatency = self.totalDeferredLatency / self.numDeferredGenerated
+        else:
+            averageLatency = 0.0
+        return {
+            'queued': len(self.deferredGenerates),
+            'generated': self.numDeferredGenerated,
+            'averageLatency': averageLatency,
+            'maxLatency': self.maxDeferredLatency,
+            'classCosts': costs,
+        }
+
     ## def queryObjectAll(self, doID, context=0):
         ## """
         ## Get a one-time snapshot look at the object.
@@ -173,8 +285,7 @@ class ClientRepositoryBase(ConnectionRepository):
     def flushGenerates(self):
         """ Forces all pending generates to be performed immediately. """
         while self.deferredGenerates:
-            msgType, extra = self.deferredGenerates[0]
-            del self.deferredGenerates[0]
+            msgType, extra = self.__popDeferredGenerate()
             self.replayDeferredGenerate(msgType, extra)
 
         taskMgr.remove('deferredGenerate')
@@ -190,10 +301,14 @@ class ClientRepositoryBase(ConnectionRepository):
             if doId in self.deferredDoIds:
                 args, deferrable, dg, updates = self.deferredDoIds[doId]
                 del self.deferredDoIds[doId]
+
+                clock = ClockObject.getGlobalClock()
+                start = clock.getRealTime()
                 self.doGenerate(*args)
+                self.__recordDeferredGenerate(doId, args[2], clock.getRealTime() - start)
 
                 if deferrable:
-                    self.lastGenerate = ClockObject.getGlobalClock().getFrameTime()
+                    self.lastGenerate = clock.getFrameTime()
 
                 for dg, di in updates:
                     # non-DC updates that need to be played back in-order are
@@ -210,10 +325,27 @@ class ClientRepositoryBase(ConnectionRepository):
         else:
             self.notify.warning("Ignoring deferred message %s" % (msgType))
 
+    def __recordDeferredGenerate(self, doId, classId, cost):
+        # Keep a moving average of the cost of generating each class.
+        prevCost = self.deferredGenerateCosts.get(classId)
+        if prevCost is not None:
+            cost = prevCost * 0.75 + cost * 0.25
+        self.deferredGenerateCosts[classId] = cost
+
+        queuedTime = self.deferredGenerateTimes.pop(doId, None)
+        if queuedTime is not None:
+            latency = ClockObject.getGlobalClock().getFrameTime() - queuedTime
+            self.numDeferredGenerated += 1
+            self.totalDeferredLatency += latency
+            self.maxDeferredLatency = max(self.maxDeferredLatency, latency)
+
     def doDeferredGenerate(self, task):
         """ This is the task that generates an object on the deferred
         queue. """
 
+        if self.deferBudget > 0:
+            return self.__doBudgetedDeferredGenerate()
+
         now = ClockObject.getGlobalClock().getFrameTime()
         while self.deferredGenerates:
             if now - self.lastGenerate < self.deferInterval:
@@ -221,13 +353,39 @@ class ClientRepositoryBase(ConnectionRepository):
                 return Task.again
 
             # Generate the next deferred object.
-            msgType, extra = self.deferredGenerates[0]
-            del self.deferredGenerates[0]
+            msgType, extra = self.__popDeferredGenerate()
             self.replayDeferredGenerate(msgType, extra)
 
         # All objects are generaetd.
         return Task.done
 
+    def __doBudgetedDeferredGenerate(self):
+        clock = ClockObject.getGlobalClock()
+        start = clock.getRealTime()
+        numGenerated = 0
+        heap = self.deferredGenerateHeap
+        while heap:
+            # Take the most important generate.  Generating an object can
+            # cause others to be removed from the queue; those are skipped.
+            priority, seq, msgType, extra = heap[0]
+            if self.deferredGenerates.get((msgType, extra)) != seq:
+                heapq.heappop(heap)
+                continue
+
+            if numGenerated > 0:
+                elapsed = clock.getRealTime() - start
+                if elapsed + self.getDeferredGenerateCost(msgType, extra) > self.deferBudget:
+                    # Doesn't fit in this frame.  Come back next frame.
+                    return Task.cont
+
+            heapq.heappop(heap)
+            self.__removeDeferredGenerate(msgType, extra)
+            self.replayDeferredGenerate(msgType, extra)
+            numGenerated += 1
+
+        # All objects are generated.
+        return Task.done
+
     def generateWithRequiredFields(self, dclass, doId, di, parentId, zoneId):
         if doId in self.doId2do:
             # ...it is in our dictionary.
@@ -255,6 +413,7 @@ class ClientRepositoryBase(ConnectionRepository):
             # updateRequiredFields calls announceGenerate
         else:
             # ...it is not in the dictionary or the cache.
+            self.cache.recordMiss()
             # Construct a new one
             classDef = dclass.getClassDef()
             if classDef is None:
@@ -303,6 +462,7 @@ class ClientRepositoryBase(ConnectionRepository):
             # updateRequiredOtherFields calls announceGenerate
         else:
             # ...it is not in the dictionary or the cache.
+            self.cache.recordMiss()
             # Construct a new one
             classDef = dclass.getClassDef()
             if classDef is None:
@@ -346,6 +506,7 @@ class ClientRepositoryBase(ConnectionRepository):
             # updateRequiredOtherFields calls announceGenerate
         else:
             # ...it is not in the dictionary or the cache.
+            self.cacheOwner.recordMiss()
             # Construct a new one
             classDef = dclass.getOwnerClassDef()
             if classDef is None:
@@ -389,8 +550,8 @@ class ClientRepositoryBase(ConnectionRepository):
             # The object had been deferred.  Great; we don't even have
             # to generate it now.
             del self.deferredDoIds[doId]
-            i = self.deferredGenerates.index((CLIENT_CREATE_OBJECT_REQUIRED_OTHER, doId))
-            del self.deferredGenerates[i]
+            self.deferredGenerateTimes.pop(doId, None)
+            self.__removeDeferredGenerate(CLIENT_CREATE_OBJECT_REQUIRED_OTHER, doId)
             if len(self.deferredGenerates) == 0:
                 taskMgr.remove('deferredGenerate')
 
@@ -523,21 +684,13 @@ class ClientRepositoryBase(ConnectionRepository):
     def getObjectsOfClass(self, objClass):
         """ returns dict of doId:object, containing all objects
         that inherit from 'class'. returned dict is safely mutable. """
-        doDict = {}
-        for doId, do in self.doId2do.items():
-            if isinstance(do, objClass):
-                doDict[doId] = do
-        return doDict
+        return dict(self.doId2do.getObjectsOfClass(objClass))
 
     def getObjectsOfExactClass(self, objClass):
         """ returns dict of doId:object, containing all objects that
         are exactly of type 'class' (neglecting inheritance). returned
         dict is safely mutable. """
-        doDict = {}
-        for doId, do in self.doId2do.items():
-            if do.__class__ == objClass:
-                doDict[doId] = do
-        return doDict
+        return dict(self.doId2do.getObjectsOfExactClass(objClass))
 
     def considerHeartbeat(self):
         """Send a heartbeat message if we haven't sent one recently."""
@@ -8,6 +8,7 @@ from direct.distributed.DoCollectionManager import DoCollectionManager
 from direct.showbase import GarbageReport
 from direct.showbase.MessengerGlobal import messenger
 from .PyDatagramIterator import PyDatagramIterator
+from .GCScheduler import GCScheduler
 
 import gc
 
@@ -129,12 +130,24 @@ class ConnectionRepository(
             # garbage collection CPU usage is O(n), n = number of Python objects
             gc.set_debug(gc.DEBUG_SAVEALL)
 
+        self.gcScheduler = None
         if self.config.GetBool('want-garbage-collect-task', 1):
-            # manual garbage-collect task
-            taskMgr.add(self._garbageCollect, self.GarbageCollectTaskName, 200)
-            # periodically increase gc threshold if there is no garbage
-            taskMgr.doMethodLater(self.config.GetFloat('garbage-threshold-adjust-delay', 5 * 60.),
-                                  self._adjustGcThreshold, self.GarbageThresholdTaskName)
+            if self.config.GetBool('want-gc-scheduler', 0):
+                # collect one generation at a time in measured slices, and
+                # save long full collections for idle frames
+                self.gcScheduler = GCScheduler(
+                    self.config.GetFloat('gc-frame-budget', 0.002),
+                    self.config.GetFloat('gc-max-full-delay', 120.))
+                self.gcScheduler.start()
+                taskMgr.add(self._scheduleGarbageCollect, self.GarbageCollectTaskName, 200)
+            else:
+                # manual garbage-collect task
+                taskMgr.add(self._garbageCollect, self.GarbageCollectTaskName, 200)
+                # periodically increase gc threshold if there is no garbage.
+                # Not with the scheduler: the leak check is a full collect
+                # on whatever frame the task happens to run.
+                taskMgr.doMethodLater(self.config.GetFloat('garbage-threshold-adjust-delay', 5 * 60.),
+                                      self._adjustGcThreshold, self.GarbageThresholdTaskName)
 
         self._gcDefaultThreshold = gc.get_threshold()
 
@@ -151,6 +164,19 @@ class ConnectionRepository(
         gc.disable()
         return Task.cont
 
+    def _scheduleGarbageCollect(self, task=None):
+        self.gcScheduler.update()
+        return Task.cont
+
+    def setGcIdle(self, idle):
+        """
+        Tells the garbage collect scheduler, if it's enabled, whether the
+        game is idle (for instance, on a loading screen), which is when
+        it runs full collections.
+        """
+        if self.gcScheduler:
+            self.gcScheduler.setIdle(idle)
+
     def _adjustGcThreshold(self, task):
         # do an unconditional collect to make sure gc.garbage has a chance to be
         # populated before we start increasing the auto-collect threshold
@@ -17,6 +17,7 @@ class DistributedNode(DistributedObject.DistributedObject, NodePath):
 
     def disable(self):
         if self.activeState != DistributedObject.ESDisabled:
+            self.cr.doSpatialIndex.removeObject(self)
             if not self.isEmpty():
                 self.reparentTo(hidden)
             DistributedObject.DistributedObject.disable(self)
@@ -32,6 +33,23 @@ class DistributedNode(DistributedObject.DistributedObject, NodePath):
         DistributedObject.DistributedObject.generate(self)
         self.gotStringParentToken = 0
 
+    def announceGenerate(self):
+        DistributedObject.DistributedObject.announceGenerate(self)
+        self.updateSpatialIndex()
+
+    def updateSpatialIndex(self):
+        """
+        Records the node's current position in the repository's spatial
+        index, which is used for distance queries such as
+        cr.dosByDistance().  This is done automatically as smooth nodes move
+        and by the set methods below, but should be called after moving the
+        node some other way if the distance queries need to see it.
+        """
+        if self.isEmpty():
+            self.cr.doSpatialIndex.removeObject(self)
+        else:
+            self.cr.doSpatialIndex.updateObject(self, self.getPos(render))
+
     def __cmp__(self, other):
         # DistributedNode inherits from NodePath, which inherits a
         # definition of __cmp__ from FFIExternalObject that uses the
@@ -118,12 +136,14 @@ class DistributedNode(DistributedObject.DistributedObject, NodePath):
     def setXY(self, x, y):
         self.setX(x)
         self.setY(y)
+        self.updateSpatialIndex()
     def d_setXY(self, x, y):
         self.sendUpdate("setXY", [x, y])
 
     def setXZ(self, x, z):
         self.setX(x)
         self.setZ(z)
+        self.updateSpatialIndex()
     def d_setXZ(self, x, z):
         self.sendUpdate("setXZ", [x, z])
 
@@ -139,12 +159,14 @@ class DistributedNode(DistributedObject.DistributedObject, NodePath):
         self.setX(x)
         self.setY(y)
         self.setH(h)
+        self.updateSpatialIndex()
     def d_setXYH(self, x, y, h):
         self.sendUpdate("setXYH", [x, y, h])
 
     def setXYZH(self, x, y, z, h):
         self.setPos(x, y, z)
         self.setH(h)
+        self.updateSpatialIndex()
     def d_setXYZH(self, x, y, z, h):
         self.sendUpdate("setXYZH", [x, y, z, h])
 
@@ -128,6 +128,7 @@ class DistributedSmoothNode(DistributedNode.DistributedNode,
         if self.smoother.computeSmoothPosition():
             self.smoother.applySmoothPos(self)
             self.smoother.applySmoothHpr(self)
+            self.updateSpatialIndex()
         elif self.stopped:
             self.fullyStopped = True
 
@@ -183,6 +184,7 @@ class DistributedSmoothNode(DistributedNode.DistributedNode,
         if (not self.isLocal()) and \
            self.smoother.getLatestPosition():
             self.smoother.applySmoothPosHpr(self, self)
+            self.updateSpatialIndex()
         self.smoother.clearPositions(1)
 
     def reloadPosition(self):
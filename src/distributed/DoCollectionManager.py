@@ -1,4 +1,6 @@
 from direct.distributed import DoHierarchy
+from direct.distributed.DoTable import DoTable
+from direct.distributed.DoSpatialIndex import DoSpatialIndex
 import re
 
 #hack:
@@ -8,18 +10,22 @@ BAD_CHANNEL_ID = 0 # 0xFFFFFFFFFFFFFFFF
 
 class DoCollectionManager:
     def __init__(self):
-        # Dict of {DistributedObject ids: DistributedObjects}
-        self.doId2do = {}
+        # Dict of {DistributedObject ids: DistributedObjects}, also indexed
+        # by class for the type queries below
+        self.doId2do = DoTable()
         # (parentId, zoneId) to dict of doId->DistributedObjectAI
         ## self.zoneId2doIds={}
         if self.hasOwnerView():
             # Dict of {DistributedObject ids: DistributedObjects}
             # for 'owner' views of objects
-            self.doId2ownerView = {}
+            self.doId2ownerView = DoTable()
         # Dict of {
         #   parent DistributedObject id:
         #     { zoneIds: [child DistributedObject ids] }}
         self._doHierarchy = DoHierarchy.DoHierarchy()
+        # Positions of the DistributedNodes in doId2do, relative to render,
+        # for distance queries.  Nodes keep their own entries up to date.
+        self.doSpatialIndex = DoSpatialIndex()
 
     def getDo(self, doId):
         return self.doId2do.get(doId)
@@ -93,33 +99,22 @@ class DoCollectionManager:
         return matches, len(matches)
 
     def doFindAllInstances(self, cls):
-        matches = []
-        for value in self.doId2do.values():
-            if isinstance(value, cls):
-                matches.append(value)
-        return matches
+        return list(self.doId2do.getObjectsOfClass(cls).values())
 
     def _getDistanceFromLA(self, do):
         if hasattr(do, 'getPos'):
             return do.getPos(localAvatar).length()
         return None
 
-    def _compareDistance(self, do1, do2):
-        dist1 = self._getDistanceFromLA(do1)
-        dist2 = self._getDistanceFromLA(do2)
-        if dist1 is None and dist2 is None:
-            return 0
-        if dist1 is None:
-            return 1
-        if dist2 is None:
-            return -1
-        if dist1 < dist2:
-            return -1
-        return 1
-
     def dosByDistance(self):
-        objs = list(self.doId2do.values())
-        objs.sort(cmp=self._compareDistance)
+        """
+        Returns all distributed objects, nearest to localAvatar first, going
+        by the positions in doSpatialIndex.  Objects without a position come
+        last.
+        """
+        objs = self.doSpatialIndex.getSortedByDistance(localAvatar.getPos(render))
+        objs.extend([do for do in self.doId2do.values()
+                     if do not in self.doSpatialIndex])
         return objs
 
     def doByDistance(self):
@@ -218,46 +213,29 @@ class DoCollectionManager:
 
     def getOwnerViewDoList(self, classType):
         assert self.hasOwnerView()
-        l = []
-        for obj in self.doId2ownerView.values():
-            if isinstance(obj, classType):
-                l.append(obj)
-        return l
+        return list(self.doId2ownerView.getObjectsOfClass(classType).values())
 
     def getOwnerViewDoIdList(self, classType):
         assert self.hasOwnerView()
-        l = []
-        for doId, obj in self.doId2ownerView.items():
-            if isinstance(obj, classType):
-                l.append(doId)
-        return l
+        return list(self.doId2ownerView.getObjectsOfClass(classType).keys())
 
     def countObjects(self, classType):
         """
         Counts the number of objects of the given type in the
         repository (for testing purposes)
         """
-        count = 0
-        for dobj in self.doId2do.values():
-            if isinstance(dobj, classType):
-                count += 1
-        return count
+        return len(self.doId2do.getObjectsOfClass(classType))
 
 
     def getAllOfType(self, type):
         # Returns a list of all DistributedObjects in the repository
         # of a particular type.
-        result = []
-        for obj in self.doId2do.values():
-            if isinstance(obj, type):
-                result.append(obj)
-        return result
+        return list(self.doId2do.getObjectsOfClass(type).values())
 
     def findAnyOfType(self, type):
         # Searches the repository for any object of the given type.
-        for obj in self.doId2do.values():
-            if isinstance(obj, type):
-                return obj
+        for obj in self.doId2do.getObjectsOfClass(type).values():
+            return obj
         return None
 
     #----------------------------------
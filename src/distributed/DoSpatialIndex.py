@@ -0,0 +1,239 @@
+"""DoSpatialIndex module: contains the DoSpatialIndex class"""
+
+from panda3d.core import ConfigVariableDouble
+import heapq
+import math
+
+
+class DoSpatialIndex:
+    """
+    Indexes distributed objects by position on a uniform grid of columns in
+    the XY plane, so that nearest-object and radius queries only have to look
+    at the objects in the surrounding cells.
+
+    Positions are whatever the objects last reported through
+    updateObject(); the index never reads them back from the objects itself.
+    Distances are true 3D distances.
+    """
+
+    CellSize = ConfigVariableDouble('do-spatial-index-cell-size', 64.0)
+
+    def __init__(self, cellSize=None):
+        if cellSize is None:
+            cellSize = self.CellSize.getValue()
+        self.cellSize = cellSize
+        self._invCellSize = 1.0 / cellSize
+        # (cellX, cellY) -> {doId: do}
+        self._cells = {}
+        # doId -> (cellKey, x, y, z, do)
+        self._entries = {}
+        # Bounds of the cells that have ever been occupied.  They only grow,
+        # which is fine since they're only used to stop searches early.
+        self._minCell = None
+        self._maxCell = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, do):
+        return do.doId in self._entries
+
+    def _getCellKey(self, x, y):
+        inv = self._invCellSize
+        return (math.floor(x * inv), math.floor(y * inv))
+
+    def updateObject(self, do, pos):
+        """
+        Records the position of the object, adding it to the index if it
+        isn't already in it.
+        """
+        doId = do.doId
+        x = pos[0]
+        y = pos[1]
+        z = pos[2]
+        key = self._getCellKey(x, y)
+        entry = self._entries.get(doId)
+        if entry is not None and entry[0] != key:
+            self._removeFromCell(entry[0], doId)
+            entry = None
+        if entry is None:
+            self._cells.setdefault(key, {})[doId] = do
+            if self._minCell is None:
+                self._minCell = key
+                self._maxCell = key
+            else:
+                self._minCell = (min(self._minCell[0], key[0]), min(self._minCell[1], key[1]))
+                self._maxCell = (max(self._maxCell[0], key[0]), max(self._maxCell[1], key[1]))
+        self._entries[doId] = (key, x, y, z, do)
+
+    def removeObject(self, do):
+        entry = self._entries.pop(do.doId, None)
+        if entry is not None:
+            self._removeFromCell(entry[0], do.doId)
+
+    def clear(self):
+        self._cells = {}
+        self._entries = {}
+        self._minCell = None
+        self._maxCell = None
+
+    def _removeFromCell(self, key, doId):
+        cell = self._cells[key]
+        del cell[doId]
+        if not cell:
+            del self._cells[key]
+
+    def getPos(self, do):
+        """
+        Returns the last recorded position of the object as an (x, y, z)
+        tuple, or None if it isn't in the index.
+        """
+        entry = self._entries.get(do.doId)
+        if entry is None:
+            return None
+        return entry[1:4]
+
+    def _distSq(self, entry, x, y, z):
+        dx = entry[1] - x
+        dy = entry[2] - y
+        dz = entry[3] - z
+        return dx * dx + dy * dy + dz * dz
+
+    def _iterRing(self, centerKey, ring):
+        # Yields the occupied cells exactly `ring` cells away from the center
+        # cell, that is, the border of a (2 * ring + 1)^2 square of cells.
+        cx, cy = centerKey
+        cells = self._cells
+        if ring == 0:
+            cell = cells.get(centerKey)
+            if cell:
+                yield cell
+            return
+        for i in range(-ring, ring + 1):
+            for key in ((cx + i, cy - ring), (cx + i, cy + ring)):
+                cell = cells.get(key)
+                if cell:
+                    yield cell
+        for j in range(-ring + 1, ring):
+            for key in ((cx - ring, cy + j), (cx + ring, cy + j)):
+                cell = cells.get(key)
+                if cell:
+                    yield cell
+
+    def _getMaxRing(self, centerKey):
+        # How many rings out we have to search before we've covered every
+        # cell that could contain an object.
+        if self._minCell is None:
+            return -1
+        cx, cy = centerKey
+        return max(cx - self._minCell[0], self._maxCell[0] - cx,
+                   cy - self._minCell[1], self._maxCell[1] - cy)
+
+    def getNearest(self, pos, count=1, maxDistance=None, filter=None):
+        """
+        Returns a list of up to count objects nearest to pos, nearest first.
+        If maxDistance is given, only objects within that distance are
+        considered.  If filter is given, only objects for which filter(do)
+        returns true are considered.
+        """
+        if count <= 0 or not self._entries:
+            return []
+
+        x = pos[0]
+        y = pos[1]
+        z = pos[2]
+        centerKey = self._getCellKey(x, y)
+        maxRing = self._getMaxRing(centerKey)
+        if maxDistance is not None:
+            maxDistSq = maxDistance * maxDistance
+            maxRing = min(maxRing, int(math.ceil(maxDistance * self._invCellSize)))
+        else:
+            maxDistSq = None
+
+        entries = self._entries
+        # Max-heap of the best candidates so far, as (-distSq, seq, do).
+        best = []
+        seq = 0
+        ring = 0
+        while ring <= maxRing:
+            for cell in self._iterRing(centerKey, ring):
+                for doId, do in cell.items():
+                    distSq = self._distSq(entries[doId], x, y, z)
+                    if maxDistSq is not None and distSq > maxDistSq:
+                        continue
+                    if len(best) == count and distSq >= -best[0][0]:
+                        continue
+                    if filter is not None and not filter(do):
+                        continue
+                    seq += 1
+                    if len(best) == count:
+                        heapq.heapreplace(best, (-distSq, seq, do))
+                    else:
+                        heapq.heappush(best, (-distSq, seq, do))
+
+            if len(best) == count:
+                # Everything outside the rings searched so far is at least
+                # this far away from pos.
+                reach = ring * self.cellSize
+                if -best[0][0] <= reach * reach:
+                    break
+            ring += 1
+
+        best.sort(key=lambda item: (-item[0], item[1]))
+        return [item[2] for item in best]
+
+    def getInRadius(self, pos, radius, filter=None):
+        """
+        Returns a list of the objects within radius of pos, in no particular
+        order.  If filter is given, only objects for which filter(do) returns
+        true are included.
+        """
+        return [do for distSq, do in self._getInRadius(pos, radius, filter)]
+
+    def _getInRadius(self, pos, radius, filter):
+        x = pos[0]
+        y = pos[1]
+        z = pos[2]
+        radiusSq = radius * radius
+        entries = self._entries
+
+        minKey = self._getCellKey(x - radius, y - radius)
+        maxKey = self._getCellKey(x + radius, y + radius)
+        numCells = (maxKey[0] - minKey[0] + 1) * (maxKey[1] - minKey[1] + 1)
+        if numCells > len(self._cells):
+            # Cheaper to look at every occupied cell.
+            cells = self._cells.values()
+        else:
+            cells = []
+            for cx in range(minKey[0], maxKey[0] + 1):
+                for cy in range(minKey[1], maxKey[1] + 1):
+                    cell = self._cells.get((cx, cy))
+                    if cell:
+                        cells.append(cell)
+
+        result = []
+        for cell in cells:
+            for doId, do in cell.items():
+                distSq = self._distSq(entries[doId], x, y, z)
+                if distSq <= radiusSq and (filter is None or filter(do)):
+                    result.append((distSq, do))
+        return result
+
+    def getSortedByDistance(self, pos, maxDistance=None, filter=None):
+        """
+        Returns a list of the objects in the index sorted by distance from
+        pos, nearest first.  If maxDistance is given, only objects within
+        that distance are included.  If filter is given, only objects for
+        which filter(do) returns true are included.
+        """
+        if maxDistance is not None:
+            items = self._getInRadius(pos, maxDistance, filter)
+        else:
+            x = pos[0]
+            y = pos[1]
+            z = pos[2]
+            items = [(self._distSq(entry, x, y, z), entry[4])
+                     for entry in self._entries.values()
+                     if filter is None or filter(entry[4])]
+        items.sort(key=lambda item: item[0])
+        return [do for distSq, do in items]
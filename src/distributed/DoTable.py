@@ -0,0 +1,106 @@
+"""DoTable module: contains the DoTable class"""
+
+
+class DoTable(dict):
+    """
+    A dictionary of doId to distributed object that also keeps its objects
+    indexed by class, both by the exact class of each object and by every
+    class in its MRO.  This lets queries for all objects of a particular type
+    look at just the matching objects instead of the whole table.
+
+    The index is maintained as objects are added to and removed from the
+    table, so it behaves exactly like the plain dictionary it replaces.
+    """
+
+    def __init__(self):
+        dict.__init__(self)
+        # {class: {doId: do}} for the exact class of each object.
+        self._byExactClass = {}
+        # {class: {doId: do}} for each class in the MRO of each object.
+        self._byClass = {}
+
+    def __setitem__(self, doId, do):
+        old = dict.get(self, doId)
+        if old is do:
+            return
+        if old is not None:
+            self._unindex(doId, old)
+        dict.__setitem__(self, doId, do)
+        self._index(doId, do)
+
+    def __delitem__(self, doId):
+        do = dict.pop(self, doId)
+        self._unindex(doId, do)
+
+    def pop(self, doId, *args):
+        if doId not in self:
+            return dict.pop(self, doId, *args)
+        do = dict.pop(self, doId)
+        self._unindex(doId, do)
+        return do
+
+    def popitem(self):
+        doId, do = dict.popitem(self)
+        self._unindex(doId, do)
+        return doId, do
+
+    def setdefault(self, doId, do=None):
+        if doId not in self:
+            self[doId] = do
+        return dict.__getitem__(self, doId)
+
+    def update(self, *args, **kwArgs):
+        for doId, do in dict(*args, **kwArgs).items():
+            self[doId] = do
+
+    def clear(self):
+        dict.clear(self)
+        self._byExactClass.clear()
+        self._byClass.clear()
+
+    def copy(self):
+        return dict(self)
+
+    def _index(self, doId, do):
+        cls = do.__class__
+        self._byExactClass.setdefault(cls, {})[doId] = do
+        for base in cls.__mro__:
+            self._byClass.setdefault(base, {})[doId] = do
+
+    def _unindex(self, doId, do):
+        cls = do.__class__
+        self._removeFromIndex(self._byExactClass, cls, doId)
+        for base in cls.__mro__:
+            self._removeFromIndex(self._byClass, base, doId)
+
+    def _removeFromIndex(self, index, cls, doId):
+        objects = index.get(cls)
+        if objects is not None:
+            objects.pop(doId, None)
+            if not objects:
+                del index[cls]
+
+    def getObjectsOfClass(self, cls):
+        """
+        Returns a read-only view of {doId: do} for all objects in the table
+        that are instances of cls, which may also be a tuple of classes like
+        with isinstance().  Don't modify the returned dictionary, and copy it
+        if the table may change while it is in use.
+        """
+        if isinstance(cls, tuple):
+            objects = {}
+            for c in cls:
+                objects.update(self.getObjectsOfClass(c))
+            return objects
+        if type(cls) is not type:
+            # A custom metaclass (such as an ABC) can make isinstance() more
+            # than a matter of inheritance, so check each object.
+            return {doId: do for doId, do in self.items() if isinstance(do, cls)}
+        return self._byClass.get(cls, {})
+
+    def getObjectsOfExactClass(self, cls):
+        """
+        Returns a read-only view of {doId: do} for all objects in the table
+        whose class is exactly cls.  Same caveats as getObjectsOfClass().
+        """
+        return self._byExactClass.get(cls, {})
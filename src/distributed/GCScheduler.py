@@ -0,0 +1,239 @@
+"""GCScheduler module: contains the GCScheduler class"""
+
+from direct.directnotify.DirectNotifyGlobal import directNotify
+
+import gc
+import time
+
+__all__ = ["GCScheduler"]
+
+
+class GCScheduler:
+    """
+    Takes over scheduling of Python's cyclic garbage collector from the
+    interpreter, to keep collections from causing frame hitches.
+
+    Automatic collection is disabled, and update() is called once per frame
+    to run whichever generation the collector's usual thresholds say is due.
+    The pause of every collection is measured per generation, and a
+    collection that is predicted to take longer than the frame budget is put
+    off:
+
+    - A generation 1 collection may be put off until its count reaches twice
+      its threshold, running a generation 0 collection in the meantime.
+    - A full (generation 2) collection only ever runs on an idle frame or
+      loading screen, as reported through setIdle(), or when the game asks
+      for one with collectFull().  Like the interpreter, the scheduler only
+      considers a full collection due once the objects that survived into
+      the oldest generation since the last one amount to a quarter of those
+      that were there after it.  If one has been due for more than
+      maxFullDelay seconds, a warning is logged, but it is still put off.
+    """
+
+    notify = directNotify.newCategory("GCScheduler")
+
+    # Weight given to the newest pause when averaging pause times.
+    PauseSmoothing = 0.25
+
+    def __init__(self, frameBudget=0.002, maxFullDelay=120.0):
+        # Longest collection pause, in seconds, that may be taken on a
+        # regular frame.
+        self.frameBudget = frameBudget
+        # Time, in seconds, a due full collection may be put off before
+        # we warn about it.
+        self.maxFullDelay = maxFullDelay
+
+        self.idle = False
+        self.running = False
+        self._wasEnabled = gc.isenabled()
+        self._collectStart = None
+        # Time a full collection first became due, or None if none is due.
+        self._fullDueTime = None
+        self._nextOverdueWarning = None
+
+        # The interpreter's long_lived_total and long_lived_pending: the
+        # number of objects in the oldest generation after the last full
+        # collection, and the number that have been moved there since.
+        self.longLivedTotal = 0
+        self.longLivedPending = 0
+        self._youngCount = 0
+
+        self.resetStats()
+
+    def resetStats(self):
+        # Per-generation pause statistics.  Times are in seconds.
+        self.numCollections = [0, 0, 0]
+        self.totalPause = [0.0, 0.0, 0.0]
+        self.maxPause = [0.0, 0.0, 0.0]
+        self.lastPause = [0.0, 0.0, 0.0]
+        self.averagePause = [None, None, None]
+        self.numCollected = [0, 0, 0]
+        self.numDeferred = [0, 0, 0]
+        self.numOverdue = 0
+
+    def start(self):
+        """
+        Disables automatic collection and starts measuring collection
+        pauses.  update() must be called each frame from now on.
+        """
+        if self.running:
+            return
+        self.running = True
+        self._wasEnabled = gc.isenabled()
+        gc.disable()
+        gc.callbacks.append(self._gcCallback)
+        self.longLivedTotal = len(gc.get_objects(generation=2))
+        self.longLivedPending = 0
+
+    def stop(self):
+        """
+        Hands collection back to the interpreter.
+        """
+        if not self.running:
+            return
+        self.running = False
+        if self._gcCallback in gc.callbacks:
+            gc.callbacks.remove(self._gcCallback)
+        if self._wasEnabled:
+            gc.enable()
+
+    def _gcCallback(self, phase, info):
+        # Called by the interpreter around every collection, including any
+        # not started by us, so that all pauses are accounted for.
+        if phase == 'start':
+            if info['generation'] == 1:
+                # Everything in the young generations that survives this
+                # collection is moved to the oldest generation.
+                self._youngCount = len(gc.get_objects(generation=0)) + \
+                                   len(gc.get_objects(generation=1))
+            self._collectStart = time.perf_counter()
+        elif self._collectStart is not None:
+            pause = time.perf_counter() - self._collectStart
+            self._collectStart = None
+            generation = info['generation']
+            if generation == 1:
+                self.longLivedPending += max(self._youngCount - info['collected'], 0)
+            elif generation == 2:
+                self.longLivedTotal = len(gc.get_objects(generation=2))
+                self.longLivedPending = 0
+            self._recordPause(generation, pause, info['collected'])
+
+    def _recordPause(self, generation, pause, collected):
+        self.numCollections[generation] += 1
+        self.totalPause[generation] += pause
+        self.lastPause[generation] = pause
+        self.maxPause[generation] = max(self.maxPause[generation], pause)
+        self.numCollected[generation] += collected
+        average = self.averagePause[generation]
+        if average is None:
+            self.averagePause[generation] = pause
+        else:
+            self.averagePause[generation] = average + (pause - average) * self.PauseSmoothing
+        if generation == 2:
+            self._fullDueTime = None
+
+        if pause > self.frameBudget:
+            self.notify.debug('generation %s collection took %.2f ms' % (generation, pause * 1000.0))
+
+    def _fitsBudget(self, generation):
+        average = self.averagePause[generation]
+        # If we've never measured a generation, we have to try it to find out.
+        return average is None or average <= self.frameBudget
+
+    def setIdle(self, idle):
+        """
+        Indicates whether the game is currently idle, such as on a loading
+        screen, so that a long collection won't be noticed.  Full
+        collections that are due are run while idle.
+        """
+        self.idle = idle
+
+    def collectFull(self, freeze=False):
+        """
+        Runs a full collection right away.  Call this during a loading
+        screen or other moment where a pause won't be noticed.  If freeze is
+        true, every object that survives is moved to the permanent
+        generation afterwards, so that it is no longer scanned by future
+        collections; this is useful after loading a zone, since most of
+        what was loaded will live until the zone is left.
+        """
+        collected = gc.collect(2)
+        if freeze:
+            gc.freeze()
+            # The frozen objects are no longer scanned, so they don't count
+            # towards the next full collection.
+            self.longLivedTotal = len(gc.get_objects(generation=2))
+        return collected
+
+    def getDueGeneration(self):
+        """
+        Returns the oldest generation that the collector's thresholds say
+        should be collected now, or -1 if no collection is due.  This
+        follows the interpreter's own rules, including the one that puts
+        off full collections until enough long-lived objects have piled up.
+        """
+        threshold0, threshold1, threshold2 = gc.get_threshold()
+        count0, count1, count2 = gc.get_count()
+        if threshold0 == 0 or count0 < threshold0:
+            return -1
+        # Collecting generation 0 counts towards generation 1, and so on.
+        if count1 + 1 >= threshold1:
+            if count2 + 1 >= threshold2 and \
+               self.longLivedPending > self.longLivedTotal // 4:
+                return 2
+            return 1
+        return 0
+
+    def update(self):
+        """
+        Runs any collection that is due and fits into this frame.  Should be
+        called once per frame.  Returns the generation collected, or -1.
+        """
+        generation = self.getDueGeneration()
+        if generation < 0:
+            return -1
+
+        if generation == 2 and not self.idle:
+            # Wait for an idle frame, however long that takes.
+            self.numDeferred[2] += 1
+            generation = 1
+            now = time.perf_counter()
+            if self._fullDueTime is None:
+                self._fullDueTime = now
+                self._nextOverdueWarning = now + self.maxFullDelay
+            elif now >= self._nextOverdueWarning:
+                self.numOverdue += 1
+                self.notify.warning('full collection has been due for %d seconds; '
+                                    'call setIdle() or collectFull() during a '
+                                    'loading screen' % (now - self._fullDueTime))
+                self._nextOverdueWarning = now + self.maxFullDelay
+
+        if generation == 1 and not self.idle and not self._fitsBudget(1):
+            threshold1 = gc.get_threshold()[1]
+            if gc.get_count()[1] < threshold1 * 2:
+                self.numDeferred[1] += 1
+                generation = 0
+
+        gc.collect(generation)
+        return generation
+
+    def getStats(self):
+        """
+        Returns a dictionary of collection statistics per generation, with
+        pause times in milliseconds.
+        """
+        stats = {}
+        for generation in range(3):
+            count = self.numCollections[generation]
+            average = self.averagePause[generation]
+            stats[generation] = {
+                'collections': count,
+                'collected': self.numCollected[generation],
+                'deferred': self.numDeferred[generation],
+                'overdue': self.numOverdue if generation == 2 else 0,
+                'lastPause': self.lastPause[generation] * 1000.0,
+                'maxPause': self.maxPause[generation] * 1000.0,
+                'averagePause': (average or 0.0) * 1000.0,
+                'meanPause': (self.totalPause[generation] / count * 1000.0) if count else 0.0,
+            }
+        return stats
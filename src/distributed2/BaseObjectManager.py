@@ -1,9 +1,14 @@
 from direct.showbase.DirectObject import DirectObject
 from direct.directnotify.DirectNotifyGlobal import directNotify
 
-from panda3d.direct import DCFile
+from panda3d.direct import DCFile, DCPacker
 from panda3d.core import getModelPath, Filename, VirtualFileSystem
 
+from direct.distributed.PyDatagram import PyDatagram
+
+from .FieldPlan import FieldPlan
+from .NetMessages import NetMessages
+
 import inspect
 
 class BaseObjectManager(DirectObject):
@@ -22,6 +27,14 @@ class BaseObjectManager(DirectObject):
         if hasOwnerView:
             self.doId2ownerView = {}
 
+        # FieldPlans by (dclass number, field name) and (dclass number, field
+        # number).  Unknown fields are cached as None.
+        self.fieldPlansByName = {}
+        self.fieldPlansByNumber = {}
+        # Reused for packing and unpacking object messages.
+        self.messagePacker = DCPacker()
+        self.messageUnpacker = DCPacker()
+
     def getDo(self, doId):
         return self.doId2do.get(doId)
 
@@ -31,12 +44,85 @@ class BaseObjectManager(DirectObject):
     def hasOwnerView(self):
         return self._hasOwnerView
 
+    def getFieldPlanByName(self, dclass, name):
+        """
+        Returns the FieldPlan for the named field of the indicated dclass, or
+        None if the dclass has no such field.
+        """
+        key = (dclass.getNumber(), name)
+        try:
+            return self.fieldPlansByName[key]
+        except KeyError:
+            pass
+
+        field = dclass.getFieldByName(name)
+        plan = FieldPlan(field) if field else None
+        self.fieldPlansByName[key] = plan
+        return plan
+
+    def getFieldPlanByNumber(self, dclass, number):
+        """
+        Returns the FieldPlan for the numbered field of the indicated dclass,
+        or None if the dclass has no such field.
+        """
+        key = (dclass.getNumber(), number)
+        try:
+            return self.fieldPlansByNumber[key]
+        except KeyError:
+            pass
+
+        field = dclass.getFieldByIndex(number)
+        plan = FieldPlan(field) if field else None
+        self.fieldPlansByNumber[key] = plan
+        return plan
+
+    def packObjectMessage(self, do, plan, args):
+        """
+        Packs an object message for the indicated field of the object.
+        Returns the message datagram, or None if the arguments could not be
+        packed.
+        """
+        packer = self.messagePacker
+        packer.clearData()
+        packer.rawPackUint16(NetMessages.B_ObjectMessage)
+        packer.rawPackUint32(do.doId)
+        packer.rawPackUint16(plan.number)
+
+        packer.beginPack(plan.field)
+        try:
+            plan.field.packArgs(packer, args)
+        finally:
+            # Always leave the packer ready for the next message.
+            packed = packer.endPack()
+        if not packed:
+            return None
+
+        return PyDatagram(packer.getBytes())
+
+    def unpackObjectMessage(self, do, plan, dgi):
+        """
+        Unpacks the rest of the datagram as the arguments of the indicated
+        field, and calls the field's method on the object with them.  Returns
+        False if the message could not be unpacked.
+        """
+        packer = self.messageUnpacker
+        packer.setUnpackData(dgi.getRemainingBytes())
+        packer.beginUnpack(plan.field)
+        try:
+            plan.field.receiveUpdate(packer, do)
+        finally:
+            # Always leave the packer ready for the next message.
+            unpacked = packer.endUnpack()
+        return unpacked
+
     def readDCFiles(self, dcFileNames = None):
         dcFile = self.dcFile
         dcFile.clear()
         self.dclassesByName = {}
         self.dclassesByNumber = {}
         self.hashVal = 0
+        self.fieldPlansByName = {}
+        self.fieldPlansByNumber = {}
 
         vfs = VirtualFileSystem.getGlobalPtr()
 
@@ -0,0 +1,141 @@
+from direct.directnotify.DirectNotifyGlobal import directNotify
+
+class ClientRateController:
+    """
+    Keeps the data the server sends to a single client within a byte budget.
+
+    Sent bytes are charged against a token bucket that refills at the
+    client's current rate.  While the bucket is in debt, the client is
+    choked and doesn't receive snapshots, which stretches out its snapshot
+    interval until the link catches up.
+
+    The rate itself adapts to the client's link.  If the client's round-trip
+    time climbs well above the lowest we've seen (data is queueing up
+    somewhere), the rate is cut multiplicatively.  Otherwise it recovers
+    gradually, up to the configured maximum.
+    """
+
+    notify = directNotify.newCategory("ClientRateController")
+
+    # How many seconds worth of data the bucket can hold.
+    BurstTime = 0.25
+    # Multiplier applied to the rate when backing off.
+    BackoffFactor = 0.75
+    # Minimum time between two back offs, in seconds.
+    BackoffInterval = 0.5
+    # Fraction of the maximum rate recovered per second.
+    RecoveryFraction = 0.05
+    # The link is considered congested if the average RTT exceeds the
+    # lowest RTT seen by this factor (plus RttSlack milliseconds).
+    RttFactor = 1.5
+    RttSlack = 20
+    # Window over which the measured send rate is averaged, in seconds.
+    StatsWindow = 1.0
+
+    def __init__(self, maxRate, minRate):
+        self.maxRate = maxRate
+        self.minRate = min(minRate, maxRate)
+        self.rate = maxRate
+
+        self.tokens = self.rate * self.BurstTime
+        self.lastUpdateTime = None
+        self.lastBackoffTime = 0.0
+
+        self.minRtt = 0
+        self.averageRtt = 0
+
+        # Statistics.
+        self.totalBytes = 0
+        self.windowBytes = 0
+        self.windowStart = None
+        self.bytesPerSec = 0.0
+        self.numChoked = 0
+        self.numBackoffs = 0
+
+    def update(self, now):
+        """
+        Refills the bucket and adjusts the rate for the time elapsed since
+        the last update.
+        """
+        if self.lastUpdateTime is None:
+            self.lastUpdateTime = now
+            self.windowStart = now
+            return
+
+        dt = now - self.lastUpdateTime
+        if dt <= 0:
+            return
+        self.lastUpdateTime = now
+
+        if self.isCongested():
+            self.backoff(now)
+        elif self.rate < self.maxRate:
+            self.rate = min(self.maxRate, self.rate + self.maxRate * self.RecoveryFraction * dt)
+
+        self.tokens = min(self.rate * self.BurstTime, self.tokens + self.rate * dt)
+
+        elapsed = now - self.windowStart
+        if elapsed >= self.StatsWindow:
+            self.bytesPerSec = self.windowBytes / elapsed
+            self.windowBytes = 0
+            self.windowStart = now
+
+    def canSend(self, now):
+        """
+        Returns True if the client's link has room for another snapshot.
+        """
+        self.update(now)
+        if self.tokens < 0:
+            # We're producing more data than the current rate allows.  Hold
+            # off until the bucket refills.
+            self.numChoked += 1
+            return False
+        return True
+
+    def recordSent(self, numBytes):
+        """
+        Charges the indicated number of sent bytes against the budget.
+        ServerRepository.sendConnectionDatagrams() does the same inline;
+        keep the two in step.
+        """
+        self.tokens -= numBytes
+        self.totalBytes += numBytes
+        self.windowBytes += numBytes
+
+    def updateRtt(self, averageRtt, currentRtt):
+        self.averageRtt = averageRtt
+        if currentRtt > 0 and (self.minRtt == 0 or currentRtt < self.minRtt):
+            self.minRtt = currentRtt
+
+    def isCongested(self):
+        if self.minRtt == 0 or self.averageRtt == 0:
+            return False
+        return self.averageRtt > self.minRtt * self.RttFactor + self.RttSlack
+
+    def backoff(self, now):
+        if now - self.lastBackoffTime < self.BackoffInterval:
+            return
+        self.lastBackoffTime = now
+        newRate = max(self.minRate, self.rate * self.BackoffFactor)
+        if newRate < self.rate:
+            self.numBackoffs += 1
+            assert self.notify.debug("Backing off to %i bytes/sec" % newRate)
+        self.rate = newRate
+
+    def getStats(self):
+        """
+        Returns a dictionary of the controller's current state, for
+        monitoring.
+        """
+        return {
+            'rate': int(self.rate),
+            'maxRate': self.maxRate,
+            'bytesPerSec': int(self.bytesPerSec),
+            'totalBytes': self.totalBytes,
+            'tokens': int(self.tokens),
+            'averageRtt': self.averageRtt,
+            'minRtt': self.minRtt,
+            'congested': self.isCongested(),
+            'numChoked': self.numChoked,
+            'numBackoffs': self.numBackoffs,
+        }
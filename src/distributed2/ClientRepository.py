@@ -1,5 +1,5 @@
 from panda3d.core import URLSpec, NetAddress, SteamNetworkSystem, SteamNetworkMessage
-from panda3d.direct import CClientRepository, DCPacker
+from panda3d.direct import CClientRepository
 
 from direct.distributed.PyDatagram import PyDatagram
 from direct.showbase.DirectObject import DirectObject
@@ -556,12 +556,12 @@ class ClientRepository(BaseObjectManager, CClientRepository):
         if not do.dclass:
             return
 
-        field = do.dclass.getFieldByName(name)
-        if not field:
+        plan = self.getFieldPlanByName(do.dclass, name)
+        if not plan:
             self.notify.warning("Tried to send update for non-existent field %s" % name)
             return
 
-        if field.asParameter():
+        if plan.isParameter:
             self.notify.warning("Tried to send parameter field as a message")
             return
 
@@ -569,24 +569,17 @@ class ClientRepository(BaseObjectManager, CClientRepository):
         # to be able to send this message.  The AI will double-check that the
         # field is clsend before unpacking the message, in case a modified
         # client removes this check.
-        #if not field.isClsend():
+        #if not plan.clsend:
         #    self.notify.warning("Tried to send a non-clsend message! Field %s" % name)
         #    self.disconnect()
         #    return
 
-        packer = DCPacker()
-        packer.rawPackUint16(NetMessages.B_ObjectMessage)
-        packer.rawPackUint32(do.doId)
-        packer.rawPackUint16(field.getNumber())
-
-        packer.beginPack(field)
-        field.packArgs(packer, args)
-        if not packer.endPack():
+        dg = self.packObjectMessage(do, plan, args)
+        if not dg:
             self.notify.warning("Failed to pack object message")
             return
 
-        dg = PyDatagram(packer.getBytes())
-        self.sendDatagram(dg, reliable = not field.hasKeyword("unreliable"))
+        self.sendDatagram(dg, reliable = plan.reliable)
 
     def __handleObjectMessage(self, dgi):
         doId = dgi.getUint32()
@@ -596,19 +589,15 @@ class ClientRepository(BaseObjectManager, CClientRepository):
             return
 
         fieldNumber = dgi.getUint16()
-        field = do.dclass.getFieldByIndex(fieldNumber)
-        if not field:
+        plan = self.getFieldPlanByNumber(do.dclass, fieldNumber)
+        if not plan:
             self.notify.warning("Received message on unknown field %i on object %i" % (fieldNumber, doId))
             return
 
-        if field.asParameter():
+        if plan.isParameter:
             self.notify.warning("Received message for parameter field?")
             return
 
         # We can safely pass this message onto the object
-        packer = DCPacker()
-        packer.setUnpackData(dgi.getRemainingBytes())
-        packer.beginUnpack(field)
-        field.receiveUpdate(packer, do)
-        if not packer.endUnpack():
+        if not self.unpackObjectMessage(do, plan, dgi):
             self.notify.warning("Failed to unpack message")
@@ -0,0 +1,23 @@
+class FieldPlan:
+    """
+    Precomputed information about a field of a DC class.  Sending and
+    receiving object messages goes through these instead of looking up the
+    field and checking its keywords on every message.
+    """
+
+    __slots__ = ('field', 'name', 'number', 'isParameter', 'reliable',
+                 'broadcast', 'ownrecv', 'clsend', 'ownsend')
+
+    def __init__(self, field):
+        self.field = field
+        self.name = field.getName()
+        self.number = field.getNumber()
+        self.isParameter = field.asParameter() is not None
+        self.reliable = not field.hasKeyword("unreliable")
+        self.broadcast = field.isBroadcast()
+        self.ownrecv = field.isOwnrecv()
+        self.clsend = field.isClsend()
+        self.ownsend = field.isOwnsend()
+
+    def __repr__(self):
+        return "FieldPlan(%s, %i)" % (self.name, self.number)
@@ -11,3 +11,31 @@ sv_snapshot_history = ConfigVariableInt("sv_snapshot_history", 50)
 sv_port = ConfigVariableInt("sv_port", 27015)
 sv_alternateticks = ConfigVariableBool("sv_alternateticks", False)
 sv_clockcorrection_msecs = ConfigVariableDouble("sv_clockcorrection_msecs", 60)
+# Number of threads used to format per-client snapshots in parallel.  0 means
+# snapshots are formatted one client at a time on the simulation task.
+sv_snapshot_threads = ConfigVariableInt("sv_snapshot_threads", 0)
+# Distance-based relevance filtering of snapshots.  When enabled, objects far
+# from a client's relevance origin are sent to that client less often.
+sv_relevance = ConfigVariableBool("sv_relevance", False)
+# Objects within this distance are sent in every snapshot.
+sv_relevance_full_rate_dist = ConfigVariableDouble("sv_relevance_full_rate_dist", 100)
+# Objects at or beyond this distance are sent at the lowest rate.
+sv_relevance_cull_dist = ConfigVariableDouble("sv_relevance_cull_dist", 500)
+# Number of snapshots between updates for the least relevant objects.
+sv_relevance_max_interval = ConfigVariableInt("sv_relevance_max_interval", 8)
+# Maximum number of objects sent to a client in a single snapshot.  0 means
+# there is no limit.
+sv_relevance_max_objects = ConfigVariableInt("sv_relevance_max_objects", 0)
+# Adapt the rate data is sent to each client to the client's link.
+sv_rate_control = ConfigVariableBool("sv_rate_control", False)
+# Maximum and minimum rate data may be sent to a single client, in bytes per
+# second.
+sv_max_rate = ConfigVariableInt("sv_max_rate", 80000)
+sv_min_rate = ConfigVariableInt("sv_min_rate", 5000)
+# Maximum number of client messages processed per frame.  0 means the poll
+# group is drained every frame.
+sv_max_messages_per_poll = ConfigVariableInt("sv_max_messages_per_poll", 0)
+# Maximum bytes of object generates sent to a client per tick after it opens
+# interest in new zones.  The rest are streamed over the following ticks, most
+# important objects first.  0 means all generates are sent at once.
+sv_interest_generate_budget = ConfigVariableInt("sv_interest_generate_budget", 0)
@@ -1,5 +1,5 @@
 from panda3d.core import UniqueIdAllocator, HashVal, SteamNetworkSystem, SteamNetworkMessage, SteamNetworkConnectionInfo
-from panda3d.direct import FrameSnapshot, ClientFrameManager, ClientFrame, FrameSnapshotManager, DCPacker
+from panda3d.direct import FrameSnapshot, ClientFrameManager, ClientFrame, FrameSnapshotManager, SnapshotRelevanceFilter
 
 from direct.distributed.PyDatagram import PyDatagram
 from direct.showbase.DirectObject import DirectObject
@@ -8,8 +8,11 @@ from direct.directnotify.DirectNotifyGlobal import directNotify
 from .NetMessages import NetMessages
 from .ServerConfig import *
 from .BaseObjectManager import BaseObjectManager
+from .ClientRateController import ClientRateController
 
+from concurrent.futures import ThreadPoolExecutor
 from enum import IntEnum
+import heapq
 
 class ClientState(IntEnum):
 
@@ -27,6 +30,13 @@ class ServerRepository(BaseObjectManager):
     notify = directNotify.newCategory("ServerRepository")
     notify.setDebug(False)
 
+    # Used when reporting unexpected messages.
+    StateNames = {
+        ClientState.Unverified: "unverified",
+        ClientState.Authenticating: "in-verify",
+        ClientState.Verified: "verified"
+    }
+
     class Client:
 
         def __init__(self, connection, netAddress, id = -1):
@@ -74,6 +84,33 @@ class ServerRepository(BaseObjectManager):
             self.explicitInterestZoneIds = set()
             self.currentInterestZoneIds = set()
 
+            # Objects in newly opened interest zones that haven't been
+            # generated for the client yet, doId -> do.  They are streamed
+            # out over several ticks in the order of generateQueue, and are
+            # left out of the client's snapshots until they go out.
+            self.pendingGenerates = {}
+            # Heap of (priority, sequence, doId).
+            self.generateQueue = []
+            self.generateSequence = 0
+            # Interest handles to complete once pendingGenerates drains.
+            self.pendingInterestHandles = []
+
+            # Optional distance-based relevance filter for snapshots.
+            self.relevanceFilter = None
+            if sv_relevance.getValue():
+                self.relevanceFilter = SnapshotRelevanceFilter()
+                self.relevanceFilter.setFullRateDistance(sv_relevance_full_rate_dist.getValue())
+                self.relevanceFilter.setCullDistance(sv_relevance_cull_dist.getValue())
+                self.relevanceFilter.setMaxUpdateInterval(sv_relevance_max_interval.getValue())
+                self.relevanceFilter.setMaxObjects(sv_relevance_max_objects.getValue())
+
+            # Optional bandwidth controller, which can choke snapshots to
+            # the client when its link is saturated.
+            self.rateController = None
+            if sv_rate_control.getValue():
+                self.rateController = ClientRateController(
+                    sv_max_rate.getValue(), sv_min_rate.getValue())
+
         def getClientFrame(self, tick):
             return self.frameMgr.getClientFrame(tick)
 
@@ -98,6 +135,8 @@ class ServerRepository(BaseObjectManager):
         self.netSys = SteamNetworkSystem()
         self.listenSocket = self.netSys.createListenSocket(listenPort)
         self.pollGroup = self.netSys.createPollGroup()
+        # Reused for every message we receive.
+        self.recvMessage = SteamNetworkMessage()
         self.clientIdAllocator = UniqueIdAllocator(0, 0xFFFF)
         self.objectIdAllocator = UniqueIdAllocator(0, 0xFFFF)
         self.numClients = 0
@@ -106,8 +145,46 @@ class ServerRepository(BaseObjectManager):
 
         self.snapshotMgr = FrameSnapshotManager()
 
+        # Optional pool of threads to format per-client snapshots on.
+        self.snapshotThreadPool = None
+        if sv_snapshot_threads.getValue() > 0:
+            self.snapshotThreadPool = ThreadPoolExecutor(
+                max_workers = sv_snapshot_threads.getValue(),
+                thread_name_prefix = "snapshot")
+
+        # zoneId -> {doId: do}.  Insertion ordered so objects in a zone are
+        # always visited in the order they were generated.
         self.objectsByZoneId = {}
 
+        # The messages a client may send in each state, and the methods that
+        # handle them.  Handlers are called with the client and a
+        # DatagramIterator positioned just past the message type.
+        self.messageHandlers = {
+            # In the unverified (just connected) client state, the only
+            # message the client can send is the hello message to get
+            # verified and signed onto the server.
+            ClientState.Unverified: {
+                NetMessages.CL_Hello: self.handleClientHello,
+            },
+            # If the client is in the verification process, they can only
+            # send a verification response.
+            ClientState.Authenticating: {
+                NetMessages.CL_AuthenticateResponse: self.handleClientAuthResponse,
+            },
+            ClientState.Verified: {
+                NetMessages.CL_SetCMDRate: self.handleClientSetCMDRate,
+                NetMessages.CL_SetUpdateRate: self.handleClientSetUpdateRate,
+                NetMessages.CL_Disconnect: self.handleClientDisconnect,
+                NetMessages.CL_Tick: self.handleClientTick,
+                NetMessages.CL_AddInterest: self.handleClientAddInterest,
+                NetMessages.CL_RemoveInterest: self.handleClientRemoveInterest,
+                NetMessages.CL_SetInterest: self.handleClientSetInterest,
+                NetMessages.B_ObjectMessage: self.handleObjectMessage,
+                NetMessages.CL_Ping: self.handleClientPing,
+                NetMessages.CL_InformPing: self.handleClientInformPing,
+            },
+        }
+
         base.setTickRate(sv_tickrate.getValue())
         base.simTaskMgr.add(self.runFrame, "serverRunFrame", sort = -100)
         base.simTaskMgr.add(self.takeSnapshotTask, "serverTakeSnapshot", sort = 100)
@@ -137,7 +214,7 @@ class ServerRepository(BaseObjectManager):
             self.notify.error("Could not find DCClass for %s" % dclassName)
         do.owner = owner
         self.doId2do[do.doId] = do
-        self.objectsByZoneId.setdefault(do.zoneId, []).append(do)
+        self.addObjectToZone(do, do.zoneId)
         if owner:
             owner.objectsByDoId[do.doId] = do
             owner.objectsByZoneId.setdefault(do.zoneId, set()).add(do)
@@ -158,8 +235,7 @@ class ServerRepository(BaseObjectManager):
             dg.addUint16(NetMessages.SV_GenerateObject)
             self.packObjectGenerate(dg, do)
             # Inform clients interested in the object's zone
-            for client in clients:
-                self.sendDatagram(dg, client.connection)
+            self.sendDatagramToClients(dg, clients)
 
         if owner:
             # Send a specific owner generate
@@ -186,9 +262,7 @@ class ServerRepository(BaseObjectManager):
         doId = do.doId
 
         del self.doId2do[do.doId]
-        self.objectsByZoneId[do.zoneId].remove(do)
-        if not self.objectsByZoneId[do.zoneId]:
-            del self.objectsByZoneId[do.zoneId]
+        self.removeObjectFromZone(do, do.zoneId)
 
         if removeFromOwnerTable and (do.owner is not None):
             client = do.owner
@@ -203,8 +277,18 @@ class ServerRepository(BaseObjectManager):
             dg = PyDatagram()
             dg.addUint16(NetMessages.SV_DeleteObject)
             dg.addUint32(do.doId)
+            self.sendDatagramToClients(dg, clients)
             for client in clients:
-                self.sendDatagram(dg, client.connection)
+                # If we hadn't gotten around to generating it for the client,
+                # now we never need to.
+                client.pendingGenerates.pop(do.doId, None)
+                if not client.pendingGenerates:
+                    # That may have been the last one; streamGenerates()
+                    # won't visit this client again, so finish up here.
+                    client.generateQueue = []
+                    self.flushInterestComplete(client)
+                if client.relevanceFilter is not None:
+                    client.relevanceFilter.removeObject(do.doId)
 
         # Forget this object in the packet history
         self.snapshotMgr.removePrevSentPacket(do.doId)
@@ -216,14 +300,54 @@ class ServerRepository(BaseObjectManager):
         # Allow the doId to be re-used for future objects.
         self.freeObjectID(doId)
 
+    def addObjectToZone(self, do, zoneId):
+        """
+        Records the object in the zone index.  The index is what snapshots
+        and interest changes walk, so it must be kept in sync with the
+        object's zoneId whenever an object is generated, deleted, or moved
+        to a different zone.
+        """
+        self.objectsByZoneId.setdefault(zoneId, {})[do.doId] = do
+
+    def removeObjectFromZone(self, do, zoneId):
+        """
+        Removes the object from the zone index.  See addObjectToZone().
+        """
+        zoneObjects = self.objectsByZoneId.get(zoneId)
+        if zoneObjects is None:
+            return
+        zoneObjects.pop(do.doId, None)
+        if not zoneObjects:
+            del self.objectsByZoneId[zoneId]
+
     def runFrame(self, task):
         self.readerPollUntilEmpty()
         self.runCallbacks()
+        self.streamGenerates()
 
         return task.cont
 
     def clientNeedsUpdate(self, client):
-        return client.isVerified() and client.nextUpdateTime <= base.clockMgr.getTime()
+        if not client.isVerified():
+            return False
+        now = base.clockMgr.getTime()
+        if client.nextUpdateTime > now:
+            return False
+        if client.rateController is not None and not client.rateController.canSend(now):
+            # Client's link is saturated, hold off until it drains.
+            return False
+        return True
+
+    def getClientRateStats(self):
+        """
+        Returns a dictionary of client ID to the bandwidth statistics of that
+        client.  Only clients with rate control enabled are included.
+        """
+        stats = {}
+        for client in self.clientsByConnection.values():
+            if client.rateController is not None:
+                stats[client.id] = client.rateController.getStats()
+        return stats
 
     ###########################################################
     #
@@ -237,7 +361,6 @@ class ServerRepository(BaseObjectManager):
 
     def takeTickSnapshot(self, tickCount):
         self.notify.debug("Take tick snapshot at tick %i" % tickCount)
-        snap = FrameSnapshot(tickCount, len(self.doId2do))
 
         # Build a set of all unique client interest zones (for clients that needs snapshots)
         clientsNeedingSnapshots = []
@@ -246,9 +369,6 @@ class ServerRepository(BaseObjectManager):
             if self.clientNeedsUpdate(client):
                 # Factor in this client's interest zones
                 clientZones |= client.currentInterestZoneIds
-                # Calculate when the next update should be
-                client.nextUpdateTime = base.clockMgr.getTime() + client.updateInterval
-                client.setupPackInfo(snap)
                 clientsNeedingSnapshots.append(client)
 
         if len(clientsNeedingSnapshots) == 0:
@@ -258,33 +378,120 @@ class ServerRepository(BaseObjectManager):
 
         self.notify.debug("All unique client interest zones: %s" % repr(clientZones))
 
-        # Pack all objects visible by at least one client into the snapshot.
-        items = list(self.doId2do.items())
-        for i in range(len(items)):
-            doId, do = items[i]
+        # Only walk the zones that at least one client can see, rather than
+        # every object on the server.  Objects in zones nobody is interested
+        # in never cost us anything here.
+        visibleZones = []
+        numEntries = 0
+        for zoneId in clientZones:
+            zoneObjects = self.objectsByZoneId.get(zoneId)
+            if zoneObjects:
+                visibleZones.append((zoneId, zoneObjects))
+                numEntries += len(zoneObjects)
 
-            if do.zoneId not in clientZones:
-                # Object not seen by any clients, omit from snapshot
-                continue
+        snap = FrameSnapshot(tickCount, numEntries)
 
-            self.snapshotMgr.packObjectInSnapshot(snap, i, do, doId, do.zoneId, do.dclass)
+        for client in clientsNeedingSnapshots:
+            # Calculate when the next update should be
+            client.nextUpdateTime = base.clockMgr.getTime() + client.updateInterval
+            client.setupPackInfo(snap)
 
-        # Send it out to whoever needs it
+        # Pack all objects visible by at least one client into the snapshot.
+        # Each visible object gets its own entry slot in the snapshot.
+        entry = 0
+        for zoneId, zoneObjects in visibleZones:
+            for doId, do in zoneObjects.items():
+                self.snapshotMgr.packObjectInSnapshot(snap, entry, do, doId, zoneId, do.dclass)
+                entry += 1
+
+        # Clients with the same interest zones that acknowledged the same
+        # tick get byte-identical snapshot payloads, so only format each
+        # unique payload once per tick.  The per-client header is kept
+        # separate and prepended when sending.
+        payloads = {}
+        futures = []
+        sends = []
         for client in clientsNeedingSnapshots:
-            # Get the frame the client most recently acknowledged
-            oldFrame = client.getClientFrame(client.deltaTick)
+            dg, key, formatter, args = self.setupClientSnapshot(client, snap)
+            payload = payloads.get(key) if key is not None else None
+            if payload is None:
+                payload = PyDatagram()
+                if key is not None:
+                    payloads[key] = payload
+                if self.snapshotThreadPool:
+                    # Format the payload on the thread pool.  The C++
+                    # formatting methods release the GIL while encoding, so
+                    # these actually run in parallel.
+                    futures.append(self.snapshotThreadPool.submit(formatter, payload, *args))
+                else:
+                    formatter(payload, *args)
+            sends.append((client, dg, payload))
+
+        for future in futures:
+            future.result()
+
+        # Send it out to whoever needs it, in client order.
+        for client, dg, payload in sends:
+            dg.appendData(payload.getMessage())
+            self.sendDatagram(dg, client.connection)
 
-            client.lastSnapshot = snap
+    def setupClientSnapshot(self, client, snap):
+        """
+        Builds the header of the snapshot datagram for the indicated client.
+        Returns the datagram, the key identifying the snapshot payload the
+        client needs, and the snapshot formatting method along with the
+        arguments it needs to format that payload.  The key is None if the
+        payload is specific to this client and can't be shared.
+        """
 
-            dg = PyDatagram()
-            dg.addUint16(NetMessages.SV_Tick)
-            self.addSnapshotHeaderData(dg, client)
-            if oldFrame:
-                # We have an old frame to delta against
-                self.snapshotMgr.clientFormatDeltaSnapshot(dg, oldFrame.getSnapshot(), snap, list(client.currentInterestZoneIds))
+        # Get the frame the client most recently acknowledged
+        oldFrame = client.getClientFrame(client.deltaTick)
+
+        client.lastSnapshot = snap
+
+        dg = PyDatagram()
+        dg.addUint16(NetMessages.SV_Tick)
+        self.addSnapshotHeaderData(dg, client)
+
+        zoneIds = frozenset(client.currentInterestZoneIds)
+        relevance = client.relevanceFilter
+        if relevance is not None:
+            origin = self.getClientRelevanceOrigin(client)
+            if origin is not None:
+                relevance.setOrigin(origin)
             else:
-                self.snapshotMgr.clientFormatSnapshot(dg, snap, list(client.currentInterestZoneIds))
-            self.sendDatagram(dg, client.connection)
+                relevance.clearOrigin()
+
+        if oldFrame:
+            # We have an old frame to delta against
+            fromSnap = oldFrame.getSnapshot()
+            key = (fromSnap.getTickCount(), snap.getTickCount(), zoneIds)
+            formatter = self.snapshotMgr.clientFormatDeltaSnapshot
+            args = (fromSnap, snap, list(zoneIds))
+        else:
+            key = (-1, snap.getTickCount(), zoneIds)
+            formatter = self.snapshotMgr.clientFormatSnapshot
+            args = (snap, list(zoneIds))
+
+        if client.pendingGenerates:
+            # Leave out objects the client doesn't have yet.
+            key = None
+            args += (relevance, list(client.pendingGenerates.keys()))
+        elif relevance is not None:
+            key = None
+            args += (relevance,)
+
+        return (dg, key, formatter, args)
+
+    def getClientRelevanceOrigin(self, client):
+        """
+        Returns the point that the distance to objects is measured from when
+        deciding how relevant they are to the indicated client, usually the
+        position of the client's avatar, or None if the client has no
+        position.  Only used when sv_relevance is enabled.  Objects provide
+        their own positions through a getRelevancePos() method.
+        """
+        return None
 
     def addSnapshotHeaderData(self, dg, client):
         """
@@ -312,11 +519,27 @@ class ServerRepository(BaseObjectManager):
             event = self.netSys.getNextEvent()
 
     def readerPollUntilEmpty(self):
-        while self.readerPollOnce():
-            pass
+        """
+        Receives and dispatches the messages waiting on the poll group, up to
+        sv_max_messages_per_poll of them (0 for no limit).  A single
+        SteamNetworkMessage is reused for every message received.
+        """
+        msg = self.recvMessage
+        receive = self.netSys.receiveMessageOnPollGroup
+        pollGroup = self.pollGroup
+        handleDatagram = self.handleDatagram
+
+        maxMessages = sv_max_messages_per_poll.getValue()
+        count = 0
+        while receive(pollGroup, msg):
+            handleDatagram(msg)
+            count += 1
+            if count == maxMessages:
+                # Leave the rest for the next frame.
+                break
 
     def readerPollOnce(self):
-        msg = SteamNetworkMessage()
+        msg = self.recvMessage
         if self.netSys.receiveMessageOnPollGroup(self.pollGroup, msg):
             self.handleDatagram(msg)
             return True
@@ -335,7 +558,6 @@ class ServerRepository(BaseObjectManager):
         return True
 
     def handleDatagram(self, msg):
-        datagram = msg.getDatagram()
         connection = msg.getConnection()
         dgi = msg.getDatagramIterator()
         client = self.clientsByConnection.get(connection)
@@ -350,51 +572,16 @@ class ServerRepository(BaseObjectManager):
 
         self.clientSender = client
 
-        if client.state == ClientState.Unverified:
-            # In the unverified (just connected) client state, the only
-            # message the client can send is the hello message to get verified
-            # and signed onto the server.
-            if type == NetMessages.CL_Hello:
-                self.handleClientHello(client, dgi)
-            else:
-                self.notify.warning("SUSPICIOUS: client %i sent unknown message %i in unverified state" % (client.connection, type))
-                self.closeClientConnection(client)
+        handler = self.messageHandlers[client.state].get(type)
+        if handler is None:
+            self.notify.warning("SUSPICIOUS: client %i sent unknown message %i in %s state" %
+                                (client.connection, type, self.StateNames[client.state]))
+            self.closeClientConnection(client)
+            return
 
-        elif client.state == ClientState.Authenticating:
-            # If the client is in the verification process, they can
-            # only send a verification response.
-            if type == NetMessages.CL_AuthenticateResponse:
-                self.handleClientAuthResponse(client, dgi)
-            else:
-                self.notify.warning("SUSPICIOUS: client %i sent unknown message %i in in-verify state" % (client.connection, type))
-                self.closeClientConnection(client)
+        handler(client, dgi)
 
-        elif client.state == ClientState.Verified:
-            if type == NetMessages.CL_SetCMDRate:
-                self.handleClientSetCMDRate(client, dgi)
-            elif type == NetMessages.CL_SetUpdateRate:
-                self.handleClientSetUpdateRate(client, dgi)
-            elif type == NetMessages.CL_Disconnect:
-                self.handleClientDisconnect(client)
-            elif type == NetMessages.CL_Tick:
-                self.handleClientTick(client, dgi)
-            elif type == NetMessages.CL_AddInterest:
-                self.handleClientAddInterest(client, dgi)
-            elif type == NetMessages.CL_RemoveInterest:
-                self.handleClientRemoveInterest(client, dgi)
-            elif type == NetMessages.CL_SetInterest:
-                self.handleClientSetInterest(client, dgi)
-            elif type == NetMessages.B_ObjectMessage:
-                self.handleObjectMessage(client, dgi)
-            elif type == NetMessages.CL_Ping:
-                self.handleClientPing(client)
-            elif type == NetMessages.CL_InformPing:
-                self.handleClientInformPing(client, dgi)
-            else:
-                self.notify.warning("SUSPICIOUS: client %i sent unknown message %i in verified state" % (client.connection, type))
-                self.closeClientConnection(client)
-
-    def handleClientPing(self, client):
+    def handleClientPing(self, client, dgi = None):
         dg = PyDatagram()
         dg.addUint16(NetMessages.SV_Ping_Resp)
         self.sendDatagram(dg, client.connection)
@@ -411,6 +598,8 @@ class ServerRepository(BaseObjectManager):
         for rtt in client.rttSlidingWindow:
             total += rtt
         client.averageRtt = total / client.rttWindowSize
+        if client.rateController is not None:
+            client.rateController.updateRtt(client.averageRtt, client.currentRtt)
         assert self.notify.debug("Client " + str(client.connection) + " average RTT: " + str(client.averageRtt))
 
     def sendUpdate(self, do, name, args, client = None, excludeClients = []):
@@ -419,36 +608,28 @@ class ServerRepository(BaseObjectManager):
         if not do.dclass:
             return
 
-        field = do.dclass.getFieldByName(name)
-        if not field:
+        plan = self.getFieldPlanByName(do.dclass, name)
+        if not plan:
             self.notify.warning("Tried to send unknown field %s" % name)
             return
-        if field.asParameter():
+        if plan.isParameter:
             self.notify.warning("Can't sent parameter field as a message")
             return
 
-        packer = DCPacker()
-        packer.rawPackUint16(NetMessages.B_ObjectMessage)
-        packer.rawPackUint32(do.doId)
-        packer.rawPackUint16(field.getNumber())
-
-        packer.beginPack(field)
-        field.packArgs(packer, args)
-        if not packer.endPack():
+        dg = self.packObjectMessage(do, plan, args)
+        if not dg:
             self.notify.warning("Failed to pack message")
             return
 
-        reliable = not field.hasKeyword("unreliable")
+        reliable = plan.reliable
 
-        dg = PyDatagram(packer.getBytes())
         if not client:
-            if field.isBroadcast():
+            if plan.broadcast:
                 # Send to all interested clients
-                for cl in self.zonesToClients.get(do.zoneId, set()):
-                    if cl in excludeClients:
-                        continue
-                    self.sendDatagram(dg, cl.connection, reliable)
-            elif field.isOwnrecv():
+                clients = self.zonesToClients.get(do.zoneId)
+                if clients:
+                    self.sendDatagramToClients(dg, clients, reliable, excludeClients)
+            elif plan.ownrecv:
                 # If the field is an ownrecv without an explicit target client,
                 # implicitly send to owner client.
                 if not do.owner:
@@ -504,35 +685,31 @@ class ServerRepository(BaseObjectManager):
             return
 
         fieldNumber = dgi.getUint16()
-        field = do.dclass.getFieldByIndex(fieldNumber)
-        if not field:
+        plan = self.getFieldPlanByNumber(do.dclass, fieldNumber)
+        if not plan:
             self.notify.warning("SUSPICIOUS: client %i tried to send message on unknown field %i on doId %i" %
                                 (client.id, fieldNumber, doId))
             return
 
-        if field.asParameter():
+        if plan.isParameter:
             self.notify.warning("SUSPICIOUS: client %i tried to send message on a parameter field!" % client.id)
             return
 
         if do.owner != client:
-            if not field.isClsend():
+            if not plan.clsend:
                 # Not client-send
                 self.notify.warning("SUSPICIOUS: client %i tried to send non-clsend message on doId %i" %
                                     (client.id, doId))
                 return
         else:
-            if not field.isOwnsend() and not field.isClsend():
+            if not plan.ownsend and not plan.clsend:
                 # Not client-send or owner-send
                 self.notify.warning("SUSPICIOUS: owner client %i tried to send non-ownsend and non-clsend message on doId %i" %
                                     (client.id, doId))
                 return
 
         # We can safely pass this message onto the object
-        packer = DCPacker()
-        packer.setUnpackData(dgi.getRemainingBytes())
-        packer.beginUnpack(field)
-        field.receiveUpdate(packer, do)
-        if not packer.endUnpack():
+        if not self.unpackObjectMessage(do, plan, dgi):
             self.notify.warning("Failed to unpack object message")
 
     def isValidClientInterest(self, zone):
@@ -633,20 +810,20 @@ class ServerRepository(BaseObjectManager):
         addedZoneIds = newZoneIds - origZoneIds
         removedZoneIds = origZoneIds - newZoneIds
 
-        dg = PyDatagram()
-        dg.addUint16(NetMessages.SV_GenerateObject)
         for zoneId in addedZoneIds:
             self.zonesToClients.setdefault(zoneId, set()).add(client)
 
             # The client is opening interest in this zone. Need to inform
             # client of all objects in this zone.
-            for object in self.objectsByZoneId.get(zoneId, []):
+            for object in self.objectsByZoneId.get(zoneId, {}).values():
                 if object.owner != client:
                     # Don't do this if the client owns the object, it should
                     # already be generated for them.
-                    self.packObjectGenerate(dg, object)
+                    self.queueClientGenerate(client, object)
 
-        self.sendDatagram(dg, client.connection)
+        # Send what fits this tick, the rest is streamed out by
+        # streamGenerates().
+        self.streamClientGenerates(client)
 
         dg = PyDatagram()
         dg.addUint16(NetMessages.SV_DeleteObject)
@@ -654,24 +831,161 @@ class ServerRepository(BaseObjectManager):
             self.zonesToClients[zoneId].remove(client)
             # The client is abandoning interest in this zone. Any
             # objects in this zone should be deleted on the client.
-            for object in self.objectsByZoneId.get(zoneId, []):
+            for object in self.objectsByZoneId.get(zoneId, {}).values():
                 if object.owner != client:
+                    if client.pendingGenerates.pop(object.doId, None) is not None:
+                        # Never made it to the client, nothing to delete.
+                        continue
                     # Never delete objects owned by this client on interest change.
                     dg.addUint32(object.doId)
+                    if client.relevanceFilter is not None:
+                        client.relevanceFilter.removeObject(object.doId)
         self.sendDatagram(dg, client.connection)
 
-    def sendInterestComplete(self, client, handle):
+        if not client.pendingGenerates:
+            self.flushInterestComplete(client)
+
+    def getGeneratePriority(self, client, do):
+        """
+        Returns the priority of generating the indicated object for the
+        indicated client when streaming generates after an interest change.
+        Lower values are generated first.  By default, objects in the zones
+        the client owns objects in come first, then objects nearest to the
+        client's relevance origin.
+        """
+        ownZone = 0 if do.zoneId in client.objectsByZoneId else 1
+
+        distance = 0.0
+        origin = self.getClientRelevanceOrigin(client)
+        if origin is not None and hasattr(do, 'getRelevancePos'):
+            pos = do.getRelevancePos()
+            if pos is not None:
+                distance = sum((pos[i] - origin[i]) ** 2 for i in range(3))
+
+        return (ownZone, distance)
+
+    def queueClientGenerate(self, client, do):
+        """
+        Queues a generate of the indicated object for the client.  The object
+        is left out of the client's snapshots until the generate is sent.
+        """
+        client.pendingGenerates[do.doId] = do
+        heapq.heappush(client.generateQueue,
+                       (self.getGeneratePriority(client, do), client.generateSequence, do.doId))
+        client.generateSequence += 1
+
+    def streamClientGenerates(self, client):
+        """
+        Sends the client the next chunk of its queued generates, up to
+        sv_interest_generate_budget bytes.  Completes any waiting interest
+        handles once the queue has drained.
+        """
+        budget = sv_interest_generate_budget.getValue()
+
         dg = PyDatagram()
-        dg.addUint16(NetMessages.SV_InterestComplete)
-        dg.addUint8(handle)
-        self.sendDatagram(dg, client.connection)
+        dg.addUint16(NetMessages.SV_GenerateObject)
+        headerLength = dg.getLength()
+
+        queue = client.generateQueue
+        pending = client.pendingGenerates
+        while queue and pending:
+            if budget > 0 and dg.getLength() - headerLength >= budget:
+                break
+            doId = heapq.heappop(queue)[2]
+            # Deleted objects and objects in zones the client lost interest
+            # in are dropped from pendingGenerates, but not from the queue.
+            do = pending.pop(doId, None)
+            if do is not None:
+                self.packObjectGenerate(dg, do)
+
+        if dg.getLength() > headerLength:
+            self.sendDatagram(dg, client.connection)
 
-    def sendDatagram(self, dg, connection, reliable = True):
+        if not pending:
+            client.generateQueue = []
+            self.flushInterestComplete(client)
+
+    def streamGenerates(self):
+        """
+        Continues streaming queued generates to each client.  Called once per
+        tick.
+        """
+        for client in self.clientsByConnection.values():
+            if client.pendingGenerates:
+                self.streamClientGenerates(client)
+
+    def sendInterestComplete(self, client, handle):
+        """
+        Tells the client that its interest change has been processed.  If
+        objects from the change are still being streamed to the client, this
+        is held until the last of them has been sent.
+        """
+        client.pendingInterestHandles.append(handle)
+        if not client.pendingGenerates:
+            self.flushInterestComplete(client)
+
+    def flushInterestComplete(self, client):
+        for handle in client.pendingInterestHandles:
+            dg = PyDatagram()
+            dg.addUint16(NetMessages.SV_InterestComplete)
+            dg.addUint8(handle)
+            self.sendDatagram(dg, client.connection)
+        client.pendingInterestHandles = []
+
+    def getSendType(self, reliable):
         if reliable:
-            sendType = SteamNetworkSystem.NSFReliableNoNagle
+            return SteamNetworkSystem.NSFReliableNoNagle
         else:
-            sendType = SteamNetworkSystem.NSFUnreliableNoDelay
+            return SteamNetworkSystem.NSFUnreliableNoDelay
+
+    def sendDatagram(self, dg, connection, reliable = True):
+        self.sendConnectionDatagram(dg, connection, self.getSendType(reliable),
+                                    self.clientsByConnection.get(connection))
+
+    def sendConnectionDatagram(self, dg, connection, sendType, client = None):
+        """
+        Sends the datagram on the indicated connection with the indicated
+        send type, and counts it against the client's rate, if the client
+        is given.  Every single datagram sent to a client goes through
+        here; broadcasts go through sendConnectionDatagrams() instead.
+        """
         self.netSys.sendDatagram(connection, dg, sendType)
+        if client is not None and client.rateController is not None:
+            client.rateController.recordSent(dg.getLength())
+
+    def sendDatagramToClients(self, dg, clients, reliable = True, excludeClients = None):
+        """
+        Sends the same datagram to each of the indicated clients, minus any
+        in excludeClients.
+        """
+        if excludeClients:
+            if not isinstance(clients, (set, frozenset)):
+                clients = set(clients)
+            clients = clients.difference(excludeClients)
+            if not clients:
+                return
+
+        self.sendConnectionDatagrams(dg, clients, self.getSendType(reliable))
+
+    def sendConnectionDatagrams(self, dg, clients, sendType):
+        """
+        Sends the datagram to each of the indicated clients with the
+        indicated send type, and counts it against their rates.  This is
+        the fan-out path for broadcasts, so the send function and datagram
+        length are looked up once for the whole group, and the loop makes
+        no other Python calls.  Override this along with
+        sendConnectionDatagram() to intercept every datagram.
+        """
+        send = self.netSys.sendDatagram
+        length = dg.getLength()
+        for client in clients:
+            send(client.connection, dg, sendType)
+            rate = client.rateController
+            if rate is not None:
+                # This is ClientRateController.recordSent(), inlined.
+                rate.tokens -= length
+                rate.totalBytes += length
+                rate.windowBytes += length
 
     def closeClientConnection(self, client):
         if client.id != -1:
@@ -793,7 +1107,7 @@ class ServerRepository(BaseObjectManager):
     def handleClientAuthResponse(self, client, dgi):
         raise NotImplementedError
 
-    def handleClientDisconnect(self, client):
+    def handleClientDisconnect(self, client, dgi = None):
         # Delete all objects owned by the client
         for do in client.objectsByDoId.values():
             self.deleteObject(do, False)
@@ -21,7 +21,8 @@
     clientFrameManager.h clientFrameManager.I \
     frameSnapshot.h frameSnapshot.I \
     frameSnapshotEntry.h frameSnapshotEntry.I \
-    packedObject.h packedObject.I
+    packedObject.h packedObject.I \
+    snapshotRelevanceFilter.h snapshotRelevanceFilter.I
 
   #define COMPOSITE_SOURCES \
     config_distributed2.cxx \
@@ -31,7 +32,8 @@
     clientFrameManager.cxx \
     frameSnapshot.cxx \
     frameSnapshotEntry.cxx \
-    packedObject.cxx
+    packedObject.cxx \
+    snapshotRelevanceFilter.cxx
 
   #define IGATESCAN all
 
@@ -41,3 +43,15 @@
     frameSnapshotManager.h frameSnapshotManager.I frameSnapshotManager.cxx
 
 #end lib_target
+
+#begin test_bin_target
+  #define TARGET bench_changeFrameList
+  #define LOCAL_LIBS distributed2
+  #define OTHER_LIBS $[OTHER_LIBS] \
+    express:c pandaexpress:m \
+    dtoolutil:c dtoolbase:c dtool:m prc
+
+  #define SOURCES \
+    bench_changeFrameList.cxx
+
+#end test_bin_target
@@ -0,0 +1,115 @@
+/**
+ * PANDA 3D SOFTWARE
+ * Copyright (c) Carnegie Mellon University.  All rights reserved.
+ *
+ * All use of this software is subject to the terms of the revised BSD
+ * license.  You should have received a copy of this license along
+ * with this source code in a file named "LICENSE."
+ *
+ * @file bench_changeFrameList.cxx
+ * @author agent
+ * @date 2026-10-18
+ */
+
+// Microbenchmark comparing ChangeFrameList::get_fields_changed_after_tick()
+// against a plain linear scan of per-field change ticks, which is how the
+// changed fields used to be found.
+//
+// Usage: bench_changeFrameList [num_fields] [changes_per_tick] [num_ticks]
+
+#include "changeFrameList.h"
+#include "vector_int.h"
+
+#include <chrono>
+#include <cstdlib>
+#include <iostream>
+#include <random>
+
+/**
+ * The old way of finding changed fields: look at every field.
+ */
+static int
+linear_fields_changed_after_tick(const vector_int &change_ticks, int tick,
+                                 vector_int &out_fields) {
+  int c = (int)change_ticks.size();
+  out_fields.reserve(c);
+  for (int i = 0; i < c; i++) {
+    if (change_ticks[i] > tick) {
+      out_fields.push_back(i);
+    }
+  }
+  return (int)out_fields.size();
+}
+
+int
+main(int argc, char *argv[]) {
+  int num_fields = (argc > 1) ? atoi(argv[1]) : 64;
+  int changes_per_tick = (argc > 2) ? atoi(argv[2]) : 2;
+  int num_ticks = (argc > 3) ? atoi(argv[3]) : 100000;
+  // How many clients query each object per tick.
+  const int num_queries = 32;
+
+  std::mt19937 rng(1);
+  std::uniform_int_distribution<int> pick_field(0, num_fields - 1);
+
+  PT(ChangeFrameList) list = new ChangeFrameList(num_fields, 0);
+  vector_int change_ticks(num_fields, 0);
+
+  vector_int changed;
+  changed.resize(changes_per_tick);
+
+  vector_int out_fields;
+  long long indexed_total = 0;
+  long long linear_total = 0;
+  std::chrono::steady_clock::duration indexed_time(0);
+  std::chrono::steady_clock::duration linear_time(0);
+
+  for (int tick = 1; tick <= num_ticks; tick++) {
+    for (int i = 0; i < changes_per_tick; i++) {
+      changed[i] = pick_field(rng);
+      // Keep the indices unique, like PackedObject::calc_delta() does.
+      for (int j = 0; j < i; j++) {
+        if (changed[j] == changed[i]) {
+          changed[i] = (changed[i] + 1) % num_fields;
+          j = -1;
+        }
+      }
+      change_ticks[changed[i]] = tick;
+    }
+    list->set_change_tick(changed.data(), changes_per_tick, tick);
+
+    // Clients acknowledged somewhere in the last few ticks.
+    auto start = std::chrono::steady_clock::now();
+    for (int q = 0; q < num_queries; q++) {
+      out_fields.clear();
+      indexed_total += list->get_fields_changed_after_tick(tick - 1 - (q & 3), out_fields);
+    }
+    auto mid = std::chrono::steady_clock::now();
+    for (int q = 0; q < num_queries; q++) {
+      out_fields.clear();
+      linear_total += linear_fields_changed_after_tick(change_ticks, tick - 1 - (q & 3), out_fields);
+    }
+    auto end = std::chrono::steady_clock::now();
+
+    indexed_time += mid - start;
+    linear_time += end - mid;
+  }
+
+  if (indexed_total != linear_total) {
+    std::cerr << "Mismatch: indexed found " << indexed_total
+              << " changed fields, linear found " << linear_total << "\n";
+    return 1;
+  }
+
+  double indexed_ms = std::chrono::duration<double, std::milli>(indexed_time).count();
+  double linear_ms = std::chrono::duration<double, std::milli>(linear_time).count();
+
+  std::cout
+    << num_fields << " fields, " << changes_per_tick << " changes per tick, "
+    << num_ticks << " ticks, " << num_queries << " queries per tick\n"
+    << "  indexed: " << indexed_ms << " ms\n"
+    << "  linear:  " << linear_ms << " ms\n"
+    << "  speedup: " << (linear_ms / indexed_ms) << "x\n";
+
+  return 0;
+}
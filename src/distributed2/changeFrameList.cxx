@@ -13,15 +13,25 @@
 
 #include "changeFrameList.h"
 
+#include <algorithm>
+
 /**
  *
  */
 ChangeFrameList::
 ChangeFrameList(int num_fields, int curr_tick) {
   _change_ticks.resize(num_fields);
+  _prev.resize(num_fields);
+  _next.resize(num_fields);
   for (int i = 0; i < num_fields; i++) {
     _change_ticks[i] = curr_tick;
+    // All fields changed on the same tick, so they start out linked in field
+    // order.
+    _prev[i] = i - 1;
+    _next[i] = (i + 1 < num_fields) ? i + 1 : -1;
   }
+  _oldest = (num_fields > 0) ? 0 : -1;
+  _newest = num_fields - 1;
 }
 
 /**
@@ -30,24 +40,87 @@ ChangeFrameList(int num_fields, int curr_tick) {
 void ChangeFrameList::
 set_change_tick(const int *field_indices, int num_fields, int tick) {
   for (int i = 0; i < num_fields; i++) {
-    _change_ticks[field_indices[i]] = tick;
+    int field = field_indices[i];
+    unlink_field(field);
+    _change_ticks[field] = tick;
+    link_field(field);
   }
 }
 
 /**
- * Builds a list of fields that changed after the specified tick.
+ * Builds a list of fields that changed after the specified tick, in
+ * ascending order of field index.  This runs in time proportional to the
+ * number of changed fields, not the total number of fields.
  */
 int ChangeFrameList::
 get_fields_changed_after_tick(int tick, vector_int &out_fields) {
+  size_t start = out_fields.size();
+
+  for (int field = _newest; field != -1 && _change_ticks[field] > tick;
+       field = _prev[field]) {
+    out_fields.push_back(field);
+  }
+
+  // We walked from newest to oldest; put them back in field order, which is
+  // the order the fields are packed in.
+  std::sort(out_fields.begin() + start, out_fields.end());
+
+  return (int)(out_fields.size() - start);
+}
+
+/**
+ * Removes the indicated field from the change-ordered list.
+ */
+void ChangeFrameList::
+unlink_field(int field) {
+  int prev = _prev[field];
+  int next = _next[field];
+
+  if (prev != -1) {
+    _next[prev] = next;
+  } else {
+    _oldest = next;
+  }
 
-  int c = (int)_change_ticks.size();
-  out_fields.reserve(c);
+  if (next != -1) {
+    _prev[next] = prev;
+  } else {
+    _newest = prev;
+  }
+
+  _prev[field] = -1;
+  _next[field] = -1;
+}
+
+/**
+ * Inserts the indicated (unlinked) field into the change-ordered list,
+ * according to its change tick.  Change ticks normally only increase, in
+ * which case the field goes straight onto the end of the list.
+ */
+void ChangeFrameList::
+link_field(int field) {
+  int tick = _change_ticks[field];
+
+  // Find the newest field that changed on or before this field's tick.
+  int prev = _newest;
+  while (prev != -1 && _change_ticks[prev] > tick) {
+    prev = _prev[prev];
+  }
 
-  for (int i = 0; i < c; i++) {
-    if (_change_ticks[i] > tick) {
-      out_fields.push_back(i);
-    }
+  int next = (prev != -1) ? _next[prev] : _oldest;
+
+  _prev[field] = prev;
+  _next[field] = next;
+
+  if (prev != -1) {
+    _next[prev] = field;
+  } else {
+    _oldest = field;
   }
 
-  return (int)out_fields.size();
+  if (next != -1) {
+    _prev[next] = field;
+  } else {
+    _newest = field;
+  }
 }
@@ -28,19 +28,37 @@
  * These are created once per object per frame. Since usually a very small
  * percentage of an object's fields actually change each frame, this allows you
  * to get a small set of fields to delta for each client.
+ *
+ * In addition to the change tick of each field, the fields are kept in a
+ * linked list ordered by change tick, so the fields that changed after a
+ * given tick can be found by walking back from the most recently changed
+ * field, without looking at any of the fields that didn't change.
  */
 class EXPCL_DIRECT_DISTRIBUTED2 ChangeFrameList : public ReferenceCount {
 PUBLISHED:
   ChangeFrameList(int num_fields, int curr_tick);
 
   INLINE int get_num_fields() const;
+  INLINE int get_change_tick(int field) const;
+  INLINE int get_most_recent_change_tick() const;
 
   void set_change_tick(const int *field_indices, int num_fields, int tick);
 
   int get_fields_changed_after_tick(int tick, vector_int &out_fields);
 
+private:
+  void unlink_field(int field);
+  void link_field(int field);
+
 private:
   vector_int _change_ticks;
+
+  // Doubly-linked list of field indices, ordered from least to most recently
+  // changed.  -1 terminates the list in either direction.
+  vector_int _prev;
+  vector_int _next;
+  int _oldest;
+  int _newest;
 };
 
 #include "changeFrameList.I"
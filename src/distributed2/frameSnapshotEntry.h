@@ -18,6 +18,7 @@
 #include "dcbase.h"
 #include "deletedChain.h"
 #include "typedObject.h"
+#include "luse.h"
 
 class DCClass;
 class PackedObject;
@@ -48,6 +49,11 @@ PUBLISHED:
   INLINE void set_packed_object(PackedObject *obj);
   INLINE PackedObject *get_packed_object() const;
 
+  INLINE void set_pos(const LPoint3f &pos);
+  INLINE void clear_pos();
+  INLINE bool has_pos() const;
+  INLINE const LPoint3f &get_pos() const;
+
 private:
   DCClass *_dclass;
   DOID_TYPE _do_id;
@@ -55,6 +61,10 @@ private:
   bool _exists;
   PackedObject *_packed_data;
 
+  // World-space position of the object, used for distance-based relevance.
+  LPoint3f _pos;
+  bool _has_pos;
+
 public:
   static TypeHandle get_class_type() {
     return _type_handle;
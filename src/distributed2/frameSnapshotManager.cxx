@@ -22,6 +22,9 @@
 #include "dcField_ext.h"
 #include "dcParameter.h"
 #include "dcClassParameter.h"
+#include "snapshotRelevanceFilter.h"
+
+#include <algorithm>
 
 /**
  * Encodes a single DCField from a DCClass into the packer.
@@ -200,6 +203,8 @@ pack_object_in_snapshot(FrameSnapshot *snapshot, int entry_idx, PyObject *dist_o
 
   snapshot->mark_entry_valid(entry_idx);
 
+  record_relevance_pos(entry, do_id);
+
   //
   // First encode the object's state data
   //
@@ -282,19 +287,89 @@ pack_object_in_snapshot(FrameSnapshot *snapshot, int entry_idx, PyObject *dist_o
 }
 
 /**
- * Builds a datagram out of the specified snapshot suitable for sending to a
- * client. Only objects that are in the specified interest zones are packed
- * into the datagram.
+ * Copies the Python list of interest zone IDs into a C++ vector.  This is
+ * called from the BLOCKING client formatting methods, so it re-acquires the
+ * Python GIL for the duration of the copy.
  */
 void FrameSnapshotManager::
-client_format_snapshot(Datagram &dg, FrameSnapshot *snapshot,
-                       PyObject *py_interest_zone_ids) {
-  pvector<ZONEID_TYPE> interest_zone_ids;
+get_interest_zone_ids(PyObject *py_interest_zone_ids, ZoneIds &interest_zone_ids) {
+#if defined(HAVE_THREADS) && !defined(SIMPLE_THREADS)
+  PyGILState_STATE gstate;
+  gstate = PyGILState_Ensure();
+#endif
+
   interest_zone_ids.resize(PyList_Size(py_interest_zone_ids));
   for (size_t i = 0; i < interest_zone_ids.size(); i++) {
     interest_zone_ids[i] = PyLong_AsLong(PyList_GetItem(py_interest_zone_ids, i));
   }
 
+#if defined(HAVE_THREADS) && !defined(SIMPLE_THREADS)
+  PyGILState_Release(gstate);
+#endif
+}
+
+/**
+ * Copies the list of object IDs to leave out of a client snapshot into a
+ * sorted vector.  The list may be nullptr or None, in which case no objects
+ * are excluded.  Acquires the Python GIL for the duration of the copy.
+ */
+void FrameSnapshotManager::
+get_exclude_do_ids(PyObject *py_exclude_do_ids, DoIds &exclude_do_ids) {
+  if (py_exclude_do_ids == nullptr) {
+    return;
+  }
+
+#if defined(HAVE_THREADS) && !defined(SIMPLE_THREADS)
+  PyGILState_STATE gstate;
+  gstate = PyGILState_Ensure();
+#endif
+
+  if (py_exclude_do_ids != Py_None) {
+    exclude_do_ids.resize(PyList_Size(py_exclude_do_ids));
+    for (size_t i = 0; i < exclude_do_ids.size(); i++) {
+      exclude_do_ids[i] = (DOID_TYPE)PyLong_AsUnsignedLong(PyList_GetItem(py_exclude_do_ids, i));
+    }
+  }
+
+#if defined(HAVE_THREADS) && !defined(SIMPLE_THREADS)
+  PyGILState_Release(gstate);
+#endif
+
+  std::sort(exclude_do_ids.begin(), exclude_do_ids.end());
+}
+
+/**
+ * Returns true if the indicated object is in the sorted list of objects to
+ * leave out of a client snapshot.
+ */
+bool FrameSnapshotManager::
+is_excluded(const DoIds &exclude_do_ids, DOID_TYPE do_id) {
+  return !exclude_do_ids.empty() &&
+    std::binary_search(exclude_do_ids.begin(), exclude_do_ids.end(), do_id);
+}
+
+/**
+ * Builds a datagram out of the specified snapshot suitable for sending to a
+ * client. Only objects that are in the specified interest zones are packed
+ * into the datagram.  Objects in exclude_do_ids, such as objects that have
+ * not been generated on the client yet, are left out.
+ */
+void FrameSnapshotManager::
+client_format_snapshot(Datagram &dg, FrameSnapshot *snapshot,
+                       PyObject *py_interest_zone_ids,
+                       SnapshotRelevanceFilter *filter,
+                       PyObject *py_exclude_do_ids) {
+  ZoneIds interest_zone_ids;
+  get_interest_zone_ids(py_interest_zone_ids, interest_zone_ids);
+  DoIds exclude_do_ids;
+  get_exclude_do_ids(py_exclude_do_ids, exclude_do_ids);
+
+  if (filter != nullptr) {
+    // The client is getting the full state of everything it can see, so
+    // nothing it was previously skipped is out of date anymore.
+    filter->clear_objects();
+  }
+
   // Record tick count of the snapshot
   dg.add_uint32(snapshot->get_tick_count());
 
@@ -312,6 +387,10 @@ client_format_snapshot(Datagram &dg, FrameSnapshot *snapshot,
       continue;
     }
 
+    if (is_excluded(exclude_do_ids, entry.get_do_id())) {
+      continue;
+    }
+
     // Object ID
     object_dg.add_uint32(entry.get_do_id());
 
@@ -335,15 +414,20 @@ client_format_snapshot(Datagram &dg, FrameSnapshot *snapshot,
  * client. Only objects that are in the specified interest zones are packed
  * into the datagram, and only fields that have changed between `from` and `to`
  * are packed.
+ *
+ * If a relevance filter is given, objects are additionally sent at a rate
+ * based on their distance from the client, up to the filter's object budget.
+ * Objects in exclude_do_ids are left out.
  */
 void FrameSnapshotManager::
 client_format_delta_snapshot(Datagram &dg, FrameSnapshot *from, FrameSnapshot *to,
-                             PyObject *py_interest_zone_ids) {
-  pvector<ZONEID_TYPE> interest_zone_ids;
-  interest_zone_ids.resize(PyList_Size(py_interest_zone_ids));
-  for (size_t i = 0; i < interest_zone_ids.size(); i++) {
-    interest_zone_ids[i] = PyLong_AsLong(PyList_GetItem(py_interest_zone_ids, i));
-  }
+                             PyObject *py_interest_zone_ids,
+                             SnapshotRelevanceFilter *filter,
+                             PyObject *py_exclude_do_ids) {
+  ZoneIds interest_zone_ids;
+  get_interest_zone_ids(py_interest_zone_ids, interest_zone_ids);
+  DoIds exclude_do_ids;
+  get_exclude_do_ids(py_exclude_do_ids, exclude_do_ids);
 
   // Record tick count of the snapshot
   dg.add_uint32(to->get_tick_count());
@@ -353,58 +437,220 @@ client_format_delta_snapshot(Datagram &dg, FrameSnapshot *from, FrameSnapshot *t
 
   int num_objects = 0;
   Datagram object_dg;
+
+  if (filter != nullptr) {
+    num_objects = pack_filtered_delta_objects(object_dg, from, to, interest_zone_ids,
+                                              exclude_do_ids, filter);
+
+  } else {
+    vector_int changed_fields;
+    for (int i = 0; i < to->get_num_valid_entries(); i++) {
+      FrameSnapshotEntry &entry = to->get_entry(to->get_valid_entry(i));
+      if (std::find(interest_zone_ids.begin(), interest_zone_ids.end(),
+                    entry.get_zone_id()) == interest_zone_ids.end()) {
+
+        // Object not seen by this client, don't include in client snapshot
+        continue;
+      }
+
+      if (is_excluded(exclude_do_ids, entry.get_do_id())) {
+        continue;
+      }
+
+      PackedObject *packet = entry.get_packed_object();
+
+      changed_fields.clear();
+      int num_changes = packet->get_fields_changed_after_tick(from->get_tick_count(), changed_fields);
+
+      if (distributed2_cat.is_debug()) {
+        distributed2_cat.debug()
+          << from->get_tick_count() << " to " << to->get_tick_count() << " for client\n";
+        distributed2_cat.debug()
+          << num_changes << " fields changed for client after tick " << from->get_tick_count() << " doId " << packet->get_do_id() << "\n";
+      }
+
+      if (num_changes == 0) {
+        // Nothing changed from previous client snapshot, don't include this
+        // object.
+        continue;
+      }
+
+      pack_object_delta(object_dg, entry, changed_fields, num_changes);
+      num_objects++;
+    }
+  }
+
+  // # of objects in this client snapshot
+  dg.add_uint16(num_objects);
+
+  // Copy object data onto main datagram
+  dg.append_data(object_dg.get_data(), object_dg.get_length());
+}
+
+/**
+ * Packs the changed fields of the object in the indicated snapshot entry onto
+ * the datagram.  A num_changes of -1 means all fields changed.
+ */
+void FrameSnapshotManager::
+pack_object_delta(Datagram &object_dg, const FrameSnapshotEntry &entry,
+                  const vector_int &changed_fields, int num_changes) {
+  PackedObject *packet = entry.get_packed_object();
+
+  // Object ID
+  object_dg.add_uint32(entry.get_do_id());
+
+  if (num_changes != -1) {
+    // How many fields are there?
+    object_dg.add_uint16(num_changes);
+
+    // Now copy each changed field into the datagram
+    for (int j = 0; j < num_changes; j++) {
+      packet->pack_field(object_dg, changed_fields[j]);
+    }
+
+  } else {
+    // -1 means all fields changed, so just pack the whole object
+    packet->pack_datagram(object_dg);
+  }
+}
+
+/**
+ * Implementation of client_format_delta_snapshot() for clients with a
+ * relevance filter.  Packs the objects that are due to be sent to the client,
+ * most relevant first if there are more than the filter's budget, and returns
+ * the number of objects packed.
+ */
+int FrameSnapshotManager::
+pack_filtered_delta_objects(Datagram &object_dg, FrameSnapshot *from, FrameSnapshot *to,
+                            const ZoneIds &interest_zone_ids,
+                            const DoIds &exclude_do_ids,
+                            SnapshotRelevanceFilter *filter) {
+  struct Candidate {
+    int _entry;
+    int _baseline_tick;
+    float _score;
+  };
+  pvector<Candidate> candidates;
+
+  int from_tick = from->get_tick_count();
+  int to_tick = to->get_tick_count();
+
+  vector_int changed_fields;
+
   for (int i = 0; i < to->get_num_valid_entries(); i++) {
-    FrameSnapshotEntry &entry = to->get_entry(to->get_valid_entry(i));
+    int entry_idx = to->get_valid_entry(i);
+    FrameSnapshotEntry &entry = to->get_entry(entry_idx);
     if (std::find(interest_zone_ids.begin(), interest_zone_ids.end(),
                   entry.get_zone_id()) == interest_zone_ids.end()) {
+      continue;
+    }
 
-      // Object not seen by this client, don't include in client snapshot
+    DOID_TYPE do_id = entry.get_do_id();
+    if (is_excluded(exclude_do_ids, do_id)) {
       continue;
     }
 
     PackedObject *packet = entry.get_packed_object();
 
-    vector_int changed_fields;
-    int num_changes = packet->get_fields_changed_after_tick(from->get_tick_count(), changed_fields);
+    // If we've been skipping this object, the client's copy is older than
+    // the tick it acknowledged.
+    int baseline_tick = filter->get_baseline_tick(do_id, from_tick);
 
-    if (distributed2_cat.is_debug()) {
-      distributed2_cat.debug()
-        << from->get_tick_count() << " to " << to->get_tick_count() << " for client\n";
-      distributed2_cat.debug()
-        << num_changes << " fields changed for client after tick " << from->get_tick_count() << " doId " << packet->get_do_id() << "\n";
+    changed_fields.clear();
+    if (packet->get_fields_changed_after_tick(baseline_tick, changed_fields) == 0) {
+      // Client is already up to date with this object.
+      continue;
     }
 
-    if (num_changes == 0) {
-      // Nothing changed from previous client snapshot, don't include this
-      // object.
+    float priority = filter->get_priority(entry);
+    int num_skipped = filter->get_num_skipped(do_id);
+    if (num_skipped + 1 < filter->get_update_interval(priority)) {
+      // Not relevant enough to send this time around.
+      filter->record_skipped(do_id, from_tick);
       continue;
     }
 
-    // Object ID
-    object_dg.add_uint32(entry.get_do_id());
+    // Objects that have been waiting longer are bumped up.
+    candidates.push_back({ entry_idx, baseline_tick, priority * (num_skipped + 1) });
+  }
 
-    if (num_changes != -1) {
-      // How many fields are there?
-      object_dg.add_uint16(num_changes);
+  int max_objects = filter->get_max_objects();
+  if (max_objects > 0 && (int)candidates.size() > max_objects) {
+    // Over budget.  Keep the highest scoring objects and skip the rest.
+    std::stable_sort(candidates.begin(), candidates.end(),
+      [](const Candidate &a, const Candidate &b) {
+        return a._score > b._score;
+      });
+    for (size_t i = max_objects; i < candidates.size(); i++) {
+      filter->record_skipped(to->get_entry(candidates[i]._entry).get_do_id(), from_tick);
+    }
+    candidates.resize(max_objects);
 
-      // Now copy each changed field into the datagram
-      for (int j = 0; j < num_changes; j++) {
-        packet->pack_field(object_dg, changed_fields[j]);
-      }
+    // Pack them in snapshot order.
+    std::sort(candidates.begin(), candidates.end(),
+      [](const Candidate &a, const Candidate &b) {
+        return a._entry < b._entry;
+      });
+  }
 
-    } else {
-      // -1 means all fields changed, so just pack the whole object
-      packet->pack_datagram(object_dg);
-    }
+  for (const Candidate &candidate : candidates) {
+    FrameSnapshotEntry &entry = to->get_entry(candidate._entry);
+    PackedObject *packet = entry.get_packed_object();
 
-    num_objects++;
+    changed_fields.clear();
+    int num_changes = packet->get_fields_changed_after_tick(candidate._baseline_tick, changed_fields);
+    pack_object_delta(object_dg, entry, changed_fields, num_changes);
+    filter->record_sent(entry.get_do_id(), to_tick);
   }
 
-  // # of objects in this client snapshot
-  dg.add_uint16(num_objects);
+  if (distributed2_cat.is_debug()) {
+    distributed2_cat.debug()
+      << candidates.size() << " relevant objects sent for client from " << from_tick
+      << " to " << to_tick << "\n";
+  }
 
-  // Copy object data onto main datagram
-  dg.append_data(object_dg.get_data(), object_dg.get_length());
+  return (int)candidates.size();
+}
+
+/**
+ * If the object defines a getRelevancePos() method, stores its current
+ * position on the snapshot entry, for use by relevance filters.
+ */
+void FrameSnapshotManager::
+record_relevance_pos(FrameSnapshotEntry &entry, DOID_TYPE do_id) {
+  DODataMap::const_iterator it = _do_data.find(do_id);
+  if (it == _do_data.end()) {
+    return;
+  }
+
+  PyObject *get_pos = (*it).second->_get_relevance_pos;
+  if (get_pos == nullptr) {
+    return;
+  }
+
+  PyObject *pos = PyObject_CallObject(get_pos, nullptr);
+  if (pos == nullptr) {
+    distributed2_cat.error()
+      << "Python error occurred during getRelevancePos() for DO " << do_id << "\n";
+    PyErr_Print();
+    return;
+  }
+
+  if (pos != Py_None && PySequence_Check(pos) && PySequence_Size(pos) >= 3) {
+    LPoint3f p;
+    for (int i = 0; i < 3; i++) {
+      PyObject *item = PySequence_GetItem(pos, i);
+      p[i] = (float)PyFloat_AsDouble(item);
+      Py_XDECREF(item);
+    }
+    if (PyErr_Occurred()) {
+      PyErr_Print();
+    } else {
+      entry.set_pos(p);
+    }
+  }
+
+  Py_DECREF(pos);
 }
 
 /**
@@ -491,6 +737,11 @@ add_object(PyObject *dist_obj) {
   data->_dclass = dclass;
   data->_dist_obj = dist_obj;
   data->_dict = PyObject_GetAttrString(dist_obj, (char *)"__dict__");
+  if (PyObject_HasAttrString(dist_obj, (char *)"getRelevancePos")) {
+    data->_get_relevance_pos = PyObject_GetAttrString(dist_obj, (char *)"getRelevancePos");
+  } else {
+    data->_get_relevance_pos = nullptr;
+  }
 
   data->_field_data.resize(dclass->get_num_inherited_fields());
 
@@ -538,6 +789,7 @@ remove_object(DOID_TYPE do_id) {
     Py_XDECREF(fdata._send_proxy);
     Py_XDECREF(fdata._field_name);
   }
+  Py_XDECREF(data->_get_relevance_pos);
   Py_XDECREF(data->_dict);
   Py_XDECREF(data->_dist_obj);
 
@@ -25,6 +25,8 @@
 #include "py_panda.h"
 
 class FrameSnapshot;
+class FrameSnapshotEntry;
+class SnapshotRelevanceFilter;
 class DCClass;
 class DCField;
 class DCPacker;
@@ -48,6 +50,9 @@ PUBLISHED:
     DCClass *_dclass;
     PyObject *_dist_obj;
     PyObject *_dict;
+    // Optional getRelevancePos() method, used to record the object's position
+    // in snapshots for distance-based relevance.
+    PyObject *_get_relevance_pos;
     pvector<DOFieldData> _field_data;
   };
 
@@ -75,6 +80,8 @@ private:
   bool encode_field(PyObject *dist_obj, DCClass *dclass, DCPacker &packer,
                     DCField *field, PackedObject::PackedFields &fields);
 
+  void record_relevance_pos(FrameSnapshotEntry &entry, DOID_TYPE do_id);
+
 PUBLISHED:
   PackedObject *find_or_create_object_packet_for_baseline(PyObject *dist_obj, DCClass *dclass,
                                                           DOID_TYPE do_id);
@@ -84,10 +91,32 @@ PUBLISHED:
 
 
 
-  void client_format_snapshot(Datagram &dg, FrameSnapshot *snapshot,
-                              PyObject *interest_zone_ids);
-  void client_format_delta_snapshot(Datagram &dg, FrameSnapshot *from,
-                                    FrameSnapshot *to, PyObject *interest_zone_ids);
+  // These only read from the snapshots, so they release the Python GIL while
+  // encoding.  This allows the server to format snapshots for several clients
+  // in parallel from a thread pool.
+  BLOCKING void client_format_snapshot(Datagram &dg, FrameSnapshot *snapshot,
+                                       PyObject *interest_zone_ids,
+                                       SnapshotRelevanceFilter *filter = nullptr,
+                                       PyObject *exclude_do_ids = nullptr);
+  BLOCKING void client_format_delta_snapshot(Datagram &dg, FrameSnapshot *from,
+                                             FrameSnapshot *to, PyObject *interest_zone_ids,
+                                             SnapshotRelevanceFilter *filter = nullptr,
+                                             PyObject *exclude_do_ids = nullptr);
+
+private:
+  typedef pvector<ZONEID_TYPE> ZoneIds;
+  typedef pvector<DOID_TYPE> DoIds;
+  static void get_interest_zone_ids(PyObject *py_interest_zone_ids,
+                                    ZoneIds &interest_zone_ids);
+  static void get_exclude_do_ids(PyObject *py_exclude_do_ids, DoIds &exclude_do_ids);
+  static bool is_excluded(const DoIds &exclude_do_ids, DOID_TYPE do_id);
+
+  int pack_filtered_delta_objects(Datagram &object_dg, FrameSnapshot *from,
+                                  FrameSnapshot *to, const ZoneIds &interest_zone_ids,
+                                  const DoIds &exclude_do_ids,
+                                  SnapshotRelevanceFilter *filter);
+  static void pack_object_delta(Datagram &object_dg, const FrameSnapshotEntry &entry,
+                                const vector_int &changed_fields, int num_changes);
 };
 
 #include "frameSnapshotManager.I"
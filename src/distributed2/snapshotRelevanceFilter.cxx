@@ -0,0 +1,108 @@
+/**
+ * PANDA 3D SOFTWARE
+ * Copyright (c) Carnegie Mellon University.  All rights reserved.
+ *
+ * All use of this software is subject to the terms of the revised BSD
+ * license.  You should have received a copy of this license along
+ * with this source code in a file named "LICENSE."
+ *
+ * @file snapshotRelevanceFilter.cxx
+ * @author agent
+ * @date 2026-10-18
+ */
+
+#include "snapshotRelevanceFilter.h"
+#include "frameSnapshotEntry.h"
+
+/**
+ * Returns the relevance of the object in the indicated snapshot entry to this
+ * client, from 0 (at or beyond the cull distance) to 1 (within the full-rate
+ * distance).
+ */
+float SnapshotRelevanceFilter::
+get_priority(const FrameSnapshotEntry &entry) const {
+  if (!_has_origin || !entry.has_pos()) {
+    return 1.0f;
+  }
+
+  float dist = (entry.get_pos() - _origin).length();
+  if (dist <= _full_rate_distance) {
+    return 1.0f;
+  }
+  if (dist >= _cull_distance) {
+    return 0.0f;
+  }
+
+  return 1.0f - (dist - _full_rate_distance) / (_cull_distance - _full_rate_distance);
+}
+
+/**
+ * Returns the number of snapshots between updates for an object with the
+ * indicated priority.
+ */
+int SnapshotRelevanceFilter::
+get_update_interval(float priority) const {
+  return 1 + (int)((_max_update_interval - 1) * (1.0f - priority) + 0.5f);
+}
+
+/**
+ * Returns the tick that the client's copy of the indicated object is known to
+ * be up to date with.  This is the client's acknowledged tick, unless the
+ * object has been left out of snapshots since before then.
+ */
+int SnapshotRelevanceFilter::
+get_baseline_tick(DOID_TYPE do_id, int from_tick) const {
+  ObjectStates::const_iterator it = _objects.find(do_id);
+  if (it == _objects.end()) {
+    return from_tick;
+  }
+  return std::min(from_tick, (*it).second._last_sent_tick);
+}
+
+/**
+ * Records that the indicated object was sent to the client in the snapshot
+ * for the indicated tick.
+ */
+void SnapshotRelevanceFilter::
+record_sent(DOID_TYPE do_id, int tick) {
+  ObjectStates::iterator it = _objects.find(do_id);
+  if (it != _objects.end()) {
+    (*it).second._last_sent_tick = tick;
+    (*it).second._num_skipped = 0;
+  }
+  // If we've never skipped the object, there's no need to remember it; the
+  // client's acknowledged tick is good enough as a baseline.
+}
+
+/**
+ * Records that the indicated object had changes that were left out of the
+ * snapshot.  Returns the number of snapshots in a row the object has now
+ * been skipped.
+ */
+int SnapshotRelevanceFilter::
+record_skipped(DOID_TYPE do_id, int from_tick) {
+  ObjectStates::iterator it = _objects.find(do_id);
+  if (it == _objects.end()) {
+    // First time we've skipped the object.  The client has its state as of
+    // the tick it last acknowledged.
+    ObjectState state;
+    state._last_sent_tick = from_tick;
+    state._num_skipped = 1;
+    _objects.insert({ do_id, state });
+    return 1;
+  }
+
+  return ++(*it).second._num_skipped;
+}
+
+/**
+ * Forgets the send history of the indicated object.  Call this when the object
+ * is deleted or leaves the client's interest.
+ */
+void SnapshotRelevanceFilter::
+remove_object(DOID_TYPE do_id) {
+  ObjectStates::iterator it = _objects.find(do_id);
+  if (it != _objects.end()) {
+    _objects.erase(it);
+  }
+}
@@ -0,0 +1,96 @@
+/**
+ * PANDA 3D SOFTWARE
+ * Copyright (c) Carnegie Mellon University.  All rights reserved.
+ *
+ * All use of this software is subject to the terms of the revised BSD
+ * license.  You should have received a copy of this license along
+ * with this source code in a file named "LICENSE."
+ *
+ * @file snapshotRelevanceFilter.h
+ * @author agent
+ * @date 2026-10-18
+ */
+
+#ifndef SNAPSHOTRELEVANCEFILTER_H
+#define SNAPSHOTRELEVANCEFILTER_H
+
+#include "config_distributed2.h"
+#include "referenceCount.h"
+#include "dcbase.h"
+#include "luse.h"
+#include "pmap.h"
+
+class FrameSnapshotEntry;
+
+/**
+ * Per-client area-of-interest filter for delta snapshots.  Objects that are
+ * in the client's interest zones are given a priority based on their distance
+ * from the client's origin (usually the client's avatar).  Objects within the
+ * full-rate distance are sent in every snapshot, and the rate falls off
+ * linearly with distance until it reaches one update every
+ * `max_update_interval` snapshots at the cull distance and beyond.  An
+ * optional budget caps the number of objects sent in a single snapshot;
+ * objects that don't make the cut are sent in a later snapshot.
+ *
+ * The filter remembers the tick each skipped object was last sent to the
+ * client, so that field changes made while the object was being skipped are
+ * still sent when it finally goes out.
+ *
+ * Objects that don't have a position in the snapshot are always sent in
+ * every snapshot.
+ */
+class EXPCL_DIRECT_DISTRIBUTED2 SnapshotRelevanceFilter : public ReferenceCount {
+PUBLISHED:
+  INLINE SnapshotRelevanceFilter();
+
+  INLINE void set_origin(const LPoint3f &origin);
+  INLINE void clear_origin();
+  INLINE bool has_origin() const;
+  INLINE const LPoint3f &get_origin() const;
+
+  INLINE void set_full_rate_distance(float distance);
+  INLINE float get_full_rate_distance() const;
+
+  INLINE void set_cull_distance(float distance);
+  INLINE float get_cull_distance() const;
+
+  INLINE void set_max_update_interval(int interval);
+  INLINE int get_max_update_interval() const;
+
+  INLINE void set_max_objects(int count);
+  INLINE int get_max_objects() const;
+
+  float get_priority(const FrameSnapshotEntry &entry) const;
+  int get_update_interval(float priority) const;
+
+  int get_baseline_tick(DOID_TYPE do_id, int from_tick) const;
+  void record_sent(DOID_TYPE do_id, int tick);
+  int record_skipped(DOID_TYPE do_id, int from_tick);
+  INLINE int get_num_skipped(DOID_TYPE do_id) const;
+
+  void remove_object(DOID_TYPE do_id);
+  INLINE void clear_objects();
+
+private:
+  class ObjectState {
+  public:
+    // The tick of the last snapshot this object was sent to the client in.
+    int _last_sent_tick;
+    // How many snapshots in a row this object has been left out of.
+    int _num_skipped;
+  };
+  typedef pflat_hash_map<DOID_TYPE, ObjectState, integer_hash<DOID_TYPE>> ObjectStates;
+  ObjectStates _objects;
+
+  LPoint3f _origin;
+  bool _has_origin;
+
+  float _full_rate_distance;
+  float _cull_distance;
+  int _max_update_interval;
+  int _max_objects;
+};
+
+#include "snapshotRelevanceFilter.I"
+
+#endif // SNAPSHOTRELEVANCEFILTER_H
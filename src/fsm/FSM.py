@@ -17,6 +17,15 @@ from panda3d.core import AsyncTaskManager, AsyncFuture, PythonTask
 import types
 
 
+# The names of the enter, exit and filter methods of each state, and of the
+# fromTo method of each pair of states, so that they aren't built again on
+# every transition.
+_enterNames = {}
+_exitNames = {}
+_filterNames = {}
+_fromToNames = {}
+
+
 class FSMException(Exception):
     pass
 
@@ -167,8 +176,16 @@ class FSM(DirectObject):
     # a capital letter) are allowed.  If it is set to an empty
     # map, no transitions are implicitly allowed--all transitions
     # must be approved by some filter function.
+    #
+    # The map is compiled into a lookup table the first time it is
+    # used, so don't modify it in place after that; assign a new map
+    # instead.
     defaultTransitions = None
 
+    # defaultTransitions maps that are shared by all instances of a
+    # class are compiled only once; id(map) -> (map, table).
+    __transitionTables = {}
+
     __doneFuture = AsyncFuture()
     __doneFuture.set_result(None)
 
@@ -193,6 +210,10 @@ class FSM(DirectObject):
         # states.
         self.__requestQueue = []
 
+        # The (defaultTransitions, table) pair last used by
+        # defaultFilter().
+        self.__transitionTable = None
+
         if __debug__:
             from direct.fsm.ClassicFSM import _debugFsms
             import weakref
@@ -223,7 +244,10 @@ class FSM(DirectObject):
             error = "FSM cannot determine current filter while in transition (%s -> %s)." % (self.oldState, self.newState)
             raise AlreadyInTransition(error)
 
-        filter = getattr(self, "filter" + self._state, None)
+        attrName = _filterNames.get(self._state)
+        if attrName is None:
+            attrName = _filterNames[self._state] = "filter" + self._state
+        filter = getattr(self, attrName, None)
         if not filter:
             # If there's no matching filterState() function, call
             # defaultFilter() instead.
@@ -408,7 +432,8 @@ class FSM(DirectObject):
             # We can always go to the "Off" state.
             return (request,) + args
 
-        if self.defaultTransitions is None:
+        transitions = self.defaultTransitions
+        if transitions is None:
             # If self.defaultTransitions is None, it means to accept
             # all requests whose name begins with a capital letter.
             # These are direct requests to a particular state.
@@ -419,31 +444,14 @@ class FSM(DirectObject):
             # allowed transitions from each state.  That is, each key
             # of the map is the current state name; for that key, the
             # value is a list of allowed transitions from the
-            # indicated state.
-            if request in self.defaultTransitions.get(self._state, []):
-                # This transition is listed in the defaultTransitions map;
-                # accept it.
-                return (request,) + args
-
-            elif FSM.EnumStates.ANY in self.defaultTransitions.get(self._state, []):
-                # Whenever we have a '*' as our to transition, we allow
-                # to transit to any other state
-                return (request,) + args
-
-            elif request in self.defaultTransitions.get(FSM.EnumStates.ANY, []):
-                # If the requested state is in the default transitions
-                # from any state list, we also alow to transit to the
-                # new state
-                return (request,) + args
-
-            elif FSM.EnumStates.ANY in self.defaultTransitions.get(FSM.EnumStates.ANY, []):
-                # This is like we had set the defaultTransitions to None.
-                # Any state can transit to any other state
-                return (request,) + args
-
-            elif request in self.defaultTransitions.get(FSM.EnumStates.DEFAULT, []):
-                # This is the fallback state that we use whenever no
-                # other trnasition was possible
+            # indicated state.  We look it up in the compiled form of
+            # the map; see __compileTransitions().
+            table = self.__transitionTable
+            if table is None or table[0] is not transitions:
+                table = self.__getTransitionTable(transitions)
+            allowed = table[1].get(self._state, table[2])
+            if allowed is None or request in allowed:
+                # This transition is allowed; accept it.
                 return (request,) + args
 
             # If self.defaultTransitions is not None, it is an error
@@ -458,6 +466,44 @@ class FSM(DirectObject):
         assert self.notify.debug("%s ignoring request %s from state %s." % (self._name, request, self._state))
         return None
 
+    def __getTransitionTable(self, transitions):
+        if 'defaultTransitions' in self.__dict__:
+            # This instance has its own map.
+            table = (transitions,) + self.__compileTransitions(transitions)
+        else:
+            table = FSM.__transitionTables.get(id(transitions))
+            if table is None or table[0] is not transitions:
+                table = (transitions,) + self.__compileTransitions(transitions)
+                FSM.__transitionTables[id(transitions)] = table
+        self.__transitionTable = table
+        return table
+
+    @staticmethod
+    def __compileTransitions(transitions):
+        # Compiles a defaultTransitions map into a map of each state to
+        # the set of states that may be requested from it, and the set
+        # for states not in the map.  None in place of a set means any
+        # state may be requested.
+        #
+        # A request is allowed if it is listed for the current state, or
+        # for ANY state, or as a DEFAULT; or if ANY is listed for the
+        # current state or for ANY state.
+        anyTransitions = transitions.get(FSM.EnumStates.ANY, [])
+        defaultTransitions = transitions.get(FSM.EnumStates.DEFAULT, [])
+        if FSM.EnumStates.ANY in anyTransitions:
+            return {}, None
+
+        fallback = frozenset(anyTransitions) | frozenset(defaultTransitions)
+        table = {}
+        for state, stateTransitions in transitions.items():
+            if state == FSM.EnumStates.ANY or state == FSM.EnumStates.DEFAULT:
+                continue
+            if FSM.EnumStates.ANY in stateTransitions:
+                table[state] = None
+            else:
+                table[state] = frozenset(stateTransitions) | fallback
+        return table, fallback
+
     def filterOff(self, request, args):
         """From the off state, we can always go directly to any other
         state."""
@@ -574,7 +620,10 @@ class FSM(DirectObject):
         # a new state, if it exists.
         assert self._state is None and self.newState == name
 
-        func = getattr(self, "enter" + name, None)
+        attrName = _enterNames.get(name)
+        if attrName is None:
+            attrName = _enterNames[name] = "enter" + name
+        func = getattr(self, attrName, None)
         if not func:
             # If there's no matching enterFoo() function, call
             # defaultEnter() instead.
@@ -586,7 +635,11 @@ class FSM(DirectObject):
         # a new state, if it exists.
         assert self._state is None and self.oldState == oldState and self.newState == newState
 
-        func = getattr(self, "from%sTo%s" % (oldState,newState), None)
+        key = (oldState, newState)
+        attrName = _fromToNames.get(key)
+        if attrName is None:
+            attrName = _fromToNames[key] = "from%sTo%s" % key
+        func = getattr(self, attrName, None)
         if func:
             func(*args)
             return True
@@ -597,7 +650,10 @@ class FSM(DirectObject):
         # state, if it exists.
         assert self._state is None and self.oldState == name
 
-        func = getattr(self, "exit" + name, None)
+        attrName = _exitNames.get(name)
+        if attrName is None:
+            attrName = _exitNames[name] = "exit" + name
+        func = getattr(self, attrName, None)
         if not func:
             # If there's no matching exitFoo() function, call
             # defaultExit() instead.
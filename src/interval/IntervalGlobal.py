@@ -11,6 +11,7 @@ from .Interval import *
 from .ActorInterval import *
 from .FunctionInterval import *
 from .LerpInterval import *
+from .LerpGroup import *
 from .IndirectInterval import *
 from .MopathInterval import *
 try:
@@ -3,7 +3,7 @@ this class, ivalMgr."""
 
 __all__ = ['IntervalManager', 'ivalMgr']
 
-from panda3d.core import EventQueue
+from panda3d.core import ClockObject, EventQueue
 from panda3d.direct import CIntervalManager, Dtool_BorrowThisReference
 from direct.showbase import EventManager
 import fnmatch
@@ -30,6 +30,8 @@ class IntervalManager(CIntervalManager):
         self.setEventQueue(self.eventQueue)
         self.ivals = []
         self.removedIvals = {}
+        # The LerpGroups that are currently playing.
+        self.lerpGroups = []
 
     def addInterval(self, interval):
         index = self.addCInterval(interval, 1)
@@ -91,8 +93,26 @@ class IntervalManager(CIntervalManager):
         # of the per-frame processing on the active intervals.
         # Call C++ step, then do the Python stuff.
         CIntervalManager.step(self)
+        if self.lerpGroups:
+            self.__stepLerpGroups()
         self.__doPythonCallbacks()
 
+    def addLerpGroup(self, group):
+        # Called by a LerpGroup to have it stepped each frame.
+        if group not in self.lerpGroups:
+            self.lerpGroups.append(group)
+
+    def removeLerpGroup(self, group):
+        if group in self.lerpGroups:
+            self.lerpGroups.remove(group)
+
+    def __stepLerpGroups(self):
+        now = ClockObject.getGlobalClock().getFrameTime()
+        # A group may remove itself, or its callbacks may add new groups,
+        # while we step.
+        for group in list(self.lerpGroups):
+            group.privStep(now)
+
     def interrupt(self):
         # This method should be called during an emergency cleanup
         # operation, to automatically pause or finish all active
@@ -0,0 +1,142 @@
+"""LerpGroup module: contains the LerpGroup class"""
+
+__all__ = ['LerpGroup']
+
+from panda3d.core import ClockObject, LVecBase4
+from panda3d.direct import CLerpInterval, CLerpNodePathGroup
+from direct.directnotify.DirectNotifyGlobal import directNotify
+from direct.showbase.MessengerGlobal import messenger
+from .IntervalManager import ivalMgr
+
+
+class LerpGroup(CLerpNodePathGroup):
+    """
+    Lerps the same property on many NodePaths at once, for when there are
+    too many small lerps to give each one its own LerpInterval, such as
+    moving a crowd or fading a grid of props.
+
+    All of the lerps in the group are stepped together in C++ by the
+    IntervalManager each frame, so they cost no Python time while running.
+    Python is only involved when a lerp finishes, to send its doneEvent
+    and call its callback, if it was given either.  The group is stepped
+    while it has lerps in it.
+
+    Example::
+
+        group = LerpGroup('colorScale')
+        for prop in props:
+            group.lerp(prop, 0.5, (1, 1, 1, 0), callback=prop.hide)
+    """
+
+    notify = directNotify.newCategory('LerpGroup')
+
+    lerpGroupNum = 1
+
+    LerpTypes = {
+        'pos': CLerpNodePathGroup.LTPos,
+        'hpr': CLerpNodePathGroup.LTHpr,
+        'scale': CLerpNodePathGroup.LTScale,
+        'colorScale': CLerpNodePathGroup.LTColorScale,
+    }
+
+    def __init__(self, lerpType, name=None):
+        """
+        lerpType is one of 'pos', 'hpr', 'scale' or 'colorScale'.
+        """
+        if name is None:
+            name = '%s-%d' % (self.__class__.__name__, self.lerpGroupNum)
+            LerpGroup.lerpGroupNum += 1
+        CLerpNodePathGroup.__init__(self, name, self.LerpTypes[lerpType])
+        self.lerpType = lerpType
+        # lerpId -> (doneEvent, callback, extraArgs)
+        self.doneCallbacks = {}
+        self.playing = False
+
+    def destroy(self):
+        """
+        Stops all of the lerps in the group, leaving their nodes where they
+        are, and stops stepping the group.
+        """
+        self.clear()
+        self.doneCallbacks = {}
+        if self.playing:
+            ivalMgr.removeLerpGroup(self)
+            self.playing = False
+
+    def lerp(self, nodePath, duration, end, start=None, blendType='noBlend',
+             delay=0.0, doneEvent=None, callback=None, extraArgs=[]):
+        """
+        Lerps the property of the nodePath from start, or its current value
+        if start is None, to end, over duration seconds, beginning delay
+        seconds from now.  When the lerp finishes, doneEvent is sent if
+        given, and callback is called with extraArgs if given.
+
+        Returns an id that may be passed to stopLerp().
+        """
+        if start is None:
+            start = self.getValue(nodePath)
+
+        blendType = CLerpInterval.stringBlendType(blendType)
+        assert blendType != CLerpInterval.BTInvalid
+        startTime = ClockObject.getGlobalClock().getFrameTime() + delay
+        lerpId = self.addLerp(nodePath, self.__toVec4(start), self.__toVec4(end),
+                              startTime, duration, blendType)
+        if doneEvent is not None or callback is not None:
+            self.doneCallbacks[lerpId] = (doneEvent, callback, extraArgs)
+
+        if not self.playing:
+            ivalMgr.addLerpGroup(self)
+            self.playing = True
+        return lerpId
+
+    def stopLerp(self, lerpId):
+        """
+        Stops the indicated lerp where it is, without sending its doneEvent
+        or calling its callback.  Returns true if the lerp was still
+        running.
+        """
+        self.doneCallbacks.pop(lerpId, None)
+        return self.removeLerp(lerpId)
+
+    def getValue(self, nodePath):
+        """
+        Returns the current value of the lerped property on the nodePath.
+        """
+        if self.lerpType == 'pos':
+            return nodePath.getPos()
+        elif self.lerpType == 'hpr':
+            return nodePath.getHpr()
+        elif self.lerpType == 'scale':
+            return nodePath.getScale()
+        else:
+            return nodePath.getColorScale()
+
+    def __toVec4(self, value):
+        if len(value) == 3:
+            return LVecBase4(value[0], value[1], value[2], 0)
+        return LVecBase4(*value)
+
+    def privStep(self, now):
+        # Called by the IntervalManager each frame.
+        self.step(now)
+        if self.getNumLerps() == 0:
+            # Nothing left to step until another lerp is added.
+            ivalMgr.removeLerpGroup(self)
+            self.playing = False
+
+        numFinished = self.getNumFinished()
+        if numFinished == 0:
+            return
+        finished = [self.getFinished(i) for i in range(numFinished)]
+        self.clearFinished()
+
+        doneCallbacks = self.doneCallbacks
+        for lerpId in finished:
+            callbackInfo = doneCallbacks.pop(lerpId, None)
+            if callbackInfo is None:
+                continue
+            doneEvent, callback, extraArgs = callbackInfo
+            if doneEvent is not None:
+                messenger.send(doneEvent)
+            if callback is not None:
+                callback(*extraArgs)
@@ -25,6 +25,7 @@
     cConstrainPosHprInterval.cxx cConstrainPosHprInterval.I cConstrainPosHprInterval.h \
     cLerpInterval.cxx cLerpInterval.I cLerpInterval.h \
     cLerpNodePathInterval.cxx cLerpNodePathInterval.I cLerpNodePathInterval.h \
+    cLerpNodePathGroup.cxx cLerpNodePathGroup.I cLerpNodePathGroup.h \
     //cLerpAnimEffectInterval.cxx cLerpAnimEffectInterval.I cLerpAnimEffectInterval.h \
     cMetaInterval.cxx cMetaInterval.I cMetaInterval.h \
     hideInterval.cxx hideInterval.I hideInterval.h \
@@ -44,6 +45,7 @@
     cConstrainPosHprInterval.I cConstrainPosHprInterval.h \
     cLerpInterval.I cLerpInterval.h \
     cLerpNodePathInterval.I cLerpNodePathInterval.h \
+    cLerpNodePathGroup.I cLerpNodePathGroup.h \
     //cLerpAnimEffectInterval.I cLerpAnimEffectInterval.h \
     cMetaInterval.I cMetaInterval.h \
     hideInterval.I hideInterval.h \
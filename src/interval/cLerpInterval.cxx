@@ -49,9 +49,18 @@ compute_delta(double t) const {
     return 1.0;
   }
   t /= duration;
+  return compute_blend(t, _blend_type);
+}
+
+/**
+ * Given a t value in the range [0, 1], clamps it to that range and applies
+ * the indicated blend type, returning the resulting delta value.
+ */
+double CLerpInterval::
+compute_blend(double t, BlendType blend_type) {
   t = std::min(std::max(t, 0.0), 1.0);
 
-  switch (_blend_type) {
+  switch (blend_type) {
   case BT_ease_in:
     {
       double t2 = t * t;
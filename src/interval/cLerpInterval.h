@@ -40,6 +40,9 @@ PUBLISHED:
 
   static BlendType string_blend_type(const std::string &blend_type);
 
+public:
+  static double compute_blend(double t, BlendType blend_type);
+
 protected:
   double compute_delta(double t) const;
 
@@ -0,0 +1,174 @@
+/**
+ * PANDA 3D SOFTWARE
+ * Copyright (c) Carnegie Mellon University.  All rights reserved.
+ *
+ * All use of this software is subject to the terms of the revised BSD
+ * license.  You should have received a copy of this license along
+ * with this source code in a file named "LICENSE."
+ *
+ * @file cLerpNodePathGroup.cxx
+ * @author agent
+ * @date 2026-10-18
+ */
+
+#include "cLerpNodePathGroup.h"
+#include "config_interval.h"
+
+TypeHandle CLerpNodePathGroup::_type_handle;
+
+/**
+ *
+ */
+CLerpNodePathGroup::
+CLerpNodePathGroup(const std::string &name, LerpType lerp_type) :
+  _name(name),
+  _lerp_type(lerp_type),
+  _next_lerp_id(1)
+{
+}
+
+/**
+ * Adds a new lerp of the node from the start value to the end value, which
+ * begins at start_time (on the same clock that is passed to step()) and lasts
+ * for duration seconds.  For pos, hpr and scale lerps, only the first three
+ * components of the start and end values are used.
+ *
+ * Returns an id that identifies the lerp in remove_lerp() and
+ * get_finished().
+ */
+int CLerpNodePathGroup::
+add_lerp(const NodePath &node, const LVecBase4 &start, const LVecBase4 &end,
+         double start_time, double duration,
+         CLerpInterval::BlendType blend_type) {
+  nassertr(!node.is_empty(), -1);
+  nassertr(!start.is_nan() && !end.is_nan(), -1);
+
+  int lerp_id = _next_lerp_id++;
+
+  LerpDef def;
+  def._node = node;
+  def._start = start;
+  def._delta = end - start;
+  def._start_time = start_time;
+  // A zero duration lerp works as a set, the first time it is stepped.
+  def._inv_duration = (duration > 0.0) ? 1.0 / duration : 0.0;
+  def._blend_type = blend_type;
+  def._lerp_id = lerp_id;
+
+  _indices[lerp_id] = _lerps.size();
+  _lerps.push_back(std::move(def));
+  return lerp_id;
+}
+
+/**
+ * Removes the indicated lerp from the group without finishing it.  The node
+ * is left where the lerp last put it.  Returns true if the lerp was found,
+ * false if it had already finished or been removed.
+ */
+bool CLerpNodePathGroup::
+remove_lerp(int lerp_id) {
+  Indices::iterator ii = _indices.find(lerp_id);
+  if (ii == _indices.end()) {
+    return false;
+  }
+  remove_index((*ii).second);
+  return true;
+}
+
+/**
+ * Removes all lerps from the group without finishing them.
+ */
+void CLerpNodePathGroup::
+clear() {
+  _lerps.clear();
+  _indices.clear();
+  _finished.clear();
+}
+
+/**
+ * Advances all of the lerps in the group to the indicated time.  Lerps that
+ * reach their end are set to their final value and removed, and reported by
+ * get_finished().  Lerps that haven't reached their start time yet are not
+ * touched.
+ */
+void CLerpNodePathGroup::
+step(double now) {
+  size_t i = 0;
+  while (i < _lerps.size()) {
+    LerpDef &def = _lerps[i];
+    double t = now - def._start_time;
+    if (t < 0.0) {
+      ++i;
+      continue;
+    }
+
+    bool done;
+    if (def._inv_duration == 0.0) {
+      done = true;
+    } else {
+      t *= def._inv_duration;
+      done = (t >= 1.0);
+    }
+
+    if (done) {
+      apply(def._node, def._start + def._delta);
+      _finished.push_back(def._lerp_id);
+      // This moves the last lerp into slot i, so we don't advance i.
+      remove_index(i);
+
+    } else {
+      PN_stdfloat d = (PN_stdfloat)CLerpInterval::compute_blend(t, def._blend_type);
+      apply(def._node, def._start + def._delta * d);
+      ++i;
+    }
+  }
+}
+
+/**
+ *
+ */
+void CLerpNodePathGroup::
+output(std::ostream &out) const {
+  out << "CLerpNodePathGroup " << _name << ", " << _lerps.size() << " lerps";
+}
+
+/**
+ * Removes the lerp at the indicated index, by moving the last lerp into its
+ * slot.
+ */
+void CLerpNodePathGroup::
+remove_index(size_t index) {
+  nassertv(index < _lerps.size());
+  _indices.erase(_lerps[index]._lerp_id);
+
+  size_t last = _lerps.size() - 1;
+  if (index != last) {
+    _lerps[index] = std::move(_lerps[last]);
+    _indices[_lerps[index]._lerp_id] = index;
+  }
+  _lerps.pop_back();
+}
+
+/**
+ * Sets the lerped property of the node to the indicated value.
+ */
+void CLerpNodePathGroup::
+apply(NodePath &node, const LVecBase4 &value) const {
+  switch (_lerp_type) {
+  case LT_pos:
+    node.set_pos(value.get_xyz());
+    break;
+
+  case LT_hpr:
+    node.set_hpr(value.get_xyz());
+    break;
+
+  case LT_scale:
+    node.set_scale(value.get_xyz());
+    break;
+
+  case LT_color_scale:
+    node.set_color_scale(value);
+    break;
+  }
+}
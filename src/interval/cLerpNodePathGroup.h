@@ -0,0 +1,119 @@
+/**
+ * PANDA 3D SOFTWARE
+ * Copyright (c) Carnegie Mellon University.  All rights reserved.
+ *
+ * All use of this software is subject to the terms of the revised BSD
+ * license.  You should have received a copy of this license along
+ * with this source code in a file named "LICENSE."
+ *
+ * @file cLerpNodePathGroup.h
+ * @author agent
+ * @date 2026-10-18
+ */
+
+#ifndef CLERPNODEPATHGROUP_H
+#define CLERPNODEPATHGROUP_H
+
+#include "directbase.h"
+#include "cLerpInterval.h"
+#include "typedReferenceCount.h"
+#include "nodePath.h"
+#include "pvector.h"
+#include "pmap.h"
+#include "vector_int.h"
+
+/**
+ * Lerps the same property (pos, hpr, scale or color scale) on many NodePaths
+ * at once.  Each lerp is far lighter than a CLerpNodePathInterval: the lerps
+ * are kept together in one contiguous array and are all advanced by a single
+ * call to step(), so that thousands of them can run without any per-lerp
+ * Python overhead.
+ *
+ * Each lerp has its own start time, duration, blend type and start and end
+ * values.  When a lerp reaches its end, its final value is applied and it is
+ * removed from the group, and its id is reported through get_finished() so
+ * that the scripting language can run any completion callbacks.
+ */
+class EXPCL_DIRECT_INTERVAL CLerpNodePathGroup : public TypedReferenceCount {
+PUBLISHED:
+  enum LerpType {
+    LT_pos,
+    LT_hpr,
+    LT_scale,
+    LT_color_scale,
+  };
+
+  explicit CLerpNodePathGroup(const std::string &name, LerpType lerp_type);
+
+  INLINE const std::string &get_name() const;
+  INLINE LerpType get_lerp_type() const;
+
+  int add_lerp(const NodePath &node, const LVecBase4 &start,
+               const LVecBase4 &end, double start_time, double duration,
+               CLerpInterval::BlendType blend_type = CLerpInterval::BT_no_blend);
+  bool remove_lerp(int lerp_id);
+  INLINE bool has_lerp(int lerp_id) const;
+  INLINE size_t get_num_lerps() const;
+  void clear();
+
+  void step(double now);
+
+  INLINE size_t get_num_finished() const;
+  INLINE int get_finished(size_t n) const;
+  INLINE void clear_finished();
+
+  void output(std::ostream &out) const;
+
+private:
+  void remove_index(size_t index);
+  void apply(NodePath &node, const LVecBase4 &value) const;
+
+  class LerpDef {
+  public:
+    NodePath _node;
+    LVecBase4 _start;
+    LVecBase4 _delta;
+    double _start_time;
+    double _inv_duration;
+    CLerpInterval::BlendType _blend_type;
+    int _lerp_id;
+  };
+  typedef pvector<LerpDef> Lerps;
+  Lerps _lerps;
+
+  // Maps each lerp id to its index in _lerps.
+  typedef pmap<int, size_t> Indices;
+  Indices _indices;
+
+  vector_int _finished;
+
+  std::string _name;
+  LerpType _lerp_type;
+  int _next_lerp_id;
+
+public:
+  static TypeHandle get_class_type() {
+    return _type_handle;
+  }
+  static void init_type() {
+    TypedReferenceCount::init_type();
+    register_type(_type_handle, "CLerpNodePathGroup",
+                  TypedReferenceCount::get_class_type());
+  }
+  virtual TypeHandle get_type() const {
+    return get_class_type();
+  }
+  virtual TypeHandle force_init_type() {init_type(); return get_class_type();}
+
+private:
+  static TypeHandle _type_handle;
+};
+
+INLINE std::ostream &operator << (std::ostream &out, const CLerpNodePathGroup &group) {
+  group.output(out);
+  return out;
+}
+
+#include "cLerpNodePathGroup.I"
+
+#endif
@@ -20,6 +20,7 @@
 #include "cConstrainPosHprInterval.h"
 #include "cLerpInterval.h"
 #include "cLerpNodePathInterval.h"
+#include "cLerpNodePathGroup.h"
 //#include "cLerpAnimEffectInterval.h"
 #include "cMetaInterval.h"
 #include "showInterval.h"
@@ -73,6 +74,7 @@ init_libinterval() {
   CConstrainPosHprInterval::init_type();
   CLerpInterval::init_type();
   CLerpNodePathInterval::init_type();
+  CLerpNodePathGroup::init_type();
   //CLerpAnimEffectInterval::init_type();
   CMetaInterval::init_type();
   ShowInterval::init_type();
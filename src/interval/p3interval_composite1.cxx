@@ -8,6 +8,7 @@
 #include "cConstrainPosHprInterval.cxx"
 #include "cLerpInterval.cxx"
 #include "cLerpNodePathInterval.cxx"
+#include "cLerpNodePathGroup.cxx"
 #include "cLerpAnimEffectInterval.cxx"
 #include "cMetaInterval.cxx"
 #include "hideInterval.cxx"
@@ -8,9 +8,11 @@ from panda3d.core import (
     Geom,
     GeomNode,
     GeomTriangles,
+    GeomVertexArrayFormat,
     GeomVertexData,
     GeomVertexFormat,
     GeomVertexWriter,
+    InternalName,
     Mat4,
     NodePath,
     NurbsCurveEvaluator,
@@ -18,13 +20,19 @@ from panda3d.core import (
     Vec3,
     Vec4,
 )
-from panda3d.direct import CMotionTrail
+from panda3d.direct import CMotionTrail, CMotionTrailManager
 from direct.task import Task
 from direct.task.TaskManagerGlobal import taskMgr
 from direct.showbase.DirectObject import DirectObject
 from direct.directnotify.DirectNotifyGlobal import directNotify
+from array import array
 import warnings
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 _want_python_motion_trails = ConfigVariableBool('want-python-motion-trails', False)
 
@@ -37,7 +45,12 @@ def remove_task():
             if __debug__:
                 warnings.warn("%d motion trails still exist when motion trail task is removed" % (total_motion_trails), RuntimeWarning, stacklevel=2)
 
+        for motion_trail in MotionTrail.motion_trail_list:
+            motion_trail.registered = False
         MotionTrail.motion_trail_list = []
+        MotionTrail.trail_manager.clear()
+        MotionTrail.modified_trails = set()
+        MotionTrail.trail_lists_dirty = True
 
         taskMgr.remove(MotionTrail.motion_trail_task_name)
 
@@ -46,6 +59,24 @@ def remove_task():
         MotionTrail.task_added = False
 
 
+_trail_formats = {}
+
+
+def _get_trail_format(textured):
+    # Returns an all-float32 vertex format for the vectorized geometry
+    # builder, so that the vertex data can be written as one float array.
+    trail_format = _trail_formats.get(textured)
+    if trail_format is None:
+        array_format = GeomVertexArrayFormat()
+        array_format.addColumn(InternalName.getVertex(), 3, Geom.NTFloat32, Geom.CPoint)
+        array_format.addColumn(InternalName.getColor(), 4, Geom.NTFloat32, Geom.CColor)
+        if textured:
+            array_format.addColumn(InternalName.getTexcoord(), 2, Geom.NTFloat32, Geom.CTexcoord)
+        trail_format = GeomVertexFormat.registerFormat(array_format)
+        _trail_formats[textured] = trail_format
+    return trail_format
+
+
 class MotionTrailVertex:
     def __init__(self, vertex_id, vertex_function, context):
         self.vertex_id = vertex_id
@@ -65,6 +96,99 @@ class MotionTrailFrame:
         self.transform = transform
 
 
+class MotionTrailFrameBuffer:
+    """Ring buffer of the frames of a Python motion trail, newest first.
+
+    The frame times are kept in a contiguous array, and if NumPy is
+    available, so are the transforms, so that the geometry can be generated
+    from all of the frames at once.  Adding a frame and discarding the
+    oldest ones does not move the other frames.  The buffer starts with room
+    for `capacity` frames, and doubles in size if it runs out of room.
+    """
+
+    def __init__(self, capacity=64):
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+        self.capacity = capacity
+        self.times = array('d', bytes(8 * capacity))
+        self.transforms = [None] * capacity
+        if numpy is not None:
+            self.matrices = numpy.zeros((capacity, 4, 4), dtype=numpy.float32)
+        else:
+            self.matrices = None
+        # index of the newest frame
+        self.head = capacity - 1
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.head = self.capacity - 1
+        self.count = 0
+        transforms = self.transforms
+        for index in range(self.capacity):
+            transforms[index] = None
+
+    def push(self, time, transform):
+        """Adds a new frame, which becomes the newest frame."""
+        if self.count == self.capacity:
+            self.grow()
+        head = (self.head + 1) % self.capacity
+        self.head = head
+        self.times[head] = time
+        self.transforms[head] = transform
+        if self.matrices is not None:
+            self.matrices[head] = transform
+        self.count += 1
+
+    def grow(self):
+        count = self.count
+        times = [self.get_time(index) for index in range(count)]
+        transforms = [self.get_transform(index) for index in range(count)]
+        self.allocate(self.capacity * 2)
+        for index in range(count - 1, -1, -1):
+            self.push(times[index], transforms[index])
+
+    def discard_before(self, minimum_time):
+        """Discards the frames older than the given time."""
+        times = self.times
+        transforms = self.transforms
+        capacity = self.capacity
+        while self.count > 0:
+            tail = (self.head - self.count + 1) % capacity
+            if times[tail] >= minimum_time:
+                break
+            transforms[tail] = None
+            self.count -= 1
+
+    def get_time(self, index):
+        """Returns the time of the frame with the given index, where 0 is
+        the newest frame."""
+        return self.times[(self.head - index) % self.capacity]
+
+    def get_transform(self, index):
+        return self.transforms[(self.head - index) % self.capacity]
+
+    def shift_times(self, delta_time):
+        """Adds delta_time to the time of every frame."""
+        times = self.times
+        capacity = self.capacity
+        for index in range(self.count):
+            times[(self.head - index) % capacity] += delta_time
+
+    def get_indices(self):
+        """Returns a NumPy array of the slots of the frames, newest first."""
+        return (self.head - numpy.arange(self.count)) % self.capacity
+
+    def get_frames(self):
+        """Returns the frames as a list of `MotionTrailFrame` objects, newest
+        first."""
+        return [MotionTrailFrame(self.get_time(index), self.get_transform(index))
+                for index in range(self.count)]
+
+
 class MotionTrail(NodePath, DirectObject):
     """Generates smooth geometry-based motion trails behind a moving object.
 
@@ -89,6 +213,10 @@ class MotionTrail(NodePath, DirectObject):
     is used to generate the motion trails.  If for some reason you want to use
     the pure-Python implementation instead, set `want-python-motion-trails` to
     true in Config.prc.
+
+    Registered trails using the C++ implementation are all updated together
+    by a `.CMotionTrailManager`, with a single call each frame.  Whether a
+    trail uses the Python implementation is decided when it is registered.
     """
 
     notify = directNotify.newCategory("MotionTrail")
@@ -97,6 +225,15 @@ class MotionTrail(NodePath, DirectObject):
     motion_trail_list: list[MotionTrail] = []
     motion_trail_task_name = "motion_trail_task"
 
+    #: Updates the registered trails that use the C++ implementation.
+    trail_manager = CMotionTrailManager.getGlobalPtr()
+    #: Trails whose vertices or parameters must be sent to their CMotionTrail.
+    modified_trails: set[MotionTrail] = set()
+    # Set when the lists below must be rebuilt from motion_trail_list.
+    trail_lists_dirty = True
+    python_motion_trail_list: list[MotionTrail] = []
+    root_update_list: list[NodePath] = []
+
     global_enable = True
 
     @classmethod
@@ -113,8 +250,11 @@ class MotionTrail(NodePath, DirectObject):
         """
         NodePath.__init__(self, name)
 
+        self.cmotion_trail = CMotionTrail()
+        self.registered = False
+
         # required initialization
-        self.active = True
+        self._active = True
         self.enable = True
 
         self.pause = False
@@ -129,7 +269,10 @@ class MotionTrail(NodePath, DirectObject):
         self.last_update_time = 0.0
         self.texture = None
         self.vertex_list = []
-        self.frame_list = []
+        self.frame_buffer = MotionTrailFrameBuffer()
+        # (total_frames, total_vertices, indices) of the last triangle index
+        # array built by the vectorized geometry builder.
+        self.index_cache = None
 
         self.parent_node_path = parent_node_path
 
@@ -155,7 +298,7 @@ class MotionTrail(NodePath, DirectObject):
         self.square_t = True
 
 #        self.task_transform = False
-        self.root_node_path = None
+        self._root_node_path = None
 
         # node path states
         self.reparentTo(parent_node_path)
@@ -191,7 +334,7 @@ class MotionTrail(NodePath, DirectObject):
 
             MotionTrail.task_added = True
 
-        self.relative_to_render = False
+        self._relative_to_render = False
 
         #: Set this to True to use a NURBS curve to generate a smooth trail,
         #: even if the underlying animation or movement is janky.
@@ -200,7 +343,6 @@ class MotionTrail(NodePath, DirectObject):
         #: This can be changed to fine-tune the resolution of the NURBS curve.
         self.resolution_distance = 0.5
 
-        self.cmotion_trail = CMotionTrail()
         self.cmotion_trail.setGeomNode(self.geom_node)
 
         self.modified_vertices = True
@@ -209,9 +351,71 @@ class MotionTrail(NodePath, DirectObject):
         else:
             self.use_python_version = False
 
+    @property
+    def active(self):
+        return self._active
+
+    @active.setter
+    def active(self, active):
+        self._active = active
+        self.cmotion_trail.setActive(active)
+        MotionTrail.trail_lists_dirty = True
+
+    @property
+    def root_node_path(self):
+        """The node that the trail's transform is computed relative to, or
+        None for the net transform.  If it is not render, its update()
+        method is called before the trail is updated.
+        """
+        return self._root_node_path
+
+    @root_node_path.setter
+    def root_node_path(self, root_node_path):
+        self._root_node_path = root_node_path
+        self.__update_trail_root()
+
+    @property
+    def relative_to_render(self):
+        return self._relative_to_render
+
+    @relative_to_render.setter
+    def relative_to_render(self, relative_to_render):
+        self._relative_to_render = relative_to_render
+        self.__update_trail_root()
+
+    def __update_trail_root(self):
+        if self.registered and not self.use_python_version:
+            root = self._root_node_path
+            MotionTrail.trail_manager.setTrailRoot(
+                self.cmotion_trail, root if root is not None else NodePath(),
+                self._relative_to_render)
+        MotionTrail.trail_lists_dirty = True
+
+    @property
+    def modified_vertices(self):
+        return self._modified_vertices
+
+    @modified_vertices.setter
+    def modified_vertices(self, modified_vertices):
+        self._modified_vertices = modified_vertices
+        if modified_vertices:
+            MotionTrail.modified_trails.add(self)
+        else:
+            MotionTrail.modified_trails.discard(self)
+
+    @property
+    def frame_list(self):
+        """The frames of the trail, newest first, as a list of
+        `MotionTrailFrame` objects.  This is a copy; the frames are kept in
+        `frame_buffer`.
+        """
+        return self.frame_buffer.get_frames()
+
     def delete(self):
         """Completely cleans up the motion trail object.
         """
+        self.unregister_motion_trail()
+        MotionTrail.modified_trails.discard(self)
         self.reset_motion_trail()
         self.reset_motion_trail_geometry()
         self.cmotion_trail.resetVertexList()
@@ -224,51 +428,65 @@ class MotionTrail(NodePath, DirectObject):
         print(matrix.getCell(2, 0), separator, matrix.getCell(2, 1), separator, matrix.getCell(2, 2), separator, matrix.getCell(2, 3))
         print(matrix.getCell(3, 0), separator, matrix.getCell(3, 1), separator, matrix.getCell(3, 2), separator, matrix.getCell(3, 3))
 
+    @classmethod
+    def update_trail_lists(cls):
+        """Rebuilds the list of registered trails that use the Python
+        implementation, and the list of distinct root nodes that must be
+        updated before the C++ trails are.
+        """
+        python_motion_trail_list = []
+        roots = {}
+        for motion_trail in cls.motion_trail_list:
+            if motion_trail.use_python_version:
+                python_motion_trail_list.append(motion_trail)
+            elif motion_trail.active:
+                root_node_path = motion_trail.root_node_path
+                if root_node_path is not None and root_node_path != render:
+                    roots[id(root_node_path)] = root_node_path
+
+        cls.python_motion_trail_list = python_motion_trail_list
+        cls.root_update_list = list(roots.values())
+        cls.trail_lists_dirty = False
+
     def motion_trail_task(self, task):
 
         current_time = task.time
-        total_motion_trails = len(MotionTrail.motion_trail_list)
 
-        index = 0
-        while index < total_motion_trails:
-            motion_trail = MotionTrail.motion_trail_list[index]
+        if MotionTrail.trail_lists_dirty:
+            MotionTrail.update_trail_lists()
 
-            if MotionTrail.global_enable:
-                if motion_trail.use_python_version:
-                    # Python version
-                    if motion_trail.active and motion_trail.check_for_update(current_time):
-                        transform = None
-                        if motion_trail.root_node_path is not None and motion_trail.root_node_path != render:
-                            motion_trail.root_node_path.update()
+        if not MotionTrail.global_enable:
+            MotionTrail.trail_manager.resetTrails()
+            for motion_trail in MotionTrail.python_motion_trail_list:
+                motion_trail.reset_motion_trail()
+                motion_trail.reset_motion_trail_geometry()
+            return Task.cont
 
-                        if motion_trail.root_node_path and not motion_trail.relative_to_render:
-                            transform = motion_trail.getMat(motion_trail.root_node_path)
-                        else:
-                            transform = Mat4(motion_trail.getNetTransform().getMat())
+        # C++ version: send any changed vertices, then update all of the
+        # trails at once.
+        if MotionTrail.modified_trails:
+            for motion_trail in list(MotionTrail.modified_trails):
+                motion_trail.transferVertices()
 
-                        if transform is not None:
-                            motion_trail.update_motion_trail(current_time, transform)
-                else:
-                    # C++ version
-                    if motion_trail.active and motion_trail.cmotion_trail.checkForUpdate(current_time):
-                        transform = None
-                        if motion_trail.root_node_path is not None and motion_trail.root_node_path != render:
-                            motion_trail.root_node_path.update()
-
-                        if motion_trail.root_node_path and not motion_trail.relative_to_render:
-                            transform = motion_trail.getMat(motion_trail.root_node_path)
-                        else:
-                            transform = Mat4(motion_trail.getNetTransform().getMat())
+        for root_node_path in MotionTrail.root_update_list:
+            root_node_path.update()
 
-                        if transform is not None:
-                            motion_trail.transferVertices()
-                            motion_trail.cmotion_trail.updateMotionTrail(current_time, transform)
+        MotionTrail.trail_manager.update(current_time)
 
-            else:
-                motion_trail.reset_motion_trail()
-                motion_trail.reset_motion_trail_geometry()
+        # Python version
+        for motion_trail in MotionTrail.python_motion_trail_list:
+            if motion_trail.active and motion_trail.check_for_update(current_time):
+                transform = None
+                if motion_trail.root_node_path is not None and motion_trail.root_node_path != render:
+                    motion_trail.root_node_path.update()
+
+                if motion_trail.root_node_path and not motion_trail.relative_to_render:
+                    transform = motion_trail.getMat(motion_trail.root_node_path)
+                else:
+                    transform = Mat4(motion_trail.getNetTransform().getMat())
 
-            index += 1
+                if transform is not None:
+                    motion_trail.update_motion_trail(current_time, transform)
 
         return Task.cont
 
@@ -388,6 +606,13 @@ class MotionTrail(NodePath, DirectObject):
         automatically every frame.  Be careful not to call this twice.
         """
         MotionTrail.motion_trail_list = MotionTrail.motion_trail_list + [self]
+        self.registered = True
+        if not self.use_python_version:
+            root = self.root_node_path
+            MotionTrail.trail_manager.addTrail(
+                self.cmotion_trail, self, root if root is not None else NodePath(),
+                self.relative_to_render)
+        MotionTrail.trail_lists_dirty = True
 
     def unregister_motion_trail(self):
         """Removes this motion trail from the list of trails that are updated
@@ -395,6 +620,10 @@ class MotionTrail(NodePath, DirectObject):
         """
         if self in MotionTrail.motion_trail_list:
             MotionTrail.motion_trail_list.remove(self)
+        if self.registered:
+            MotionTrail.trail_manager.removeTrail(self.cmotion_trail)
+            self.registered = False
+            MotionTrail.trail_lists_dirty = True
 
     def begin_geometry(self):
         self.vertex_index = 0
@@ -452,6 +681,80 @@ class MotionTrail(NodePath, DirectObject):
         self.geom_node.removeAllGeoms()
         self.geom_node.addGeom(self.geometry)
 
+    def build_geometry(self, current_time, transform, color_scale):
+        """Generates the trail geometry from all of the frames at once with
+        NumPy, and writes the vertex and index data in one block each.  The
+        result is the same as that of the quad-by-quad path, except that
+        neighboring quads share their vertices.  NURBS trails are not
+        supported by this path.
+        """
+        frame_buffer = self.frame_buffer
+        total_frames = len(frame_buffer)
+        total_vertices = self.total_vertices
+        vertex_list = self.vertex_list
+
+        slots = frame_buffer.get_indices()
+        times = numpy.frombuffer(frame_buffer.times, dtype=numpy.float64)[slots]
+        matrices = frame_buffer.matrices[slots]
+        if self.calculate_relative_matrix:
+            inverse_matrix = Mat4(transform)
+            inverse_matrix.invertInPlace()
+            matrices = matrices @ numpy.array(inverse_matrix, dtype=numpy.float32)
+
+        minimum_time = times[-1]
+        delta_time = current_time - minimum_time
+        if delta_time <= 0.0:
+            return
+        st = ((times - minimum_time) / delta_time).astype(numpy.float32)
+        t = st * st if self.square_t else st
+
+        vertices = numpy.array([motion_trail_vertex.vertex for motion_trail_vertex in vertex_list], dtype=numpy.float32)
+        colors = numpy.array([motion_trail_vertex.end_color + (motion_trail_vertex.start_color - motion_trail_vertex.end_color)
+                              for motion_trail_vertex in vertex_list], dtype=numpy.float32)
+
+        # one row per frame and vertex, frame-major
+        positions = numpy.einsum('nj,fjk->fnk', vertices, matrices)[:, :, :3]
+        vertex_colors = colors[numpy.newaxis, :, :] * (t * color_scale)[:, numpy.newaxis, numpy.newaxis]
+        columns = [positions, vertex_colors]
+
+        textured = self.texture is not None
+        if textured:
+            uvs = numpy.empty((total_frames, total_vertices, 2), dtype=numpy.float32)
+            uvs[:, :, 0] = st[:, numpy.newaxis]
+            uvs[:, :, 1] = [motion_trail_vertex.v for motion_trail_vertex in vertex_list]
+            columns.append(uvs)
+
+        rows = numpy.ascontiguousarray(numpy.concatenate(columns, axis=2), dtype=numpy.float32)
+
+        vertex_data = GeomVertexData("vertices", _get_trail_format(textured), Geom.UHStatic)
+        vertex_data.uncleanSetNumRows(total_frames * total_vertices)
+        memoryview(vertex_data.modifyArray(0)).cast('B')[:] = rows.tobytes()
+
+        index_cache = self.index_cache
+        if index_cache is None or index_cache[0] != total_frames or index_cache[1] != total_vertices:
+            base = (numpy.arange(total_frames - 1)[:, numpy.newaxis] * total_vertices +
+                    numpy.arange(total_vertices - 1)[numpy.newaxis, :]).ravel()
+            i0 = base
+            i1 = base + 1
+            i2 = base + total_vertices
+            i3 = base + total_vertices + 1
+            indices = numpy.stack([i0, i1, i2, i1, i3, i2], axis=1).astype(numpy.uint32).tobytes()
+            index_cache = (total_frames, total_vertices, indices)
+            self.index_cache = index_cache
+
+        indices = index_cache[2]
+        triangles = GeomTriangles(Geom.UHStatic)
+        triangles.setIndexType(Geom.NTUint32)
+        index_array = triangles.modifyVertices()
+        index_array.uncleanSetNumRows(len(indices) // 4)
+        memoryview(index_array).cast('B')[:] = indices
+
+        self.geometry = Geom(vertex_data)
+        self.geometry.addPrimitive(triangles)
+
+        self.geom_node.removeAllGeoms()
+        self.geom_node.addGeom(self.geometry)
+
     def check_for_update(self, current_time):
         """Returns true if the motion trail is overdue for an update based on
         the configured `sampling_time` (by default 0.0 to update continuously),
@@ -473,8 +776,9 @@ class MotionTrail(NodePath, DirectObject):
         seconds, updates it, extracting the new object position from the given
         transform matrix.
         """
-        if len(self.frame_list) >= 1:
-            if transform == self.frame_list[0].transform:
+        frame_buffer = self.frame_buffer
+        if len(frame_buffer) >= 1:
+            if transform == frame_buffer.get_transform(0):
                 # ignore duplicate transform updates
                 return
 
@@ -498,26 +802,13 @@ class MotionTrail(NodePath, DirectObject):
 
             # remove expired frames
             minimum_time = current_time - self.time_window
-
-            index = 0
-
-            last_frame_index = len(self.frame_list) - 1
-
-            while index <= last_frame_index:
-                motion_trail_frame = self.frame_list[last_frame_index - index]
-                if motion_trail_frame.time >= minimum_time:
-                    break
-                index += 1
-
-            if index > 0:
-                self.frame_list[last_frame_index - index: last_frame_index + 1] = []
+            frame_buffer.discard_before(minimum_time)
 
             # add new frame to beginning of list
-            motion_trail_frame = MotionTrailFrame(current_time, transform)
-            self.frame_list = [motion_trail_frame] + self.frame_list
+            frame_buffer.push(current_time, transform)
 
             # convert frames and vertices to geometry
-            total_frames = len(self.frame_list)
+            total_frames = len(frame_buffer)
 
             #print("total_frames", total_frames)
             #
@@ -528,10 +819,13 @@ class MotionTrail(NodePath, DirectObject):
             #    index += 1
 
             if total_frames >= 2 and self.total_vertices >= 2:
+                if numpy is not None and not (self.use_nurbs and total_frames >= 5):
+                    self.build_geometry(current_time, transform, color_scale)
+                    return
+
                 self.begin_geometry()
                 total_segments = total_frames - 1
-                last_motion_trail_frame = self.frame_list[total_segments]
-                minimum_time = last_motion_trail_frame.time
+                minimum_time = frame_buffer.get_time(total_segments)
                 delta_time = current_time - minimum_time
 
                 if self.calculate_relative_matrix:
@@ -558,21 +852,18 @@ class MotionTrail(NodePath, DirectObject):
                     # add vertices to each NurbsCurveEvaluator
                     segment_index = 0
                     while segment_index < total_segments:
-                        motion_trail_frame_start = self.frame_list[segment_index]
-                        motion_trail_frame_end = self.frame_list[segment_index + 1]
-
                         vertex_segment_index = 0
 
                         if self.calculate_relative_matrix:
                             start_transform = Mat4()
                             end_transform = Mat4()
 
-                            start_transform.multiply(motion_trail_frame_start.transform, inverse_matrix)
-                            end_transform.multiply(motion_trail_frame_end.transform, inverse_matrix)
+                            start_transform.multiply(frame_buffer.get_transform(segment_index), inverse_matrix)
+                            end_transform.multiply(frame_buffer.get_transform(segment_index + 1), inverse_matrix)
 
                         else:
-                            start_transform = motion_trail_frame_start.transform
-                            end_transform = motion_trail_frame_end.transform
+                            start_transform = frame_buffer.get_transform(segment_index)
+                            end_transform = frame_buffer.get_transform(segment_index + 1)
 
                         motion_trail_vertex_start = self.vertex_list[0]
 
@@ -710,11 +1001,8 @@ class MotionTrail(NodePath, DirectObject):
                 else:
                     segment_index = 0
                     while segment_index < total_segments:
-                        motion_trail_frame_start = self.frame_list[segment_index]
-                        motion_trail_frame_end = self.frame_list[segment_index + 1]
-
-                        start_t = (motion_trail_frame_start.time - minimum_time) / delta_time
-                        end_t = (motion_trail_frame_end.time - minimum_time) / delta_time
+                        start_t = (frame_buffer.get_time(segment_index) - minimum_time) / delta_time
+                        end_t = (frame_buffer.get_time(segment_index + 1) - minimum_time) / delta_time
 
                         st = start_t
                         et = end_t
@@ -729,11 +1017,11 @@ class MotionTrail(NodePath, DirectObject):
                         if self.calculate_relative_matrix:
                             start_transform = Mat4()
                             end_transform = Mat4()
-                            start_transform.multiply(motion_trail_frame_start.transform, inverse_matrix)
-                            end_transform.multiply(motion_trail_frame_end.transform, inverse_matrix)
+                            start_transform.multiply(frame_buffer.get_transform(segment_index), inverse_matrix)
+                            end_transform.multiply(frame_buffer.get_transform(segment_index + 1), inverse_matrix)
                         else:
-                            start_transform = motion_trail_frame_start.transform
-                            end_transform = motion_trail_frame_end.transform
+                            start_transform = frame_buffer.get_transform(segment_index)
+                            end_transform = frame_buffer.get_transform(segment_index + 1)
 
                         motion_trail_vertex_start = self.vertex_list[0]
 
@@ -796,7 +1084,7 @@ class MotionTrail(NodePath, DirectObject):
         """Call this to have the motion trail restart from nothing on the next
         update.
         """
-        self.frame_list = []
+        self.frame_buffer.clear()
         self.cmotion_trail.reset()
 
     def reset_motion_trail_geometry(self):
@@ -847,12 +1135,7 @@ class MotionTrail(NodePath, DirectObject):
         if self.pause:
             delta_time = current_time - self.pause_time
 
-            frame_index = 0
-            total_frames = len(self.frame_list)
-            while frame_index < total_frames:
-                motion_trail_frame = self.frame_list[frame_index]
-                motion_trail_frame.time += delta_time
-                frame_index += 1
+            self.frame_buffer.shift_times(delta_time)
 
             if self.fade:
                 self.fade_start_time += delta_time
@@ -33,11 +33,13 @@
 
   #define SOURCES \
     config_motiontrail.cxx config_motiontrail.h \
-    cMotionTrail.cxx cMotionTrail.h
+    cMotionTrail.cxx cMotionTrail.h \
+    cMotionTrailManager.cxx cMotionTrailManager.h
 
   #define INSTALL_HEADERS \
     config_motiontrail.h \
-    cMotionTrail.h
+    cMotionTrail.h \
+    cMotionTrailManager.h
 
   #define IGATESCAN all
 #end lib_target
@@ -53,6 +53,23 @@ enable(bool enable) {
   _enable = enable;
 }
 
+/**
+ * Sets whether the motion trail is active.  An inactive trail is skipped by
+ * the CMotionTrailManager.
+ */
+void CMotionTrail::
+set_active(bool active) {
+  _active = active;
+}
+
+/**
+ * Returns whether the motion trail is active.
+ */
+bool CMotionTrail::
+is_active() const {
+  return _active;
+}
+
 /**
  * Set the GeomNode.
  */
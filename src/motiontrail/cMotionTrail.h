@@ -76,6 +76,8 @@ PUBLISHED:
   void reset_vertex_list();
 
   void enable(bool enable);
+  void set_active(bool active);
+  bool is_active() const;
 
   void set_geom_node(GeomNode *geom_node);
   void add_vertex(const LVector4 &vertex, const LVector4 &start_color,
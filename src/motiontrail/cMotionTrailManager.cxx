@@ -0,0 +1,181 @@
+/**
+ * PANDA 3D SOFTWARE
+ * Copyright (c) Carnegie Mellon University.  All rights reserved.
+ *
+ * All use of this software is subject to the terms of the revised BSD
+ * license.  You should have received a copy of this license along
+ * with this source code in a file named "LICENSE."
+ *
+ * @file cMotionTrailManager.cxx
+ * @author agent
+ * @date 2026-10-18
+ */
+
+#include "cMotionTrailManager.h"
+#include "config_motiontrail.h"
+
+TypeHandle CMotionTrailManager::_type_handle;
+CMotionTrailManager *CMotionTrailManager::_global_ptr;
+
+/**
+ * Adds the trail to the manager, to be updated from the motion of the
+ * indicated node.  If root is not empty and relative_to_render is false, the
+ * transform given to the trail is the transform of the node relative to the
+ * root; otherwise, it is the net transform of the node.
+ *
+ * If the trail was already added, this replaces its node and root.
+ */
+void CMotionTrailManager::
+add_trail(CMotionTrail *trail, const NodePath &node, const NodePath &root,
+          bool relative_to_render) {
+  nassertv(trail != nullptr && !node.is_empty());
+
+  Indices::iterator ii = _indices.find(trail);
+  if (ii != _indices.end()) {
+    TrailDef &def = _trails[(*ii).second];
+    def._node = node;
+    def._root = root;
+    def._relative_to_render = relative_to_render;
+    return;
+  }
+
+  TrailDef def;
+  def._trail = trail;
+  def._node = node;
+  def._root = root;
+  def._relative_to_render = relative_to_render;
+
+  _indices[trail] = _trails.size();
+  _trails.push_back(std::move(def));
+}
+
+/**
+ * Removes the trail from the manager.  Returns true if it was found.
+ */
+bool CMotionTrailManager::
+remove_trail(CMotionTrail *trail) {
+  Indices::iterator ii = _indices.find(trail);
+  if (ii == _indices.end()) {
+    return false;
+  }
+
+  size_t index = (*ii).second;
+  _indices.erase(ii);
+
+  // Move the last trail into the removed trail's slot.
+  size_t last = _trails.size() - 1;
+  if (index != last) {
+    _trails[index] = std::move(_trails[last]);
+    _indices[_trails[index]._trail] = index;
+  }
+  _trails.pop_back();
+  return true;
+}
+
+/**
+ * Returns true if the trail has been added to the manager.
+ */
+bool CMotionTrailManager::
+has_trail(CMotionTrail *trail) const {
+  return _indices.find(trail) != _indices.end();
+}
+
+/**
+ * Returns the number of trails in the manager.
+ */
+size_t CMotionTrailManager::
+get_num_trails() const {
+  return _trails.size();
+}
+
+/**
+ * Removes all of the trails from the manager.
+ */
+void CMotionTrailManager::
+clear() {
+  _trails.clear();
+  _indices.clear();
+}
+
+/**
+ * Changes the root node of a trail that was already added.  Does nothing if
+ * the trail has not been added.
+ */
+void CMotionTrailManager::
+set_trail_root(CMotionTrail *trail, const NodePath &root,
+               bool relative_to_render) {
+  Indices::iterator ii = _indices.find(trail);
+  if (ii == _indices.end()) {
+    return;
+  }
+
+  TrailDef &def = _trails[(*ii).second];
+  def._root = root;
+  def._relative_to_render = relative_to_render;
+}
+
+/**
+ * Updates every active trail that is due for an update with the current
+ * transform of its node.  Returns the number of trails that were updated.
+ */
+int CMotionTrailManager::
+update(PN_stdfloat current_time) {
+  int num_updated = 0;
+
+  for (TrailDef &def : _trails) {
+    CMotionTrail *trail = def._trail;
+    if (!trail->_active || !trail->check_for_update(current_time)) {
+      continue;
+    }
+    if (def._node.is_empty()) {
+      continue;
+    }
+
+    CPT(TransformState) net_transform = def._node.get_net_transform();
+    if (def._root.is_empty() || def._relative_to_render) {
+      trail->update_motion_trail(current_time, net_transform->get_mat());
+
+    } else {
+      // Several trails often follow joints of the same actor, so look up
+      // the net transform of each root only once.
+      RootTransforms::iterator ri = _root_transforms.find(def._root);
+      if (ri == _root_transforms.end()) {
+        ri = _root_transforms.insert(RootTransforms::value_type(
+          def._root, def._root.get_net_transform())).first;
+      }
+      CPT(TransformState) transform = (*ri).second->invert_compose(net_transform);
+      trail->update_motion_trail(current_time, transform->get_mat());
+    }
+    ++num_updated;
+  }
+
+  _root_transforms.clear();
+  return num_updated;
+}
+
+/**
+ * Clears the sample history and the geometry of every trail.
+ */
+void CMotionTrailManager::
+reset_trails() {
+  for (TrailDef &def : _trails) {
+    CMotionTrail *trail = def._trail;
+    trail->reset();
+    if (trail->_geom_node != nullptr) {
+      trail->_geom_node->remove_all_geoms();
+    }
+  }
+}
+
+/**
+ * Returns the global CMotionTrailManager, which is used by the MotionTrail
+ * class.
+ */
+CMotionTrailManager *CMotionTrailManager::
+get_global_ptr() {
+  if (_global_ptr == nullptr) {
+    _global_ptr = new CMotionTrailManager;
+    _global_ptr->ref();
+  }
+  return _global_ptr;
+}
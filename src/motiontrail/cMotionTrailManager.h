@@ -0,0 +1,95 @@
+/**
+ * PANDA 3D SOFTWARE
+ * Copyright (c) Carnegie Mellon University.  All rights reserved.
+ *
+ * All use of this software is subject to the terms of the revised BSD
+ * license.  You should have received a copy of this license along
+ * with this source code in a file named "LICENSE."
+ *
+ * @file cMotionTrailManager.h
+ * @author agent
+ * @date 2026-10-18
+ */
+
+#ifndef CMOTIONTRAILMANAGER_H
+#define CMOTIONTRAILMANAGER_H
+
+#include "directbase.h"
+#include "cMotionTrail.h"
+#include "nodePath.h"
+#include "transformState.h"
+#include "pvector.h"
+#include "pmap.h"
+
+/**
+ * Holds any number of CMotionTrails and updates all of them with a single
+ * call to update() each frame, so that the cost of updating the trails from
+ * the scripting language does not grow with the number of trails.
+ *
+ * Each trail is registered along with the node whose motion it follows, and
+ * optionally the root node that its transform is computed relative to.  The
+ * net transform of each root is computed only once per update, however many
+ * trails share it.
+ */
+class EXPCL_DIRECT_MOTIONTRAIL CMotionTrailManager : public TypedReferenceCount {
+PUBLISHED:
+  CMotionTrailManager() = default;
+
+  void add_trail(CMotionTrail *trail, const NodePath &node,
+                 const NodePath &root = NodePath(),
+                 bool relative_to_render = false);
+  bool remove_trail(CMotionTrail *trail);
+  bool has_trail(CMotionTrail *trail) const;
+  size_t get_num_trails() const;
+  void clear();
+
+  void set_trail_root(CMotionTrail *trail, const NodePath &root,
+                      bool relative_to_render);
+
+  int update(PN_stdfloat current_time);
+  void reset_trails();
+
+  static CMotionTrailManager *get_global_ptr();
+
+private:
+  class TrailDef {
+  public:
+    PT(CMotionTrail) _trail;
+    NodePath _node;
+    NodePath _root;
+    bool _relative_to_render;
+  };
+  typedef pvector<TrailDef> Trails;
+  Trails _trails;
+
+  // Maps each trail to its index in _trails.
+  typedef pmap<CMotionTrail *, size_t> Indices;
+  Indices _indices;
+
+  // The net transforms of the roots, computed during update().  These are
+  // keyed by NodePath, since the same node may be reached by different
+  // paths with different net transforms.
+  typedef pmap<NodePath, CPT(TransformState)> RootTransforms;
+  RootTransforms _root_transforms;
+
+  static CMotionTrailManager *_global_ptr;
+
+public:
+  static TypeHandle get_class_type() {
+    return _type_handle;
+  }
+  static void init_type() {
+    TypedReferenceCount::init_type();
+    register_type(_type_handle, "CMotionTrailManager",
+                  TypedReferenceCount::get_class_type());
+  }
+  virtual TypeHandle get_type() const {
+    return get_class_type();
+  }
+  virtual TypeHandle force_init_type() {init_type(); return get_class_type();}
+
+private:
+  static TypeHandle _type_handle;
+};
+
+#endif
@@ -12,6 +12,7 @@
  */
 
 #include "config_motiontrail.h"
+#include "cMotionTrailManager.h"
 #include "dconfig.h"
 
 #if !defined(CPPPARSER) && !defined(LINK_ALL_STATIC) && !defined(BUILDING_DIRECT_MOTIONTRAIL)
@@ -38,6 +39,7 @@ init_libmotiontrail() {
   static bool initialized = false;
   if (initialized == false) {
     CMotionTrail::init_type();
+    CMotionTrailManager::init_type();
     initialized = true;
   }
 }
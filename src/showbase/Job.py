@@ -5,11 +5,24 @@ if __debug__:
     from panda3d.core import PStatCollector
 
 
+class _JobAwaitable:
+    # Awaited from an async run() method to pass a result to the JobManager,
+    # the way a generator run() method yields it.
+    __slots__ = ('_result',)
+
+    def __init__(self, result):
+        self._result = result
+
+    def __await__(self):
+        yield self._result
+
+
 class Job(DirectObject):
     """Base class for cpu-intensive or non-time-critical operations that
     are run through the :class:`.JobManager`.
 
-    To use, subclass and override the `run()` method.
+    To use, subclass and override the `run()` method.  `run()` may either be
+    a generator or an ``async def`` coroutine.
     """
 
     #: Yielded from the `run()` generator method when the job is done.
@@ -53,9 +66,26 @@ class Job(DirectObject):
         longer than the JobManager's timeslice between yields.
 
         When done, yield `Job.Done`.
+
+        Alternatively, this may be an ``async def`` method, which should
+        ``await Job.cont()`` or ``await Job.sleep()`` where a generator
+        would yield `Job.Continue` or `Job.Sleep`, and simply return when
+        done.  Other awaitables are not supported.
         """
         raise NotImplementedError("don't call down")
 
+    @staticmethod
+    def cont():
+        """Returns an awaitable that is the ``async def`` equivalent of
+        ``yield Job.Continue``."""
+        return _ContinueAwaitable
+
+    @staticmethod
+    def sleep():
+        """Returns an awaitable that is the ``async def`` equivalent of
+        ``yield Job.Sleep``."""
+        return _SleepAwaitable
+
     def getPriority(self):
         return self._priority
     def setPriority(self, priority):
@@ -107,6 +137,26 @@ class Job(DirectObject):
         if self._generator is not None:
             self._generator = None
 
+_ContinueAwaitable = _JobAwaitable(Job.Continue)
+_SleepAwaitable = _JobAwaitable(Job.Sleep)
+
+
+class CoroutineJob(Job):
+    """Runs a coroutine object, created from an ``async def`` function, as a
+    Job.  See `Job.run()` for what the coroutine may await."""
+
+    def __init__(self, name, coroutine):
+        Job.__init__(self, name)
+        self._coroutine = coroutine
+
+    def destroy(self):
+        del self._coroutine
+        Job.destroy(self)
+
+    def run(self):
+        return self._coroutine
+
+
 if __debug__: # __dev__ not yet available at this point
     class TestJob(Job):
         def __init__(self):
@@ -1,9 +1,9 @@
 from panda3d.core import ConfigVariableBool, ConfigVariableDouble, ClockObject
 from direct.directnotify.DirectNotifyGlobal import directNotify
 from direct.task.TaskManagerGlobal import taskMgr
-from direct.showbase.Job import Job
-from direct.showbase.PythonUtil import flywheel
+from direct.showbase.Job import Job, CoroutineJob
 from direct.showbase.MessengerGlobal import messenger
+import heapq
 
 
 class JobManager:
@@ -11,6 +11,11 @@ class JobManager:
     Similar to the taskMgr but designed for tasks that are CPU-intensive and/or
     not time-critical. Jobs run in a fixed timeslice that the JobManager is
     allotted each frame.
+
+    Jobs take turns in proportion to their priorities: each job has a pass
+    value that advances by 1/priority every turn it gets, and the job with
+    the lowest pass runs next.  The jobs are kept in a heap ordered by pass,
+    so adding and removing jobs is cheap even with many jobs queued.
     """
     notify = directNotify.newCategory("JobManager")
 
@@ -21,23 +26,26 @@ class JobManager:
         # how long do we run per frame
         self._timeslice = timeslice
         # store the jobs in these structures to allow fast lookup by various keys
-        # priority -> jobId -> job
+        # priority -> jobId -> job, in the order the jobs were added
         self._pri2jobId2job = {}
-        # priority -> chronological list of jobIds
-        self._pri2jobIds = {}
         # jobId -> priority
         self._jobId2pri = {}
-        # how many timeslices to give each job; this is used to efficiently implement
-        # the relative job priorities
-        self._jobId2timeslices = {}
         # how much time did the job use beyond the allotted timeslice, used to balance
         # out CPU usage
         self._jobId2overflowTime = {}
         self._useOverflowTime = None
-        # this is a generator that we use to give high-priority jobs more timeslices,
-        # it yields jobIds in a sequence that includes high-priority jobIds more often
-        # than low-priority
-        self._jobIdGenerator = None
+        # heap of (pass, serial, jobId) that determines which job runs next.
+        # Removed jobs are left in the heap, and skipped when they come up.
+        self._jobHeap = []
+        # jobId -> pass of the job's entry in the heap
+        self._jobId2pass = {}
+        # the pass of the job that ran most recently; new jobs start here so
+        # that they don't get to monopolize the JobManager
+        self._currentPass = 0.
+        self._heapSerial = 0
+        # jobId -> [number of runs, total time, longest run, frame of the last
+        # run, time used in the frame of the last run]
+        self._jobId2usage = {}
         self._highestPriority = Job.Priorities.Normal
 
     def destroy(self):
@@ -45,6 +53,12 @@ class JobManager:
         del self._pri2jobId2job
 
     def add(self, job):
+        """Adds a Job to be run.  A coroutine object may also be passed,
+        in which case it is wrapped in a `.CoroutineJob`.  Returns the
+        job."""
+        if not isinstance(job, Job):
+            name = getattr(job, '__qualname__', None) or repr(job)
+            job = CoroutineJob(name, job)
         pri = job.getPriority()
         jobId = job._getJobId()
         # store the job in the main table
@@ -52,47 +66,43 @@ class JobManager:
         self._pri2jobId2job[pri][jobId] = job
         # and also store a direct mapping from the job's ID to its priority
         self._jobId2pri[jobId] = pri
-        # add the jobId onto the end of the list of jobIds for this priority
-        self._pri2jobIds.setdefault(pri, [])
-        self._pri2jobIds[pri].append(jobId)
-        # record the job's relative timeslice count
-        self._jobId2timeslices[jobId] = pri
         # init the overflow time tracking
         self._jobId2overflowTime[jobId] = 0.
-        # reset the jobId round-robin
-        self._jobIdGenerator = None
+        self._jobId2usage[jobId] = [0, 0., 0., -1, 0.]
+        # the job's first turn comes after the turns already scheduled
+        self._schedule(jobId, self._currentPass)
         if len(self._jobId2pri) == 1:
             taskMgr.add(self._process, JobManager.TaskName)
             self._highestPriority = pri
         elif pri > self._highestPriority:
             self._highestPriority = pri
         self.notify.debug('added job: %s' % job.getJobName())
+        return job
 
     def remove(self, job):
         jobId = job._getJobId()
         # look up the job's priority
         pri = self._jobId2pri.pop(jobId)
-        # TODO: this removal is a linear search
-        self._pri2jobIds[pri].remove(jobId)
         # remove the job from the main table
         del self._pri2jobId2job[pri][jobId]
         # clean up the job's generator, if any
         job._cleanupGenerator()
-        # remove the job's timeslice count
-        self._jobId2timeslices.pop(jobId)
+        # the job's heap entry is skipped once it comes up
+        self._jobId2pass.pop(jobId, None)
+        self._jobId2usage.pop(jobId)
         # remove the overflow time
         self._jobId2overflowTime.pop(jobId)
         if len(self._pri2jobId2job[pri]) == 0:
             del self._pri2jobId2job[pri]
             if pri == self._highestPriority:
                 if len(self._jobId2pri) > 0:
-                    # calculate a new highest priority
-                    # TODO: this is not very fast
-                    priorities = self._getSortedPriorities()
-                    self._highestPriority = priorities[-1]
+                    # calculate a new highest priority; there are only ever a
+                    # few distinct priorities
+                    self._highestPriority = max(self._pri2jobId2job)
                 else:
                     taskMgr.remove(JobManager.TaskName)
                     self._highestPriority = 0
+                    self._jobHeap = []
         self.notify.debug('removed job: %s' % job.getJobName())
 
     def finish(self, job):
@@ -104,18 +114,23 @@ class JobManager:
         # grab the job
         job = self._pri2jobId2job[pri][jobId]
         gen = job._getGenerator()
+        isCoroutine = hasattr(gen, 'cr_await')
+        clock = ClockObject.getGlobalClock()
+        startT = clock.getRealTime()
         if __debug__:
             job._pstats.start()
         job.resume()
         while True:
             try:
-                result = next(gen)
+                result = gen.send(None)
             except StopIteration:
                 # Job didn't yield Job.Done, it ran off the end and returned
                 # treat it as if it returned Job.Done
-                self.notify.warning('job %s never yielded Job.Done' % job)
+                if not isCoroutine:
+                    self.notify.warning('job %s never yielded Job.Done' % job)
                 result = Job.Done
             if result is Job.Done:
+                self._recordUsage(jobId, clock.getRealTime() - startT)
                 job.suspend()
                 self.remove(job)
                 job._setFinished()
@@ -143,63 +158,118 @@ class JobManager:
         # returns all job priorities in ascending order
         return sorted(self._pri2jobId2job)
 
+    def _schedule(self, jobId, jobPass):
+        # gives the job its next turn at the indicated pass
+        self._jobId2pass[jobId] = jobPass
+        self._heapSerial += 1
+        heapq.heappush(self._jobHeap, (jobPass, self._heapSerial, jobId))
+
+    def _scheduleNextTurn(self, jobId, jobPass):
+        # high-priority jobs advance more slowly, so they come up more often
+        self._schedule(jobId, jobPass + 1. / max(1, self._jobId2pri[jobId]))
+
+    def _popNextJob(self):
+        # returns (jobId, pass) for the job whose turn is next, or
+        # (None, None) if there are no jobs waiting for a turn
+        heap = self._jobHeap
+        jobId2pass = self._jobId2pass
+        while heap:
+            jobPass, serial, jobId = heapq.heappop(heap)
+            if jobId2pass.get(jobId) == jobPass:
+                del jobId2pass[jobId]
+                self._currentPass = jobPass
+                return jobId, jobPass
+        return None, None
+
+    def _recordUsage(self, jobId, elapsed, frame=None):
+        usage = self._jobId2usage[jobId]
+        usage[0] += 1
+        usage[1] += elapsed
+        if elapsed > usage[2]:
+            usage[2] = elapsed
+        if frame is not None:
+            if usage[3] != frame:
+                usage[3] = frame
+                usage[4] = 0.
+            usage[4] += elapsed
+
+    def getJobUsage(self, job):
+        """Returns a dict describing how much time the job has used so far:
+        the number of times it has been run, the total and longest time it
+        has run for, and the fraction of the timeslice it used in the last
+        frame it ran.  Times are in seconds.  Returns None if the job is not
+        in the JobManager."""
+        usage = self._jobId2usage.get(job._getJobId())
+        if usage is None:
+            return None
+        numRuns, total, longest, frame, frameTime = usage
+        return {
+            'runs': numRuns,
+            'total': total,
+            'longest': longest,
+            'lastFrame': frame,
+            'lastFrameFraction': frameTime / self.getTimeslice(),
+        }
+
     def _process(self, task=None):
         if self._useOverflowTime is None:
             self._useOverflowTime = ConfigVariableBool('job-use-overflow-time', 1).value
 
         if len(self._pri2jobId2job) > 0:
             clock = ClockObject.getGlobalClock()
+            frame = clock.getFrameCount()
             #assert self.notify.debugCall()
             # figure out how long we can run
             endT = clock.getRealTime() + (self.getTimeslice() * .9)
+            # jobs that yielded Job.Sleep, which don't get another turn until
+            # next frame
+            sleeping = []
             while True:
-                if self._jobIdGenerator is None:
-                    # round-robin the jobs, giving high-priority jobs more timeslices
-                    self._jobIdGenerator = flywheel(
-                        list(self._jobId2timeslices.keys()),
-                        countFunc = lambda jobId: self._jobId2timeslices[jobId])
-                try:
-                    # grab the next jobId in the sequence
-                    jobId = next(self._jobIdGenerator)
-                except StopIteration:
-                    self._jobIdGenerator = None
-                    continue
-                # OK, we've selected a job to run
-                pri = self._jobId2pri.get(jobId)
-                if pri is None:
-                    # this job is no longer present
-                    continue
+                # grab the job whose turn is next
+                jobId, jobPass = self._popNextJob()
+                if jobId is None:
+                    # every job is sleeping
+                    break
+                pri = self._jobId2pri[jobId]
                 # check if there's overflow time that we need to make up for
                 if self._useOverflowTime:
                     overflowTime = self._jobId2overflowTime[jobId]
                     timeLeft = endT - clock.getRealTime()
                     if overflowTime >= timeLeft:
                         self._jobId2overflowTime[jobId] = max(0., overflowTime-timeLeft)
+                        # that was this job's turn
+                        self._scheduleNextTurn(jobId, jobPass)
                         # don't run any more jobs this frame, this makes up
                         # for the extra overflow time that was used before
                         break
                 job = self._pri2jobId2job[pri][jobId]
                 gen = job._getGenerator()
+                startT = clock.getRealTime()
                 if __debug__:
                     job._pstats.start()
                 job.resume()
                 while clock.getRealTime() < endT:
                     try:
-                        result = next(gen)
+                        result = gen.send(None)
                     except StopIteration:
                         # Job didn't yield Job.Done, it ran off the end and returned
-                        # treat it as if it returned Job.Done
-                        self.notify.warning('job %s never yielded Job.Done' % job)
+                        # treat it as if it returned Job.Done.  That's the
+                        # normal way for a coroutine to finish.
+                        if not hasattr(gen, 'cr_await'):
+                            self.notify.warning('job %s never yielded Job.Done' % job)
                         result = Job.Done
 
                     if result is Job.Sleep:
                         job.suspend()
                         if __debug__:
                             job._pstats.stop()
+                        self._recordUsage(jobId, clock.getRealTime() - startT, frame)
+                        sleeping.append((jobId, jobPass))
                         # grab the next job if there's time left
                         break
                     elif result is Job.Done:
                         job.suspend()
+                        self._recordUsage(jobId, clock.getRealTime() - startT, frame)
                         self.remove(job)
                         job._setFinished()
                         if __debug__:
@@ -211,16 +281,24 @@ class JobManager:
                     # we've run out of time
                     #assert self.notify.debug('timeslice end: %s, %s' % (endT, clock.getRealTime()))
                     job.suspend()
-                    overflowTime = clock.getRealTime() - endT
+                    now = clock.getRealTime()
+                    overflowTime = now - endT
                     if overflowTime > self.getTimeslice():
                         self._jobId2overflowTime[jobId] += overflowTime
                     if __debug__:
                         job._pstats.stop()
+                    self._recordUsage(jobId, now - startT, frame)
+                    self._scheduleNextTurn(jobId, jobPass)
                     break
 
                 if len(self._pri2jobId2job) == 0:
                     # there's nothing left to do, all the jobs are done!
                     break
+
+            # the sleeping jobs get their next turns next frame
+            for jobId, jobPass in sleeping:
+                if jobId in self._jobId2pri:
+                    self._scheduleNextTurn(jobId, jobPass)
         return task.cont
 
     def __len__(self):
@@ -237,9 +315,10 @@ class JobManager:
             pris.reverse()
             for pri in pris:
                 jobId2job = self._pri2jobId2job[pri]
-                # run through the jobs at this priority in the order that they will run
-                for jobId in self._pri2jobIds[pri]:
-                    job = jobId2job[jobId]
-                    s += '\n%5d: %s (jobId %s)' % (pri, job.getJobName(), jobId)
+                # run through the jobs at this priority in the order that they were added
+                for jobId, job in jobId2job.items():
+                    numRuns, total = self._jobId2usage[jobId][:2]
+                    s += '\n%5d: %s (jobId %s, %s runs, %.2f ms)' % (
+                        pri, job.getJobName(), jobId, numRuns, total * 1000.)
         s += '\n'
         return s
@@ -4,16 +4,25 @@
 
 __all__ = ['Messenger']
 
+from panda3d.core import ConfigVariableBool
 from direct.stdpy.threading import Lock
 from direct.directnotify import DirectNotifyGlobal
 from .PythonUtil import safeRepr
 import types
+import time
 
 
 class Messenger:
 
     notify = DirectNotifyGlobal.directNotify.newCategory("Messenger")
 
+    # If this is true, events sent without a task chain are dispatched
+    # without taking the lock.  Only safe if the messenger is never touched
+    # from more than one thread at a time.
+    LockFree = ConfigVariableBool('messenger-lock-free', False)
+    # If this is true, the time spent handling each event is recorded.
+    Profile = ConfigVariableBool('messenger-profile', False)
+
     def __init__(self):
         """
         One is keyed off the event name. It has the following structure::
@@ -41,10 +50,23 @@ class Messenger:
         # objMsgrId->listenerObject
         self._id2object = {}
 
+        # eventName->tuple of (objMsgrId, acceptorDict, callbackInfo), built
+        # from __callbacks the first time an event is sent, and thrown away
+        # whenever the listeners for that event change.  This saves building
+        # a list of the listeners every time an event is sent.
+        self.__dispatchTable = {}
+
         # A mapping of taskChain -> eventList, used for sending events
         # across task chains (and therefore across threads).
         self._eventQueuesByTaskChain = {}
 
+        # eventName->(taskChain, aggregate) for the events that are
+        # coalesced; see coalesce().
+        self.__coalescedEvents = {}
+        # eventName->list of sentArgs still waiting to be delivered for each
+        # coalesced event that has been sent.
+        self.__pendingCoalesced = {}
+
         # This protects the data structures within this object from
         # multithreaded access.
         self.lock = Lock()
@@ -62,6 +84,16 @@ class Messenger:
                        'collisionLoopFinished':1,
                        } # see def quiet()
 
+        self.__lockFree = self.LockFree.getValue()
+        self.__profiling = False
+        # event->[count, totalTime, maxTime]
+        self.__eventTimes = {}
+        # function->[count, totalTime, maxTime, method]
+        self.__handlerTimes = {}
+        if self.Profile.getValue():
+            self.setProfiling(True)
+        self.__updateFastSend()
+
     def _getMessengerId(self, object):
         # TODO: allocate this id in DirectObject.__init__ and get derived
         # classes to call down (speed optimization, assuming objects
@@ -165,6 +197,7 @@ class Messenger:
                             (object.__class__.__name__, safeRepr(event), method.__name__, oldMethod.__name__))
 
             acceptorDict[id] = [method, extraArgs, persistent]
+            self.__dispatchTable.pop(event, None)
 
             # Remember that this object is listening for this event
             eventDict = self.__objectEvents.setdefault(id, {})
@@ -192,6 +225,7 @@ class Messenger:
             # If this object is there, delete it from the dictionary
             if acceptorDict and id in acceptorDict:
                 del acceptorDict[id]
+                self.__dispatchTable.pop(event, None)
                 # If this dictionary is now empty, remove the event
                 # entry from the Messenger alltogether
                 if len(acceptorDict) == 0:
@@ -229,6 +263,7 @@ class Messenger:
                     # If this object is there, delete it from the dictionary
                     if acceptorDict and id in acceptorDict:
                         del acceptorDict[id]
+                        self.__dispatchTable.pop(event, None)
                         # If this dictionary is now empty, remove the event
                         # entry from the Messenger alltogether
                         if len(acceptorDict) == 0:
@@ -297,7 +332,24 @@ class Messenger:
                 the event (possibly till next frame or even later) and create a
                 new, temporary task within the named taskChain, but this is the
                 only way to send an event across threads.
+
+        If the event has been marked with coalesce(), and no taskChain is
+        given, it is deferred to the task chain it was marked with instead.
         """
+        coalesced = None
+        if not taskChain and self.__coalescedEvents:
+            coalesced = self.__coalescedEvents.get(event)
+
+        if self.__fastSend and not taskChain and coalesced is None:
+            # Nobody is watching, so we can skip straight to the handlers.
+            entries = self.__dispatchTable.get(event)
+            if entries is None:
+                entries = self.__compileDispatch(event)
+                if not entries:
+                    return
+            self.__dispatch(event, entries, sentArgs, 0, False)
+            return
+
         if Messenger.notify.getDebug() and not self.quieting.get(event):
             assert Messenger.notify.debug(
                 'sent event: %s sentArgs = %s, taskChain = %s' % (
@@ -319,23 +371,44 @@ class Messenger:
                         print("Messenger: \"%s\" was sent, but no function in Python listened."%(event,))
                 return
 
-            if taskChain:
+            if coalesced is not None:
+                taskChain, aggregate = coalesced
+                pending = self.__pendingCoalesced.get(event)
+                if pending is not None:
+                    # The event is already waiting to be delivered, so this
+                    # send just updates what it will be delivered with.
+                    if aggregate:
+                        pending.append(sentArgs)
+                    else:
+                        pending[0] = sentArgs
+                else:
+                    pending = [sentArgs]
+                    self.__pendingCoalesced[event] = pending
+                    self.__queueEvent(taskChain, (event, pending, foundWatch, aggregate))
+            elif taskChain:
                 # Queue the event onto the indicated task chain.
-                from direct.task.TaskManagerGlobal import taskMgr
-                queue = self._eventQueuesByTaskChain.setdefault(taskChain, [])
-                queue.append((acceptorDict, event, sentArgs, foundWatch))
-                if len(queue) == 1:
-                    # If this is the first (only) item on the queue,
-                    # spawn the task to empty it.
-                    taskMgr.add(self.__taskChainDispatch, name = 'Messenger-%s' % (taskChain),
-                                extraArgs = [taskChain], taskChain = taskChain,
-                                appendTask = True)
+                self.__queueEvent(taskChain, (event, sentArgs, foundWatch, None))
             else:
                 # Handle the event immediately.
-                self.__dispatch(acceptorDict, event, sentArgs, foundWatch)
+                entries = self.__dispatchTable.get(event)
+                if entries is None:
+                    entries = self.__compileDispatch(event)
+                self.__dispatch(event, entries, sentArgs, foundWatch, True)
         finally:
             self.lock.release()
 
+    def __queueEvent(self, taskChain, eventTuple):
+        # Assumes the lock is held.
+        from direct.task.TaskManagerGlobal import taskMgr
+        queue = self._eventQueuesByTaskChain.setdefault(taskChain, [])
+        queue.append(eventTuple)
+        if len(queue) == 1:
+            # If this is the first (only) item on the queue,
+            # spawn the task to empty it.
+            taskMgr.add(self.__taskChainDispatch, name = 'Messenger-%s' % (taskChain),
+                        extraArgs = [taskChain], taskChain = taskChain,
+                        appendTask = True)
+
     def __taskChainDispatch(self, taskChain, task):
         """ This task is spawned each time an event is sent across
         task chains.  Its job is to empty the task events on the queue
@@ -359,72 +432,250 @@ class Messenger:
                     # No event; we're done.
                     return task.done
 
-                self.__dispatch(*eventTuple)
+                event, sentArgs, foundWatch, aggregate = eventTuple
+                if aggregate is not None:
+                    # A coalesced event; from now on, sending it queues it
+                    # again.
+                    del self.__pendingCoalesced[event]
+                    if aggregate:
+                        sentArgs = [sentArgs]
+                    else:
+                        sentArgs = sentArgs[0]
+                entries = self.__dispatchTable.get(event)
+                if entries is None:
+                    entries = self.__compileDispatch(event)
+                if entries:
+                    self.__dispatch(event, entries, sentArgs, foundWatch, True)
             finally:
                 self.lock.release()
 
         return task.done
 
-    def __dispatch(self, acceptorDict, event, sentArgs, foundWatch):
-        for id in list(acceptorDict.keys()):
-            # We have to make this apparently redundant check, because
-            # it is possible that one object removes its own hooks
-            # in response to a handler called by a previous object.
+    def coalesce(self, event, aggregate=False, taskChain='default'):
+        """
+        Marks the event as coalesced.  Instead of being handled immediately,
+        a coalesced event is deferred to the indicated task chain, as if it
+        had been sent with that taskChain, and however many times it is sent
+        before it is delivered, its handlers are only called once.
+
+        This is useful for events that may be sent many times a frame, where
+        the handlers only care about the latest state.  By default, the
+        handlers receive the sentArgs of the last send.  If aggregate is
+        true, they instead receive a single argument, the list of the
+        sentArgs of every send, in order.
+
+        Events sent with an explicit taskChain are not coalesced.
+        """
+        self.lock.acquire()
+        try:
+            self.__coalescedEvents[event] = (taskChain, aggregate)
+        finally:
+            self.lock.release()
+
+    def uncoalesce(self, event):
+        """
+        Stops coalescing the event; see coalesce().  If it is waiting to be
+        delivered, it will still be delivered.
+        """
+        self.lock.acquire()
+        try:
+            self.__coalescedEvents.pop(event, None)
+        finally:
+            self.lock.release()
+
+    def isCoalesced(self, event):
+        return event in self.__coalescedEvents
+
+    def __compileDispatch(self, event):
+        # Builds the dispatch table entry for this event.  Assumes the lock
+        # is held, or that we're lock-free.
+        acceptorDict = self.__callbacks.get(event)
+        if not acceptorDict:
+            return None
+        entries = tuple([(id, acceptorDict, callInfo)
+                         for id, callInfo in acceptorDict.items()])
+        self.__dispatchTable[event] = entries
+        return entries
+
+    def __removeOneShot(self, event, id, acceptorDict):
+        # This object was only accepting this event once, remove it from
+        # the dictionary.  This object is no longer listening for this event.
+        eventDict = self.__objectEvents.get(id)
+        if eventDict and event in eventDict:
+            del eventDict[event]
+            if len(eventDict) == 0:
+                del self.__objectEvents[id]
+            self._releaseObject(self._getObject(id))
+
+        del acceptorDict[id]
+        self.__dispatchTable.pop(event, None)
+        # If the dictionary at this event is now empty, remove
+        # the event entry from the Messenger altogether
+        if event in self.__callbacks \
+                and (len(self.__callbacks[event]) == 0):
+            del self.__callbacks[event]
+
+    def __dispatch(self, event, entries, sentArgs, foundWatch, locked):
+        dispatchTable = self.__dispatchTable
+        profiling = self.__profiling
+        if profiling:
+            eventStart = time.perf_counter()
+
+        for id, acceptorDict, callInfo in entries:
+            # If the listeners for this event have changed since we started,
+            # we have to make this apparently redundant check, because it is
+            # possible that one object removes its own hooks in response to a
+            # handler called by a previous object.
             #
             # NOTE: there is no danger of skipping over objects due to
-            # modifications to acceptorDict, since the for..in above
-            # iterates over a list of objects that is created once at
-            # the start
-            callInfo = acceptorDict.get(id)
-            if callInfo:
-                method, extraArgs, persistent = callInfo
-                # If this object was only accepting this event once,
-                # remove it from the dictionary
-                if not persistent:
-                    # This object is no longer listening for this event
-                    eventDict = self.__objectEvents.get(id)
-                    if eventDict and event in eventDict:
-                        del eventDict[event]
-                        if len(eventDict) == 0:
-                            del self.__objectEvents[id]
-                        self._releaseObject(self._getObject(id))
-
-                    del acceptorDict[id]
-                    # If the dictionary at this event is now empty, remove
-                    # the event entry from the Messenger altogether
-                    if event in self.__callbacks \
-                            and (len(self.__callbacks[event]) == 0):
-                        del self.__callbacks[event]
+            # modifications to acceptorDict, since we iterate over a tuple
+            # of the objects that was created before the event was sent.
+            if dispatchTable.get(event) is not entries:
+                callInfo = acceptorDict.get(id)
+                if not callInfo:
+                    continue
 
-                if __debug__:
-                    if foundWatch:
-                        print("Messenger: \"%s\" --> %s%s"%(
-                            event,
-                            self.__methodRepr(method),
-                            tuple(extraArgs + sentArgs)))
-
-                #print "Messenger: \"%s\" --> %s%s"%(
-                #            event,
-                #            self.__methodRepr(method),
-                #            tuple(extraArgs + sentArgs))
-
-                # It is important to make the actual call here, after
-                # we have cleaned up the accept hook, because the
-                # method itself might call accept() or acceptOnce()
-                # again.
-                assert hasattr(method, '__call__')
+            method, extraArgs, persistent = callInfo
+            if not persistent:
+                self.__removeOneShot(event, id, acceptorDict)
 
+            if __debug__:
+                if foundWatch:
+                    print("Messenger: \"%s\" --> %s%s"%(
+                        event,
+                        self.__methodRepr(method),
+                        tuple(extraArgs) + tuple(sentArgs)))
+
+            # It is important to make the actual call here, after
+            # we have cleaned up the accept hook, because the
+            # method itself might call accept() or acceptOnce()
+            # again.
+            assert hasattr(method, '__call__')
+
+            if locked:
                 # Release the lock temporarily while we call the method.
                 self.lock.release()
-                try:
-                    result = method(*(extraArgs + sentArgs))
-                finally:
+            try:
+                if profiling:
+                    start = time.perf_counter()
+                    result = method(*extraArgs, *sentArgs)
+                    self.__recordHandlerTime(method, time.perf_counter() - start)
+                else:
+                    result = method(*extraArgs, *sentArgs)
+            finally:
+                if locked:
                     self.lock.acquire()
 
-                if hasattr(result, 'cr_await'):
-                    # It's a coroutine, so schedule it with the task manager.
-                    from direct.task.TaskManagerGlobal import taskMgr
-                    taskMgr.add(result)
+            if result is not None and hasattr(result, 'cr_await'):
+                # It's a coroutine, so schedule it with the task manager.
+                from direct.task.TaskManagerGlobal import taskMgr
+                taskMgr.add(result)
+
+        if profiling:
+            self.__recordEventTime(event, time.perf_counter() - eventStart)
+
+    def __updateFastSend(self):
+        # Events can skip the lock and the debugging checks in send() only
+        # when lock-free mode is on and there is nothing to report.
+        fastSend = self.__lockFree and not Messenger.notify.getDebug()
+        if __debug__:
+            fastSend = fastSend and not self.__isWatching
+        self.__fastSend = fastSend
+
+    def setLockFree(self, lockFree):
+        """
+        Sets whether events sent without a task chain are dispatched without
+        taking the lock.  This makes sending events cheaper, but it is only
+        safe if the messenger is only ever used from one thread; events may
+        still be sent across threads through a task chain, but nothing else
+        may accept, ignore or send events while the main thread does.
+
+        While watching events or in verbose mode, events are always sent the
+        regular way, so that they can be reported.
+        """
+        self.__lockFree = lockFree
+        self.__updateFastSend()
+
+    def isLockFree(self):
+        return self.__lockFree
+
+    def setProfiling(self, profiling):
+        """
+        Turns on or off recording the time spent handling each event, and in
+        each handler.  Turning it on clears any previous measurements.  See
+        getProfile() and reportProfile().
+        """
+        if profiling and not self.__profiling:
+            self.__eventTimes = {}
+            self.__handlerTimes = {}
+        self.__profiling = profiling
+
+    def isProfiling(self):
+        return self.__profiling
+
+    def __recordEventTime(self, event, elapsed):
+        record = self.__eventTimes.get(event)
+        if record is None:
+            self.__eventTimes[event] = [1, elapsed, elapsed]
+        else:
+            record[0] += 1
+            record[1] += elapsed
+            if elapsed > record[2]:
+                record[2] = elapsed
+
+    def __recordHandlerTime(self, method, elapsed):
+        # Methods are keyed on their function, so that all instances of a
+        # class that handle an event share an entry.
+        key = getattr(method, '__func__', method)
+        record = self.__handlerTimes.get(key)
+        if record is None:
+            self.__handlerTimes[key] = [1, elapsed, elapsed, method]
+        else:
+            record[0] += 1
+            record[1] += elapsed
+            if elapsed > record[2]:
+                record[2] = elapsed
+
+    def getProfile(self):
+        """
+        Returns a pair of dictionaries, (events, handlers), with the times
+        recorded since profiling was turned on.  The first is keyed on event
+        name and the second on the name of the handler, and each value is a
+        tuple of (count, totalTime, maxTime), with times in seconds.
+        """
+        events = {}
+        for event, (count, total, maxTime) in self.__eventTimes.items():
+            events[event] = (count, total, maxTime)
+
+        handlers = {}
+        for count, total, maxTime, method in self.__handlerTimes.values():
+            name = self.__methodRepr(method) or safeRepr(method)
+            if name in handlers:
+                # Two different functions with the same name.
+                oldCount, oldTotal, oldMax = handlers[name]
+                count += oldCount
+                total += oldTotal
+                maxTime = max(maxTime, oldMax)
+            handlers[name] = (count, total, maxTime)
+        return events, handlers
+
+    def reportProfile(self, limit=20):
+        """
+        Prints the events and handlers that took the most time in total
+        since profiling was turned on, up to limit of each.
+        """
+        events, handlers = self.getProfile()
+        str = 'Messenger profile\n'
+        for title, table in (('Event', events), ('Handler', handlers)):
+            str += '=' * 80 + '\n'
+            str += '%-44s %8s %10s %8s %8s\n' % (title, 'count', 'total ms', 'avg ms', 'max ms')
+            items = sorted(table.items(), key=lambda item: item[1][1], reverse=True)
+            for name, (count, total, maxTime) in items[:limit]:
+                str += '%-44s %8d %10.3f %8.4f %8.4f\n' % (
+                    safeRepr(name)[:44], count, total * 1000.0,
+                    total * 1000.0 / count, maxTime * 1000.0)
+        str += '=' * 80 + '\n'
+        print(str)
 
     def clear(self):
         """
@@ -433,6 +684,7 @@ class Messenger:
         self.lock.acquire()
         try:
             self.__callbacks.clear()
+            self.__dispatchTable.clear()
             self.__objectEvents.clear()
             self._id2object.clear()
         finally:
@@ -466,6 +718,7 @@ class Messenger:
                 if function == oldMethod:
                     newMethod = types.MethodType(newFunction, method.__self__)
                     params[0] = newMethod
+                    self.__dispatchTable.pop(event, None)
                     # Found it retrun true
                     retFlag += 1
         # didn't find that method, return false
@@ -474,6 +727,7 @@ class Messenger:
     def toggleVerbose(self):
         isVerbose = 1 - Messenger.notify.getDebug()
         Messenger.notify.setDebug(isVerbose)
+        self.__updateFastSend()
         if isVerbose:
             print("Verbose mode true.  quiet list = %s"%(
                 list(self.quieting.keys()),))
@@ -492,6 +746,7 @@ class Messenger:
             if not self.__watching.get(needle):
                 self.__isWatching += 1
                 self.__watching[needle]=1
+                self.__updateFastSend()
 
         def unwatch(self, needle):
             """
@@ -506,6 +761,7 @@ class Messenger:
             if self.__watching.get(needle):
                 self.__isWatching -= 1
                 del self.__watching[needle]
+                self.__updateFastSend()
 
         def quiet(self, message):
             """
@@ -651,3 +907,10 @@ class Messenger:
     detailed_repr = detailedRepr
     get_all_accepting = getAllAccepting
     toggle_verbose = toggleVerbose
+    is_coalesced = isCoalesced
+    set_lock_free = setLockFree
+    is_lock_free = isLockFree
+    set_profiling = setProfiling
+    is_profiling = isProfiling
+    get_profile = getProfile
+    report_profile = reportProfile
@@ -149,6 +149,7 @@ class TaskManager:
     taskTimerVerbose = ConfigVariableBool('task-timer-verbose', False)
     extendedExceptions = ConfigVariableBool('extended-exceptions', False)
     pStatsTasks = ConfigVariableBool('pstats-tasks', False)
+    taskAccounting = ConfigVariableBool('task-accounting', False)
 
     MaxEpochSpeed = 1.0/30.0
 
@@ -180,6 +181,12 @@ class TaskManager:
             session = None,
         )
 
+        # The TaskAccountant, while task accounting is on.
+        self._taskAccountant: Any = None
+        self.__accountant: Any = None
+        if self.taskAccounting:
+            self.setTaskAccounting(True)
+
     def finalInit(self) -> None:
         # This function should be called once during startup, after
         # most things are imported.
@@ -526,6 +533,9 @@ class TaskManager:
         if uponDeath is not None:
             task.setUponDeath(uponDeath)
 
+        if self._taskAccountant is not None:
+            self._taskAccountant.addTask(task)
+
         return task
 
     def remove(self, taskOrName: AsyncTask | str | list[AsyncTask | str]) -> int:
@@ -578,6 +588,9 @@ class TaskManager:
         try:
             self.mgr.poll()
 
+            if self._taskAccountant is not None:
+                self._taskAccountant.endFrame()
+
             # This is the spot for an internal yield function
             nextTaskTime = self.mgr.getNextWakeTime()
             self.doYield(startFrameTime, nextTaskTime)
@@ -683,13 +696,21 @@ class TaskManager:
             return 0
 
         method = task.getFunction()
+        # If the task is being timed, look at the function being timed.
+        timedFunction = None
+        if hasattr(method, 'accountant'):
+            timedFunction = method
+            method = timedFunction.function
         if isinstance(method, types.MethodType):
             function = method.__func__
         else:
             function = method
         if function == oldMethod:
             newMethod = types.MethodType(newFunction, method.__self__)
-            task.setFunction(newMethod)
+            if timedFunction is not None:
+                timedFunction.function = newMethod
+            else:
+                task.setFunction(newMethod)
             # Found a match
             return 1
         return 0
@@ -763,6 +784,81 @@ class TaskManager:
         if self._taskProfiler:
             self._taskProfiler.flush(name)
 
+    def getTaskAccounting(self):
+        return self._taskAccountant is not None
+
+    def setTaskAccounting(self, taskAccounting):
+        """
+        Turns on or off timing of every task; see TaskAccounting.  The
+        timings and budgets are kept while it is off, and are picked up
+        again when it is turned back on.
+        """
+        if taskAccounting:
+            if self._taskAccountant is not None:
+                return
+            if self.__accountant is None:
+                # import here due to import dependencies
+                TA = importlib.import_module('direct.task.TaskAccounting')
+                self.__accountant = TA.TaskAccountant()
+            self._taskAccountant = self.__accountant
+            for task in self.getAllTasks():
+                self._taskAccountant.addTask(task)
+        elif self._taskAccountant is not None:
+            for task in self.getAllTasks():
+                self._taskAccountant.removeTask(task)
+            self._taskAccountant = None
+
+    def getTaskAccountant(self):
+        """
+        Returns the TaskAccountant timing the tasks, or None if task
+        accounting is off.
+        """
+        return self._taskAccountant
+
+    def setTaskBudget(self, namePrefix, budget):
+        """
+        Sets a soft budget, in seconds, for each run of the tasks with the
+        given name prefix.  The taskBudgetExceeded event is sent whenever
+        one runs longer.  Requires task accounting.
+        """
+        self.setTaskAccounting(True)
+        self._taskAccountant.setTaskBudget(namePrefix, budget)
+
+    def setTaskChainBudget(self, chainName, budget, perTask=False):
+        """
+        Sets a soft budget, in seconds, for all the tasks in the task chain
+        together in one frame; the taskChainBudgetExceeded event is sent
+        whenever they run longer.  If perTask is true, the budget is instead
+        for each run of each task in the chain, like setTaskBudget().
+        Requires task accounting.
+        """
+        self.setTaskAccounting(True)
+        if perTask:
+            self._taskAccountant.setTaskChainTaskBudget(chainName, budget)
+        else:
+            self._taskAccountant.setTaskChainBudget(chainName, budget)
+
+    def getTaskTimings(self, sortBy='total', limit=None):
+        """
+        Returns a list of the TaskTimings recorded by task accounting,
+        largest first by the given attribute: 'total', 'max', 'average',
+        'last', 'count' or 'overBudget'.
+        """
+        if self._taskAccountant is None:
+            return []
+        return self._taskAccountant.getTimings(sortBy, limit)
+
+    def logTaskTimings(self, sortBy='total', limit=20):
+        if self._taskAccountant is None:
+            self.notify.info('task accounting is off')
+            return
+        self.notify.info('task timings (ms):\n' +
+                         self._taskAccountant.getReport(sortBy, limit))
+
+    def resetTaskTimings(self):
+        if self._taskAccountant is not None:
+            self._taskAccountant.resetTimings()
+
     def _setProfileTask(self, task):
         if self._taskProfileInfo.session:
             self._taskProfileInfo.session.release()
@@ -0,0 +1,251 @@
+"""TaskAccounting module: keeps always-on timings of every task run by the
+TaskManager, and checks them against soft time budgets.
+
+This is much cheaper than the sampled profiling done by the TaskProfiler, so
+it may be left on in production, to find which task made a frame run long.
+It is normally controlled through the TaskManager; see
+TaskManager.setTaskAccounting().
+"""
+
+__all__ = ['TaskTiming', 'TaskAccountant']
+
+from panda3d.core import ConfigVariableDouble
+from direct.directnotify.DirectNotifyGlobal import directNotify
+from direct.showbase.MessengerGlobal import messenger
+import time
+
+
+class TaskTiming:
+    """
+    The timings of all the tasks sharing a name prefix.  Times are in
+    seconds.
+    """
+
+    __slots__ = ('name', 'taskChain', 'count', 'total', 'max', 'last',
+                 'average', 'budget', 'overBudget')
+
+    def __init__(self, name, taskChain, budget):
+        self.name = name
+        self.taskChain = taskChain
+        self.budget = budget
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        # Exponentially weighted moving average of the time taken by each
+        # run of the task.
+        self.average = 0.0
+        # Number of runs that went over the budget.
+        self.overBudget = 0
+
+    def getMean(self):
+        if self.count:
+            return self.total / self.count
+        return 0.0
+
+
+class _TimedTaskFunction:
+    # Stands in for the function of a PythonTask, and times each call to it.
+
+    __slots__ = ('function', 'timing', 'accountant')
+
+    def __init__(self, function, timing, accountant):
+        self.function = function
+        self.timing = timing
+        self.accountant = accountant
+
+    def __call__(self, *args):
+        start = time.perf_counter()
+        try:
+            return self.function(*args)
+        finally:
+            self.accountant._record(self.timing, time.perf_counter() - start)
+
+
+class TaskAccountant:
+    """
+    Times every call to the functions of the tasks it is given, and keeps
+    the count, total, maximum and moving average of those times for each
+    task name prefix, so that tasks named for particular objects, such as
+    "smoothPosition-123", are counted together.
+
+    A task may be given a soft budget, either by its name prefix or for
+    every task in its task chain.  Each time a task runs over its budget,
+    the "taskBudgetExceeded" event is sent with the TaskTiming and the time
+    taken.  A task chain may also be given a budget for all of its tasks
+    together in a frame; when it is exceeded, the "taskChainBudgetExceeded"
+    event is sent with the name of the chain and the time taken.
+
+    Only tasks with a function are timed.  For a coroutine, only the time
+    taken to create it is counted, not the time spent running it.
+    """
+
+    notify = directNotify.newCategory("TaskAccountant")
+
+    # Weight given to the newest run of a task when averaging its times.
+    Smoothing = ConfigVariableDouble('task-accounting-smoothing', 0.1)
+
+    def __init__(self):
+        self.smoothing = self.Smoothing.getValue()
+        # name prefix -> TaskTiming
+        self.timings = {}
+        # name prefix -> budget of each run of the task
+        self.taskBudgets = {}
+        # task chain name -> budget of each run of each task in the chain
+        self.taskChainTaskBudgets = {}
+        # task chain name -> budget of all the chain's tasks in one frame
+        self.taskChainBudgets = {}
+        # task chain name -> time taken by the chain's tasks this frame
+        self.taskChainFrameTimes = {}
+
+    def addTask(self, task):
+        """
+        Starts timing the task, if it has a function that isn't already
+        being timed.
+        """
+        getFunction = getattr(task, 'getFunction', None)
+        if getFunction is None:
+            # Not a PythonTask.
+            return
+        function = getFunction()
+        if not callable(function) or isinstance(function, _TimedTaskFunction):
+            return
+        task.setFunction(_TimedTaskFunction(function, self.getTiming(task), self))
+
+    def removeTask(self, task):
+        """
+        Stops timing the task, restoring its own function.
+        """
+        getFunction = getattr(task, 'getFunction', None)
+        if getFunction is None:
+            return
+        function = getFunction()
+        if isinstance(function, _TimedTaskFunction):
+            task.setFunction(function.function)
+
+    def getTiming(self, task):
+        name = task.getNamePrefix()
+        timing = self.timings.get(name)
+        if timing is None:
+            taskChain = task.getTaskChain()
+            timing = TaskTiming(name, taskChain, self.__getBudget(name, taskChain))
+            self.timings[name] = timing
+        return timing
+
+    def __getBudget(self, name, taskChain):
+        budget = self.taskBudgets.get(name)
+        if budget is None:
+            budget = self.taskChainTaskBudgets.get(taskChain)
+        return budget
+
+    def setTaskBudget(self, namePrefix, budget):
+        """
+        Sets the budget in seconds of each run of the tasks with the given
+        name prefix.  None removes the budget.
+        """
+        if budget is None:
+            self.taskBudgets.pop(namePrefix, None)
+        else:
+            self.taskBudgets[namePrefix] = budget
+        self.__updateBudgets()
+
+    def setTaskChainTaskBudget(self, taskChain, budget):
+        """
+        Sets the budget in seconds of each run of each task in the task
+        chain, unless the task has its own budget.  None removes the budget.
+        """
+        if budget is None:
+            self.taskChainTaskBudgets.pop(taskChain, None)
+        else:
+            self.taskChainTaskBudgets[taskChain] = budget
+        self.__updateBudgets()
+
+    def setTaskChainBudget(self, taskChain, budget):
+        """
+        Sets the budget in seconds of all the tasks in the task chain
+        together in one frame.  None removes the budget.
+        """
+        if budget is None:
+            self.taskChainBudgets.pop(taskChain, None)
+        else:
+            self.taskChainBudgets[taskChain] = budget
+        self.taskChainFrameTimes.clear()
+
+    def __updateBudgets(self):
+        for timing in self.timings.values():
+            timing.budget = self.__getBudget(timing.name, timing.taskChain)
+
+    def _record(self, timing, elapsed):
+        timing.count += 1
+        timing.total += elapsed
+        timing.last = elapsed
+        if elapsed > timing.max:
+            timing.max = elapsed
+        if timing.count == 1:
+            timing.average = elapsed
+        else:
+            timing.average += (elapsed - timing.average) * self.smoothing
+
+        if self.taskChainBudgets:
+            taskChain = timing.taskChain
+            if taskChain in self.taskChainBudgets:
+                frameTimes = self.taskChainFrameTimes
+                frameTimes[taskChain] = frameTimes.get(taskChain, 0.0) + elapsed
+
+        budget = timing.budget
+        if budget is not None and elapsed > budget:
+            timing.overBudget += 1
+            self.notify.debug('task %s took %.2f ms, budget is %.2f ms' % (
+                timing.name, elapsed * 1000.0, budget * 1000.0))
+            messenger.send('taskBudgetExceeded', [timing, elapsed])
+
+    def endFrame(self):
+        """
+        Checks the task chain budgets against the time the chains took this
+        frame, and starts counting the next frame.  Called by the
+        TaskManager after each frame.
+        """
+        if not self.taskChainFrameTimes:
+            return
+        for taskChain, elapsed in self.taskChainFrameTimes.items():
+            budget = self.taskChainBudgets.get(taskChain)
+            if budget is not None and elapsed > budget:
+                self.notify.debug('task chain %s took %.2f ms, budget is %.2f ms' % (
+                    taskChain, elapsed * 1000.0, budget * 1000.0))
+                messenger.send('taskChainBudgetExceeded', [taskChain, elapsed])
+        self.taskChainFrameTimes.clear()
+
+    def resetTimings(self):
+        for timing in self.timings.values():
+            timing.reset()
+
+    def getTimings(self, sortBy='total', limit=None):
+        """
+        Returns a list of the TaskTimings, sorted by the given attribute,
+        largest first, and cut off at limit entries.
+        """
+        timings = sorted(self.timings.values(),
+                         key=lambda timing: getattr(timing, sortBy), reverse=True)
+        if limit is not None:
+            timings = timings[:limit]
+        return timings
+
+    def getReport(self, sortBy='total', limit=None):
+        """
+        Returns a table of the task timings as a string, with times in
+        milliseconds.
+        """
+        s = '%-40s %-12s %8s %10s %8s %8s %8s %6s\n' % (
+            'task', 'chain', 'count', 'total', 'mean', 'avg', 'max', 'over')
+        s += '-' * 108 + '\n'
+        for timing in self.getTimings(sortBy, limit):
+            if not timing.count:
+                continue
+            s += '%-40s %-12s %8d %10.2f %8.3f %8.3f %8.3f %6d\n' % (
+                timing.name[:40], timing.taskChain[:12], timing.count,
+                timing.total * 1000.0, timing.getMean() * 1000.0,
+                timing.average * 1000.0, timing.max * 1000.0, timing.overBudget)
+        return s
@@ -0,0 +1,54 @@
+from direct.actor.Actor import Actor
+from direct.actor.AnimChannelCache import animChannelCache
+
+
+class FakeChannel:
+    pass
+
+
+def make_actor(monkeypatch):
+    # An Actor with a single empty part, which binds any channel.
+    actor = Actor()
+    partDef = Actor.PartDef(None, None, None)
+    monkeypatch.setattr(actor, '_Actor__partBundleDict',
+                        {'lodRoot': {'modelRoot': partDef}})
+    monkeypatch.setattr(actor, 'bindAnim',
+                        lambda partDef, animDef, channel: True)
+    return actor, partDef
+
+
+def test_reload_anim_releases_reference(monkeypatch):
+    filename = 'test-reload-anim.bam'
+    channel = FakeChannel()
+    actor, partDef = make_actor(monkeypatch)
+    monkeypatch.setattr(actor, 'loadAnim',
+                        lambda filename: animChannelCache.acquire(
+                            filename, lambda filename: channel))
+
+    actor.loadAnims({'walk': filename}, loadNow=True)
+    assert animChannelCache.getRefCount(filename) == 1
+
+    # Loading the same name again replaces the AnimDef; the old one must
+    # give back its reference.
+    actor.loadAnims({'walk': filename}, loadNow=True)
+    assert animChannelCache.getRefCount(filename) == 1
+
+    # So must a lazily loaded AnimDef that replaces it.
+    actor.loadAnims({'walk': filename})
+    assert animChannelCache.getRefCount(filename) == 0
+
+    partDef.releaseAnims()
+    animChannelCache.flush()
+    assert not animChannelCache.hasChannel(filename)
+
+
+def test_reload_anim_drops_pending_load(monkeypatch):
+    actor, partDef = make_actor(monkeypatch)
+
+    actor.loadAnims({'walk': 'test-pending-anim.bam'})
+    oldDef = partDef.animsByName['walk']
+    oldDef.pending = object()
+
+    actor.loadAnims({'walk': 'test-pending-anim.bam'})
+    assert partDef.animsByName['walk'] is not oldDef
+    assert oldDef.pending is None